@@ -0,0 +1,149 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Stand-ins of the Tango devices used by HDBPP, so the control path can be measured
+without a Tango system. Every call costs a fixed latency, the asynchronous commands
+overlap like they do on a real device server.
+"""
+
+import time
+import threading
+import itertools
+import collections
+import tango
+
+AttributeConfig = collections.namedtuple("AttributeConfig", ["name", "data_format", "data_type", "writable"])
+AttributeValue = collections.namedtuple("AttributeValue", ["name", "value", "has_failed"])
+
+class FakeArchiver():
+    """
+    Event subscriber device of HDB++ (AS) keeping the archiving state of its attributes in memory.
+
+    Attributes
+    ----------
+    latency: float
+        time of one round trip to the device, seconds
+    calls: int
+        number of round trips made
+    """
+
+    def __init__(self, latency = 0.001):
+        self.latency = latency
+        self.calls = 0
+
+        self._state = collections.OrderedDict()
+        self._replies = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _run(self, cmd, value):
+        """
+        Execute a command on the in-memory state.
+        """
+
+        if cmd == "AttributeAdd" :
+            for a in value:
+                self._state.setdefault(a.lower(), "Stopped")
+            return None
+
+        a = value[0].lower() if isinstance(value, list) else value.lower()
+        if a not in self._state :
+            raise tango.DevFailed(tango.DevError())
+
+        if cmd == "AttributeStart" :
+            self._state[a] = "Started"
+        elif cmd == "AttributeStop" :
+            self._state[a] = "Stopped"
+        elif cmd == "AttributePause" :
+            self._state[a] = "Paused"
+        elif cmd == "AttributeRemove" :
+            del self._state[a]
+        elif cmd == "AttributeStatus" :
+            return "Archiving          : {0}\nEvent number       : 0\nRecord freq        : 1.0".format(self._state[a])
+        elif cmd in ("GetAttributeStrategy", "SetAttributeStrategy") :
+            return "ALWAYS"
+        elif cmd in ("GetAttributeTTL", "SetAttributeTTL") :
+            return 0
+
+        return None
+
+    def command_inout(self, cmd, data = None):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            return self._run(cmd, data.extract() if data != None else None)
+
+    def command_inout_asynch(self, cmd, data = None):
+        # The request is sent at once, the reply is ready one latency later
+        with self._lock:
+            idx = next(self._ids)
+            try:
+                self._replies[idx] = (time.monotonic() + self.latency, self._run(cmd, data.extract() if data != None else None), None)
+            except tango.DevFailed as df:
+                self._replies[idx] = (time.monotonic() + self.latency, None, df)
+        return idx
+
+    def command_inout_reply(self, idx, timeout = 0):
+        with self._lock:
+            ready, ret, err = self._replies.pop(idx)
+            self.calls += 1
+        delay = ready - time.monotonic()
+        if delay > 0 :
+            time.sleep(delay)
+        if err != None :
+            raise err
+        return ret
+
+    def get_attribute_list(self):
+        time.sleep(self.latency)
+        return ["AttributeList", "AttributeStartedList", "AttributePausedList", "AttributeStoppedList"]
+
+    def read_attributes(self, names):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            lists = {
+                "AttributeList": list(self._state),
+                "AttributeStartedList": [a for a, s in self._state.items() if s == "Started"],
+                "AttributePausedList": [a for a, s in self._state.items() if s == "Paused"],
+                "AttributeStoppedList": [a for a, s in self._state.items() if s == "Stopped"],
+            }
+        return [AttributeValue(n, lists.get(n, []), False) for n in names]
+
+class FakeDevice():
+    """
+    Device whose attributes are archived, answers get_attribute_config.
+
+    Attributes
+    ----------
+    latency: float
+        time of one round trip to the device, seconds
+    """
+
+    def __init__(self, kinds, latency = 0.001):
+        """
+        Parameters
+        ----------
+        kinds: dict
+            attribute kind by short attribute name, for example {"attr0": "scalar_devdouble_ro"}
+        """
+
+        self.kinds = {n.lower(): k for n, k in kinds.items()}
+        self.latency = latency
+
+    def _config(self, name):
+        if name.lower() not in self.kinds :
+            # A device server fails the whole call for an unknown attribute
+            raise tango.DevFailed(tango.DevError())
+        fmt, data_type, write = self.kinds[name.lower()].split("_")
+        return AttributeConfig(name,
+            tango.AttrDataFormat.SCALAR if fmt == "scalar" else tango.AttrDataFormat.SPECTRUM,
+            {"devboolean": tango.CmdArgType.DevBoolean, "devlong": tango.CmdArgType.DevLong, "devdouble": tango.CmdArgType.DevDouble}[data_type],
+            tango.AttrWriteType.READ if write == "ro" else tango.AttrWriteType.READ_WRITE)
+
+    def get_attribute_config(self, names):
+        time.sleep(self.latency)
+        if isinstance(names, str) :
+            return self._config(names)
+        return [self._config(n) for n in names]
@@ -0,0 +1,225 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks of the read, write and control paths of HDBPP.
+
+The history is served by a SQLite stand-in of HS holding a synthetic HDB++ schema,
+AS and the archived devices are replaced by in-memory fakes with a fixed latency.
+For every API the throughput, the p50/p99 latency of a call and the peak memory
+of a call (tracemalloc) are reported.
+
+    python -m benchmarks.run --attrs 20 --rows 10000 --repeat 5
+    python -m benchmarks.run --only archive --json results.json
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import datetime
+import tempfile
+import tracemalloc
+
+from hdbpp import HDBPP
+from benchmarks import schema
+from benchmarks.fake_tango import FakeArchiver, FakeDevice
+
+def percentile(values, p):
+    """
+    p-th percentile of a list of numbers, nearest rank.
+    """
+
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(p / 100.0 * len(values) + 0.5)) - 1))
+    return values[k]
+
+def measure(name, func, repeat, setup = None):
+    """
+    Run func repeat times and once more under tracemalloc.
+
+    Parameters
+    ----------
+    name: str
+        benchmark name
+    func: function
+        the measured call, returns the number of processed items (rows, attributes)
+    repeat: int
+        number of timed calls
+    setup: function
+        called before every call, not timed
+
+    Returns
+    -------
+    dict
+        "name", "calls", "items", "items_per_s", "p50_ms", "p99_ms", "peak_kib"
+    """
+
+    latencies = []
+    items = 0
+    for i in range(repeat):
+        if setup :
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        items += func() or 0
+        latencies.append(time.perf_counter() - start)
+
+    # The peak is measured separately, tracemalloc slows the calls down
+    if setup :
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    total = sum(latencies)
+    return {
+        "name": name,
+        "calls": repeat,
+        "items": items,
+        "items_per_s": items / total if total > 0 else 0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_kib": peak / 1024,
+    }
+
+def count(result):
+    """
+    Number of rows of a result of the get_* methods.
+    """
+
+    if result == None :
+        return 0
+    if isinstance(result, dict) :
+        if "data_time" in result :
+            return len(result["data_time"])
+        if "values" in result :
+            return result["values"].size
+        return sum(count(r) for r in result.values())
+    return len(result)
+
+def read_benchmarks(h, attrs, args):
+    """
+    Metadata lookups and history reads.
+    """
+
+    scalars = [a for a, kind in attrs if kind.startswith("scalar")]
+    doubles = [a for a, kind in attrs if kind.startswith("scalar_devdouble")]
+    arrays = [a for a, kind in attrs if kind.startswith("array")]
+    date_to = datetime.datetime.now() + datetime.timedelta(days=1)
+    a = doubles[0]
+
+    cases = [
+        ("get_att_conf cold", lambda: sum(1 for n in scalars if h.get_att_conf(n)), h.cache_invalidate),
+        ("get_att_conf warm", lambda: sum(1 for n in scalars if h.get_att_conf(n)), None),
+        ("find_att_conf", lambda: count(h.find_att_conf("bench/dev/.*/attr1.*")), None),
+        ("get_archive", lambda: count(h.get_archive(a, None, date_to)), None),
+        ("iter_archive", lambda: sum(len(rows) for rows in h.iter_archive(a, None, date_to, args.chunk)), None),
+        ("get_archive_array", lambda: count(h.get_archive_array(a, None, date_to)), None),
+        ("get_archive_many", lambda: count(h.get_archive_many(scalars, None, date_to)), None),
+        ("get_archive_aggregated", lambda: count(h.get_archive_aggregated(a, None, date_to, 60, ("min", "max", "avg", "count"))), None),
+        ("get_aligned", lambda: count(h.get_aligned(doubles, None, date_to, grid=60)), None),
+    ]
+    if len(arrays) > 0 :
+        cases.append(("get_archive array_*", lambda: count(h.get_archive(arrays[0], None, date_to)), None))
+
+    path = os.path.join(args.tmp, "export.csv")
+    cases.append(("export_archive csv", lambda: h.export_archive(scalars, None, date_to, path, "csv", args.chunk)["rows"], None))
+
+    return cases
+
+def write_benchmarks(h, attrs, args):
+    """
+    Registration of attributes in att_conf and AS.
+    """
+
+    scalars = [(a, kind) for a, kind in attrs if kind.startswith("scalar")]
+    data_type_id = h.get_att_conf(scalars[0][0])[2]
+    devices = {}
+    for a, kind in scalars:
+        devices.setdefault(a.rsplit("/", 1)[0], {})[a.rsplit("/", 1)[1]] = kind
+    dp, kinds = next(iter(devices.items()))
+    device = FakeDevice(kinds, args.latency / 1000.0)
+    names = [dp + "/" + n for n in kinds]
+
+    return [
+        ("replace_att_conf", lambda: sum(1 for n in names if h.replace_att_conf(data_type_id, n)), None),
+        ("archiving_add_bulk", lambda: len(h.archiving_add_bulk(device, names)["ok"]), None),
+    ]
+
+def control_benchmarks(h, attrs, args):
+    """
+    Commands of AS, one by one and fanned out.
+    """
+
+    names = [a for a, kind in attrs] * max(1, args.control // max(1, len(attrs)))
+    names = names[:args.control]
+
+    return [
+        ("archiving_status sequential", lambda: sum(1 for n in names if h.archiving_status(n)), None),
+        ("archiving_status_many", lambda: len(h.archiving_status_many(names, args.window)["ok"]), None),
+        ("archiving_stop_many", lambda: len(h.archiving_stop_many(names, args.window)["ok"]), None),
+        ("archiver_snapshot", lambda: len(h.archiver_snapshot()), None),
+    ]
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="HDBPP benchmarks on a synthetic HDB++ schema")
+    parser.add_argument("--attrs", type=int, default=20, help="number of scalar attributes")
+    parser.add_argument("--rows", type=int, default=10000, help="number of samples per attribute")
+    parser.add_argument("--arrays", type=int, default=2, help="number of spectrum attributes")
+    parser.add_argument("--array-size", type=int, default=16, help="number of elements of a spectrum")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed calls per benchmark")
+    parser.add_argument("--chunk", type=int, default=10000, help="chunk size of the streaming reads")
+    parser.add_argument("--latency", type=float, default=1.0, help="latency of a call to the fake Tango devices, ms")
+    parser.add_argument("--control", type=int, default=200, help="number of attributes in the control benchmarks")
+    parser.add_argument("--window", type=int, default=64, help="asynchronous command window")
+    parser.add_argument("--db", default=None, help="SQLite file, by default a temporary one")
+    parser.add_argument("--only", default=None, help="run the benchmarks whose name contains this string")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic values")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        args.tmp = tmp
+        db = args.db or os.path.join(tmp, "hdbpp.sqlite")
+        if os.path.exists(db) :
+            os.remove(db)
+
+        h = HDBPP(dbtype="sqlite", database=db, server_default=schema.SERVER)
+        if not h.connect_to_hdbpp() :
+            return 1
+
+        start = time.perf_counter()
+        schema.create_schema(h.cnx)
+        attrs = schema.populate(h.cnx, args.attrs, args.rows, args.arrays, args.array_size, seed=args.seed)
+        print("# {0} attributes x {1} rows loaded in {2:.1f} s".format(len(attrs), args.rows, time.perf_counter() - start), file=sys.stderr)
+
+        archiver = FakeArchiver(args.latency / 1000.0)
+        archiver._run("AttributeAdd", [a for a, kind in attrs])
+        h.archive_server = archiver
+
+        cases = read_benchmarks(h, attrs, args) + write_benchmarks(h, attrs, args) + control_benchmarks(h, attrs, args)
+
+        results = []
+        print("{0:<30} {1:>14} {2:>10} {3:>10} {4:>12}".format("benchmark", "items/s", "p50 ms", "p99 ms", "peak KiB"))
+        for name, func, setup in cases:
+            if args.only and args.only not in name :
+                continue
+            r = measure(name, func, args.repeat, setup)
+            results.append(r)
+            print("{name:<30} {items_per_s:>14.0f} {p50_ms:>10.2f} {p99_ms:>10.2f} {peak_kib:>12.0f}".format(**r))
+
+        h.close()
+
+    if args.json :
+        with open(args.json, "w") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k != "tmp"}, "results": results}, f, indent=2)
+
+    return 0
+
+if __name__ == "__main__" :
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Synthetic HDB++ schema and load for the benchmarks, on the SQLite stand-in of HS.
+The tables follow the MySQL schema of HDB++: att_conf, att_conf_data_type,
+att_scalar_* and att_array_* (one row per element, idx/dim_x_r/dim_y_r).
+"""
+
+import random
+import datetime
+
+# (data type, tango_data_type, SQL type of the values)
+DATA_TYPES = [
+    ("devboolean", 1, "INTEGER"),
+    ("devshort", 2, "INTEGER"),
+    ("devlong", 3, "INTEGER"),
+    ("devfloat", 4, "REAL"),
+    ("devdouble", 5, "REAL"),
+    ("devstring", 8, "TEXT"),
+    ("devstate", 19, "INTEGER"),
+    ("devlong64", 23, "INTEGER"),
+]
+
+# Attribute kinds of the synthetic load, in the order they are assigned to attributes
+SCALAR_KINDS = ["scalar_devdouble_ro", "scalar_devdouble_rw", "scalar_devlong_ro", "scalar_devboolean_ro"]
+ARRAY_KIND = "array_devdouble_ro"
+
+SERVER = "tango://tangobox:10000"
+
+def create_schema(cnx):
+    """
+    Create att_conf, att_conf_data_type and an att_* table for every data type.
+
+    Parameters
+    ----------
+    cnx: sqlite3.Connection
+        connection to the stand-in database
+    """
+
+    cursor = cnx.cursor()
+
+    cursor.execute("CREATE TABLE IF NOT EXISTS att_conf_data_type ("
+        "att_conf_data_type_id INTEGER PRIMARY KEY, data_type TEXT NOT NULL, tango_data_type INTEGER NOT NULL)")
+    cursor.execute("CREATE TABLE IF NOT EXISTS att_conf ("
+        "att_conf_id INTEGER PRIMARY KEY AUTOINCREMENT, att_name TEXT NOT NULL UNIQUE, att_conf_data_type_id INTEGER NOT NULL, "
+        "ttl INTEGER DEFAULT 0, facility TEXT, domain TEXT, family TEXT, member TEXT, name TEXT)")
+
+    data_type_id = 1
+    for fmt in ("scalar", "array"):
+        for name, tango_type, sql_type in DATA_TYPES:
+            for write in ("ro", "rw"):
+                data_type = "{0}_{1}_{2}".format(fmt, name, write)
+                cursor.execute("INSERT OR IGNORE INTO att_conf_data_type VALUES(?, ?, ?)", [data_type_id, data_type, tango_type])
+                data_type_id += 1
+
+                columns = ["att_conf_id INTEGER NOT NULL", "data_time TIMESTAMP", "recv_time TIMESTAMP", "insert_time TIMESTAMP"]
+                if fmt == "array" :
+                    columns += ["idx INTEGER NOT NULL", "dim_x_r INTEGER", "dim_y_r INTEGER"]
+                columns.append("value_r " + sql_type)
+                if write == "rw" :
+                    if fmt == "array" :
+                        columns += ["dim_x_w INTEGER", "dim_y_w INTEGER"]
+                    columns.append("value_w " + sql_type)
+                columns += ["quality INTEGER", "att_error_desc_id INTEGER"]
+
+                table = "att_" + data_type
+                cursor.execute("CREATE TABLE IF NOT EXISTS {0} ({1})".format(table, ", ".join(columns)))
+                cursor.execute("CREATE INDEX IF NOT EXISTS {0}_att_conf_id_data_time ON {0} (att_conf_id, data_time)".format(table))
+                cursor.execute("CREATE INDEX IF NOT EXISTS {0}_att_conf_id_insert_time ON {0} (att_conf_id, insert_time)".format(table))
+
+    cnx.commit()
+
+def attribute_names(n_attrs, n_arrays = 0):
+    """
+    Names and kinds of the synthetic attributes.
+
+    Returns
+    -------
+    list
+        (full attribute name, kind), for example ("tango://tangobox:10000/bench/dev/0/attr0", "scalar_devdouble_ro")
+    """
+
+    attrs = []
+    for i in range(n_attrs):
+        attrs.append(("{0}/bench/dev/{1}/attr{2}".format(SERVER, i // 10, i), SCALAR_KINDS[i % len(SCALAR_KINDS)]))
+    for i in range(n_arrays):
+        attrs.append(("{0}/bench/spectrum/{1}/attr{2}".format(SERVER, i // 10, i), ARRAY_KIND))
+    return attrs
+
+def populate(cnx, n_attrs, n_rows, n_arrays = 0, array_size = 16, start = None, period = 1.0, seed = 0):
+    """
+    Register synthetic attributes in att_conf and fill their history.
+    About 1% of the samples are INVALID with a NULL value, as failed reads are stored by HDB++.
+
+    Parameters
+    ----------
+    cnx: sqlite3.Connection
+        connection to the stand-in database
+    n_attrs: int
+        number of scalar attributes
+    n_rows: int
+        number of samples per attribute
+    n_arrays: int
+        number of spectrum attributes
+    array_size: int
+        number of elements of a spectrum
+    start: datetime
+        time of the first sample, None - n_rows periods before now
+    period: float
+        time between samples, seconds
+    seed: int
+        seed of the random values
+
+    Returns
+    -------
+    list
+        (full attribute name, kind) of the attributes
+    """
+
+    rnd = random.Random(seed)
+    step = datetime.timedelta(seconds=period)
+    if start == None :
+        start = datetime.datetime.now().replace(microsecond=0) - step * n_rows
+
+    cursor = cnx.cursor()
+    types = dict(cursor.execute("SELECT data_type, att_conf_data_type_id FROM att_conf_data_type").fetchall())
+
+    attrs = attribute_names(n_attrs, n_arrays)
+    for name, kind in attrs:
+        sp = name.split("/")
+        cursor.execute("INSERT OR REPLACE INTO att_conf(att_name, att_conf_data_type_id, facility, domain, family, member, name) "
+            "VALUES(?, ?, ?, ?, ?, ?, ?)", [name, types[kind], SERVER, sp[3], sp[4], sp[5], sp[6]])
+        att_conf_id = cursor.lastrowid
+
+        rw = kind.endswith("_rw")
+        rows = []
+        for k in range(n_rows):
+            data_time = start + step * k
+            insert_time = data_time + datetime.timedelta(milliseconds=rnd.randint(1, 50))
+            times = [att_conf_id, data_time.isoformat(" "), data_time.isoformat(" "), insert_time.isoformat(" ")]
+
+            invalid = rnd.random() < 0.01
+            quality = 1 if invalid else 0
+
+            if kind == ARRAY_KIND :
+                for idx in range(array_size):
+                    rows.append(times + [idx, array_size, 0, None if invalid else rnd.gauss(0, 1), quality, None])
+                continue
+
+            if "devboolean" in kind :
+                value = rnd.random() < 0.5
+            elif "devlong" in kind :
+                value = rnd.randint(-1000, 1000)
+            else :
+                value = rnd.gauss(0, 1)
+            if invalid :
+                value = None
+
+            rows.append(times + [value] + ([value] if rw else []) + [quality, None])
+
+        if len(rows) == 0 :
+            continue
+        cursor.executemany("INSERT INTO att_{0} VALUES({1})".format(kind, ", ".join(["?"] * len(rows[0]))), rows)
+
+    cnx.commit()
+
+    return attrs
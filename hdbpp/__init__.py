@@ -1,6 +1,8 @@
 # __init__.py
 
 from .hdbpp import *
+from .aio import AsyncHDBPP
+from .metrics import Instrumentation
 __version__ = '1.1'
 
 __all__ = ["hdbpp"]
@@ -0,0 +1,400 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Schema and index advisor of HS.
+
+    python -m hdbpp.advisor --dbtype mysql --host 172.18.0.7 --database hdbpp
+    python -m hdbpp.advisor --dbtype postgresql --host db --create
+    python -m hdbpp.advisor --dbtype mysql --follow
+"""
+
+import re
+import sys
+import json
+import datetime
+import argparse
+
+from .hdbpp import HDBPP, _SELECT_ATT_CONF, _SELECT_DATA_TYPE, _FIRST_INSERT_TIME
+from .partitions import _DATA_TABLE
+
+# Indexes the statements of HDBPP need: the leading columns of an index of the table
+_WANTED = {
+    "att_conf": [("att_name", )],
+    "att_conf_data_type": [("att_conf_data_type_id", )],
+}
+_WANTED_DATA = [("att_conf_id", "data_time")]
+# Only when the history is also read in insert_time order, by Follower
+_WANTED_FOLLOW = [("att_conf_id", "insert_time")]
+
+# SQLite: SEARCH att_scalar_devdouble_ro USING INDEX name (att_conf_id=? AND ...)
+_SQLITE_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\S+)")
+
+def _walk(node):
+    """
+    Nodes of a PostgreSQL JSON plan.
+    """
+
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+class SchemaAdvisor():
+    """
+    Checks that HS has the indexes the reads of HDBPP need.
+    att_conf, att_conf_data_type and every att_* history table are inspected, the statements
+    HDBPP issues are run through EXPLAIN and the plans are checked for full table scans
+    and sorts (filesort). The reads of an attribute are served by the (att_conf_id, data_time)
+    index of the HDB++ schema; an (att_conf_id, insert_time) index, and an index
+    without insert_time in the plans, are only reported with follow, when Follower polls
+    the tables in insert_time order. Missing indexes can be created without blocking the writes of AS:
+    ALGORITHM=INPLACE, LOCK=NONE on MySQL, CREATE INDEX CONCURRENTLY on PostgreSQL.
+    MyISAM tables (the default of the HDB++ MySQL schema) can not be changed online,
+    their indexes are added with a plain ADD INDEX that locks the table, with a warning.
+
+    Attributes
+    ----------
+    hdbpp: HDBPP
+        connected HDBPP object
+    follow: bool
+        the history is also read in insert_time order
+
+    Methods
+    -------
+    tables ()
+        att_conf, att_conf_data_type and the att_* history tables
+    indexes (table)
+        Indexes of a table and their columns
+    statements (table)
+        The statements of HDBPP reading a table
+    explain (sql, params)
+        Plan of a statement
+    check (tables, create)
+        Check the tables, optionally create the missing indexes
+    """
+
+    def __init__(self, hdbpp, follow = False):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        hdbpp: HDBPP
+            connected HDBPP object
+        follow: bool
+            the history is also read in insert_time order by Follower
+        """
+
+        self.hdbpp = hdbpp
+        self.follow = follow
+
+    def _query(self, sql, params = ()):
+        h = self.hdbpp
+        with h._connection() as cnx:
+            cursor = h._execute(cnx, sql, params)
+            names = [d[0].lower() for d in cursor.description]
+            rows = cursor.fetchall()
+            # Do not keep a transaction open on the catalog
+            cnx.rollback()
+        return names, rows
+
+    def tables(self):
+        """
+        att_conf, att_conf_data_type and the att_* history tables.
+
+        Returns
+        -------
+        list
+            table names
+        """
+
+        names = [r[0] for r in self._query(self.hdbpp.backend.list_tables)[1]]
+
+        return [t for t in _WANTED if t in names] + sorted(t for t in names if _DATA_TABLE.match(t))
+
+    def indexes(self, table):
+        """
+        Indexes of a table and their columns.
+
+        Parameters
+        ----------
+        table: str
+            table name
+        Returns
+        -------
+        dict
+            {index name: [columns in the order of the index]}
+        """
+
+        dbtype = self.hdbpp.dbtype
+        result = {}
+        if dbtype == "sqlite" :
+            for row in self._query("PRAGMA index_list({0})".format(table))[1]:
+                result[row[1]] = [r[2] for r in self._query("PRAGMA index_info({0})".format(row[1]))[1]]
+            # INTEGER PRIMARY KEY is the rowid, it has no index entry
+            for row in self._query("PRAGMA table_info({0})".format(table))[1]:
+                if row[5] == 1 and row[2].upper() == "INTEGER" :
+                    result["rowid"] = [row[1]]
+            return result
+
+        if dbtype == "postgresql" :
+            sql = ("SELECT ic.relname, a.attname FROM pg_index x JOIN pg_class ic ON ic.oid = x.indexrelid "
+                "JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = ANY(x.indkey) "
+                "WHERE x.indrelid = %s::regclass ORDER BY ic.relname, array_position(x.indkey::int2[], a.attnum)")
+        else :
+            sql = ("SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY INDEX_NAME, SEQ_IN_INDEX")
+
+        for name, column in self._query(sql, [table])[1]:
+            result.setdefault(name, []).append(column)
+
+        return result
+
+    def statements(self, table):
+        """
+        The statements of HDBPP reading a table, with parameters for EXPLAIN.
+
+        Parameters
+        ----------
+        table: str
+            table name
+        Returns
+        -------
+        list
+            (name, sql, params)
+        """
+
+        h = self.hdbpp
+
+        if table == "att_conf" :
+            return [("get_att_conf", _SELECT_ATT_CONF, [h.attr_set_server("a/b/c/d")])]
+
+        if table == "att_conf_data_type" :
+            return [("get_data_type", _SELECT_DATA_TYPE, [1])]
+
+        # An existing attribute, the plan may depend on the statistics of the value
+        rows = self._query("SELECT att_conf_id FROM {0} LIMIT 1".format(table))[1]
+        att_conf_id = rows[0][0] if rows else 1
+        date_to = datetime.datetime.now()
+        date_from = date_to - datetime.timedelta(days=1)
+
+        result = [
+            ("get_archive", h._archive_sql(table), [att_conf_id, date_from, date_to]),
+            ("get_archive_many", h._archive_many_sql(table, 2), [att_conf_id, att_conf_id + 1, date_from, date_to]),
+            ("first_insert_time", _FIRST_INSERT_TIME.format(table), [att_conf_id]),
+        ]
+        if self.follow :
+            result.append(("follow", h._archive_sql(table, "data_time, insert_time") + " ORDER BY insert_time, data_time LIMIT 10000",
+                [att_conf_id, date_from, date_to]))
+
+        return result
+
+    def explain(self, sql, params = ()):
+        """
+        Plan of a statement.
+
+        Parameters
+        ----------
+        sql: str
+            statement with %s placeholders
+        params: list
+            values of the placeholders
+        Returns
+        -------
+        dict
+            "full_scan" - tables read entirely, "sort" - the result is sorted (filesort),
+            "indexes" - used indexes, "rows" - estimated number of examined rows, "plan" - the raw plan
+        """
+
+        dbtype = self.hdbpp.dbtype
+        result = {"full_scan": [], "sort": False, "indexes": [], "rows": None, "plan": None}
+
+        if dbtype == "postgresql" :
+            plan = self._query("EXPLAIN (FORMAT JSON) " + sql, params)[1][0][0]
+            if isinstance(plan, str) :
+                plan = json.loads(plan)
+            plan = plan[0]["Plan"]
+            result["plan"] = plan
+            result["rows"] = plan.get("Plan Rows")
+            for node in _walk(plan):
+                if node["Node Type"] == "Seq Scan" :
+                    result["full_scan"].append(node.get("Relation Name"))
+                elif node["Node Type"] in ("Sort", "Incremental Sort") :
+                    result["sort"] = True
+                if "Index Name" in node :
+                    result["indexes"].append(node["Index Name"])
+            return result
+
+        if dbtype == "sqlite" :
+            rows = self._query("EXPLAIN QUERY PLAN " + sql, params)[1]
+            result["plan"] = [r[-1] for r in rows]
+            for detail in result["plan"]:
+                m = _SQLITE_INDEX.search(detail)
+                if m :
+                    result["indexes"].append(m.group(1))
+                # SEARCH without an index is a scan optimized for MIN/MAX
+                if detail.startswith("SCAN ") or (detail.startswith("SEARCH ") and "USING" not in detail) :
+                    result["full_scan"].append(detail.split()[1])
+                if "TEMP B-TREE" in detail :
+                    result["sort"] = True
+            return result
+
+        names, rows = self._query("EXPLAIN " + sql, params)
+        result["plan"] = [dict(zip(names, r)) for r in rows]
+        for row in result["plan"]:
+            # ALL - table scan, index - scan of a whole index
+            if row.get("type") in ("ALL", "index") :
+                result["full_scan"].append(row.get("table"))
+            extra = row.get("extra") or ""
+            if isinstance(extra, bytes) :
+                extra = extra.decode()
+            if "filesort" in extra or "temporary" in extra :
+                result["sort"] = True
+            if row.get("key") :
+                result["indexes"].append(row["key"])
+            if row.get("rows") != None :
+                result["rows"] = (result["rows"] or 0) + int(row["rows"])
+
+        return result
+
+    def _create_sql(self, table, columns, report):
+        """
+        Statement creating an index without blocking the writes to the table where the
+        database allows it, otherwise a warning is added to the report.
+        """
+
+        dbtype = self.hdbpp.dbtype
+        name = "{0}_{1}_idx".format(table, "_".join(columns))
+        if dbtype == "mysql" :
+            engine = self._query("SELECT ENGINE FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", [table])[1]
+            if engine and (engine[0][0] or "").lower() != "innodb" :
+                # MyISAM rejects ALGORITHM=INPLACE, LOCK=NONE
+                report["warnings"].append("{0} is {1}, the index is built with the table locked for writes".format(table, engine[0][0]))
+                return "ALTER TABLE {0} ADD INDEX {1} ({2})".format(table, name, ", ".join(columns))
+            return "ALTER TABLE {0} ADD INDEX {1} ({2}), ALGORITHM=INPLACE, LOCK=NONE".format(table, name, ", ".join(columns))
+
+        if dbtype == "postgresql" :
+            partitioned = self._query("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [table])[1][0][0] == "p"
+            # An index of a partitioned table can not be built concurrently, it is built on every partition
+            return "CREATE INDEX {0}IF NOT EXISTS {1} ON {2} ({3})".format("" if partitioned else "CONCURRENTLY ", name, table, ", ".join(columns))
+
+        return "CREATE INDEX IF NOT EXISTS {0} ON {1} ({2})".format(name, table, ", ".join(columns))
+
+    def _create(self, sql):
+        """
+        Execute a statement creating an index, outside of a transaction.
+        """
+
+        h = self.hdbpp
+        with h._connection() as cnx:
+            autocommit = cnx.autocommit if h.dbtype == "postgresql" else None
+            try:
+                if h.dbtype == "postgresql" :
+                    cnx.rollback()
+                    cnx.autocommit = True
+                h._execute(cnx, sql)
+                if h.dbtype != "postgresql" :
+                    cnx.commit()
+            finally:
+                if h.dbtype == "postgresql" :
+                    cnx.autocommit = autocommit
+
+    def check(self, tables = None, create = False):
+        """
+        Check the tables, optionally create the missing indexes.
+
+        Parameters
+        ----------
+        tables: array(str)
+            table names, None - att_conf, att_conf_data_type and all att_* history tables
+        create: bool
+            create the missing indexes, otherwise only report the statements
+        Returns
+        -------
+        dict
+            {table: {"indexes", "missing" (columns of the missing indexes), "create" (statements),
+            "created", "plans" ({statement name: explain result}), "problems" (text),
+            "warnings" (text, for example an index that locks the table while it is built)}}
+        """
+
+        result = {}
+        for table in tables or self.tables():
+            report = {"indexes": {}, "missing": [], "create": [], "created": [], "plans": {}, "problems": [], "warnings": []}
+            result[table] = report
+            try:
+                report["indexes"] = self.indexes(table)
+                leading = [tuple(c[:2]) for c in report["indexes"].values()] + [tuple(c[:1]) for c in report["indexes"].values()]
+                wanted = _WANTED.get(table, _WANTED_DATA + (_WANTED_FOLLOW if self.follow else []))
+                for columns in wanted:
+                    if columns not in leading :
+                        report["missing"].append(list(columns))
+                        report["create"].append(self._create_sql(table, columns, report))
+                        report["problems"].append("no index on ({0})".format(", ".join(columns)))
+
+                for name, sql, params in self.statements(table):
+                    plan = self.explain(sql, params)
+                    report["plans"][name] = plan
+                    if table in plan["full_scan"] :
+                        report["problems"].append("{0}: full scan of {1}".format(name, table))
+                    if plan["sort"] :
+                        report["problems"].append("{0}: sort of the result (filesort)".format(name))
+                    # Follower reads a range of insert_time in its order, otherwise the (att_conf_id, data_time) index is enough
+                    for index in plan["indexes"] if self.follow else []:
+                        columns = report["indexes"].get(index)
+                        if columns and "insert_time" in sql and "insert_time" not in columns :
+                            report["problems"].append("{0}: index {1} ({2}) does not contain insert_time, the range is filtered row by row".format(name, index, ", ".join(columns)))
+            except self.hdbpp.backend.Error as err:
+                print("[error]: check {0}: {1}".format(table, err))
+                report["problems"].append(str(err))
+                continue
+
+            if create :
+                for sql in report["create"]:
+                    try:
+                        self._create(sql)
+                        report["created"].append(sql)
+                    except self.hdbpp.backend.Error as err:
+                        print("[error]: {0}: {1}".format(sql, err))
+                        report["problems"].append(str(err))
+
+        return result
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Check the indexes of HS and the plans of the HDBPP statements")
+    parser.add_argument("--dbtype", default="mysql", help="mysql, postgresql or sqlite")
+    parser.add_argument("--host", default="172.18.0.7")
+    parser.add_argument("--user", default="tango")
+    parser.add_argument("--password", default="tango")
+    parser.add_argument("--database", default="hdbpp")
+    parser.add_argument("--table", action="append", default=None, help="check only this table, may be repeated")
+    parser.add_argument("--create", action="store_true", help="create the missing indexes")
+    parser.add_argument("--follow", action="store_true", help="the history is also followed, in insert_time order")
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    h = HDBPP(dbtype=args.dbtype, host=args.host, user=args.user, password=args.password, database=args.database)
+    if not h.connect_to_hdbpp() :
+        return 1
+
+    report = SchemaAdvisor(h, args.follow).check(args.table, args.create)
+    h.close()
+
+    problems = 0
+    for table, r in report.items():
+        print("{0}: {1}".format(table, "ok" if not r["problems"] else "{0} problem(s)".format(len(r["problems"]))))
+        for p in r["problems"]:
+            print("    " + p)
+        for w in r["warnings"]:
+            print("    warning: " + w)
+        for sql in r["create"]:
+            print("    {0} {1}".format("created:" if sql in r["created"] else "fix:", sql))
+        problems += len(r["problems"])
+
+    if args.json :
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    return 1 if problems else 0
+
+if __name__ == "__main__" :
+    sys.exit(main())
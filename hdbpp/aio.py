@@ -0,0 +1,371 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import functools
+import concurrent.futures
+
+from .lazy import LazyModule
+from .hdbpp import HDBPP, _device_data, _parse_status
+
+tango = LazyModule("tango")
+tango_asyncio = LazyModule("tango.asyncio")
+
+class AsyncHDBPP():
+    """
+    asyncio counterpart of the HDBPP class.
+    Queries to HS run on a pool of connections in a thread executor,
+    commands of AS go through the PyTango asyncio green mode,
+    so many requests can be in flight on one event loop.
+    The calls to the archived devices themselves (archiving_add, the polling and
+    event configuration of attr_set_period, attr_get_period and archiving_start)
+    use the cached synchronous proxies of HDBPP in the executor as well.
+
+    Attributes
+    ----------
+    hdbpp: HDBPP
+        synchronous object doing the queries to HS
+    archive_server: tango.DeviceProxy
+        asyncio proxy to AS
+    executor: concurrent.futures.ThreadPoolExecutor
+        threads running the queries to HS
+
+    Methods
+    -------
+    connect ()
+        Connect to HS and AS
+    close ()
+        Disconnect from HS
+    get_archive (attr, date_from, date_to)
+        Get the history of an attribute's persistence
+    iter_archive (attr, date_from, date_to, chunk_size)
+        Stream the history of an attribute in chunks
+    archiving_* (attr)
+        The commands of AS, as in HDBPP
+    """
+
+    def __init__(self, *args, workers = None, **kwargs):
+        """
+        Class constructor. Takes the parameters of the HDBPP constructor.
+        Note:
+            By default 10 pooled connections to HS are used.
+
+        Parameters
+        ----------
+        workers: int
+            number of executor threads, by default the pool size
+        """
+
+        kwargs.setdefault("pool_size", 10)
+
+        self.hdbpp = HDBPP(*args, **kwargs)
+        self.archive_server = None
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers or max(self.hdbpp.pool_size, 1))
+
+    async def _run(self, func, *args, **kwargs):
+        """
+        Run a blocking function in the executor.
+        """
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def connect(self):
+        """
+        Connect to HS and AS
+
+        Returns
+        -------
+        bool
+            True if successful, otherwise False
+        """
+
+        if await self.connect_to_hdbpp() == False :
+            return False
+
+        if await self.connect_to_archive_server() == False :
+            return False
+
+        return True
+
+    async def connect_to_hdbpp(self):
+        """
+        Connect to HS
+
+        Returns
+        -------
+        bool
+            True if successful, otherwise False
+        """
+
+        return await self._run(self.hdbpp.connect_to_hdbpp)
+
+    async def connect_to_archive_server(self):
+        """
+        Connect to AS
+
+        Returns
+        -------
+        bool
+            True if successful, otherwise False
+        """
+
+        try:
+            self.archive_server = await tango_asyncio.DeviceProxy(self.hdbpp.archive_server_name)
+        except tango.DevFailed as err:
+            print("[error]: Failed to create proxy to {}: {}".format(self.hdbpp.archive_server_name, err))
+            return False
+
+        # Synchronous methods running in the executor use the same device,
+        # creating its proxy blocks, so it is done in the executor too
+        try:
+            self.hdbpp.archive_server = await self._run(self.hdbpp.proxies.device, self.hdbpp.archive_server_name)
+        except tango.DevFailed as err:
+            print("[error]: Failed to create proxy to {}: {}".format(self.hdbpp.archive_server_name, err))
+            return False
+
+        return True
+
+    async def close(self):
+        """
+        Close connection to HS.
+        """
+
+        await self._run(self.hdbpp.close)
+        self.executor.shutdown(wait=False)
+
+    async def get_att_conf(self, attr):
+        """
+        Get information about an attribute from HS. See HDBPP.get_att_conf
+        """
+
+        return await self._run(self.hdbpp.get_att_conf, attr)
+
+    async def find_att_conf(self, pattern):
+        """
+        Find attributes in HS by regular expression. See HDBPP.find_att_conf
+        """
+
+        return await self._run(self.hdbpp.find_att_conf, pattern)
+
+    async def cache_preload(self):
+        """
+        Load att_conf and att_conf_data_type into the metadata cache. See HDBPP.cache_preload
+        """
+
+        return await self._run(self.hdbpp.cache_preload)
+
+    async def get_archive(self, attr, date_from = None, date_to = None):
+        """
+        Get the history of saving an attribute. See HDBPP.get_archive
+        """
+
+        return await self._run(self.hdbpp.get_archive, attr, date_from, date_to)
+
+    async def get_archive_many(self, attrs, date_from = None, date_to = None):
+        """
+        Get the history of several attributes at once. See HDBPP.get_archive_many
+        """
+
+        return await self._run(self.hdbpp.get_archive_many, attrs, date_from, date_to)
+
+    async def get_archive_array(self, attr, date_from = None, date_to = None, epoch = False):
+        """
+        Get the history of saving a scalar attribute as NumPy column arrays. See HDBPP.get_archive_array
+        """
+
+        return await self._run(self.hdbpp.get_archive_array, attr, date_from, date_to, epoch)
+
+    async def get_archive_matrix(self, attr, date_from = None, date_to = None, column = "value_r", epoch = False):
+        """
+        Get the history of saving a spectrum or image attribute as a 2-D or 3-D NumPy array. See HDBPP.get_archive_matrix
+        """
+
+        return await self._run(self.hdbpp.get_archive_matrix, attr, date_from, date_to, column, epoch)
+
+    async def get_archive_copy(self, attr, date_from = None, date_to = None, epoch = False):
+        """
+        Get the history of saving a scalar attribute as NumPy column arrays with PostgreSQL COPY. See HDBPP.get_archive_copy
+        """
+
+        return await self._run(self.hdbpp.get_archive_copy, attr, date_from, date_to, epoch)
+
+    async def get_archive_aggregated(self, attr, date_from = None, date_to = None, bucket = 60, funcs = ("min", "max", "avg", "count", "last"), column = "value_r"):
+        """
+        Get the history of saving an attribute aggregated by time buckets. See HDBPP.get_archive_aggregated
+        """
+
+        return await self._run(self.hdbpp.get_archive_aggregated, attr, date_from, date_to, bucket, funcs, column)
+
+    async def iter_archive(self, attr, date_from = None, date_to = None, chunk_size = 10000):
+        """
+        Stream the history of saving an attribute in chunks. See HDBPP.iter_archive
+        Note:
+            The pooled connection is held until the generator is exhausted or closed.
+
+        Yields
+        ------
+        list
+            chunk of rows of the archive table
+        """
+
+        chunks = self.hdbpp.iter_archive(attr, date_from, date_to, chunk_size)
+        try:
+            while True :
+                rows = await self._run(next, chunks, None)
+                if rows == None :
+                    break
+                yield rows
+        finally:
+            await self._run(chunks.close)
+
+    async def _archiver_command(self, cmd, arg_type, value):
+        """
+        Execute a command of AS without blocking the event loop.
+        """
+
+        return await self.archive_server.command_inout(cmd, _device_data(arg_type, value))
+
+    async def archiving_add(self, dp, attrs):
+        """
+        Add attributes to the AS. See HDBPP.archiving_add
+        """
+
+        return await self._run(self.hdbpp.archiving_add, dp, attrs)
+
+    async def archiving_pause(self, attr):
+        """
+        Pause attribute archiving. See HDBPP.archiving_pause
+        """
+
+        try:
+            await self._archiver_command("AttributePause", tango._tango.CmdArgType.DevString, self.hdbpp.attr_set_server(attr))
+            return True
+        except tango.DevFailed as df:
+            return False
+
+    async def archiving_remove(self, attr):
+        """
+        Remove attribute from AS. See HDBPP.archiving_remove
+        """
+
+        try:
+            await self._archiver_command("AttributeRemove", tango._tango.CmdArgType.DevString, self.hdbpp.attr_set_server(attr))
+            return True
+        except tango.DevFailed as df:
+            return False
+
+    async def archiving_start(self, attr, period = 0, archive_period = None, archive_abs_change = None, archive_rel_change = None):
+        """
+        Start archiving the attribute. See HDBPP.archiving_start
+        """
+
+        attr = self.hdbpp.attr_set_server(attr)
+
+        # Convert the full name to short
+        # 'ECG/ecg/1/Lead'
+        sp = attr.split('/')
+        attr_short = sp[-4] + "/" + sp[-3] + "/" + sp[-2] + "/" + sp[-1]
+
+        try:
+            await self.attr_set_period(attr_short, period, archive_period, archive_abs_change, archive_rel_change)
+            await self._archiver_command("AttributeStart", tango._tango.CmdArgType.DevString, attr)
+            return True
+        except tango.DevFailed as df:
+            return False
+
+    async def archiving_status(self, attr):
+        """
+        The archiving status of the attribute. See HDBPP.archiving_status
+        """
+
+        try:
+            ret = await self._archiver_command("AttributeStatus", tango._tango.CmdArgType.DevString, self.hdbpp.attr_set_server(attr))
+        except tango.DevFailed as df:
+            return {"Archiving": False}
+
+        return _parse_status(ret)
+
+    async def archiving_stop(self, attr):
+        """
+        Stop archiving the attribute. See HDBPP.archiving_stop
+        """
+
+        try:
+            await self._archiver_command("AttributeStop", tango._tango.CmdArgType.DevString, self.hdbpp.attr_set_server(attr))
+            return True
+        except tango.DevFailed as df:
+            return False
+
+    async def archiving_set_strategy(self, attr, strategy = "ALWAYS"):
+        """
+        Set the archiving strategy for the attribute. See HDBPP.archiving_set_strategy
+        """
+
+        try:
+            await self._archiver_command("SetAttributeStrategy", tango._tango.CmdArgType.DevVarStringArray, [self.hdbpp.attr_set_server(attr), str(strategy)])
+            return True
+        except tango.DevFailed as df:
+            return False
+
+    async def archiving_set_ttl(self, attr, ttl):
+        """
+        Set the number of days to archive the attribute. See HDBPP.archiving_set_ttl
+        """
+
+        attr = self.hdbpp.attr_set_server(attr)
+
+        try:
+            await self._archiver_command("SetAttributeTTL", tango._tango.CmdArgType.DevVarStringArray, [attr, str(ttl)])
+        except tango.DevFailed as df:
+            return False
+
+        await self._run(self.hdbpp._cache_set_ttl, attr, ttl)
+
+        return True
+
+    async def archiving_get_strategy(self, attr):
+        """
+        Get the archiving strategy for an attribute. See HDBPP.archiving_get_strategy
+        """
+
+        try:
+            return await self._archiver_command("GetAttributeStrategy", tango._tango.CmdArgType.DevString, self.hdbpp.attr_set_server(attr))
+        except tango.DevFailed as df:
+            return False
+
+    async def archiving_get_ttl(self, attr):
+        """
+        Get the number of days the attribute was archived. See HDBPP.archiving_get_ttl
+        """
+
+        try:
+            return await self._archiver_command("GetAttributeTTL", tango._tango.CmdArgType.DevString, self.hdbpp.attr_set_server(attr))
+        except tango.DevFailed as df:
+            return False
+
+    async def attr_is_archiving(self, attr):
+        """
+        Find out if the attribute is being archived. See HDBPP.attr_is_archiving
+        """
+
+        ret = await self.archiving_status(attr)
+
+        if ret["Archiving"] == "Started":
+            return True
+
+        return False
+
+    async def attr_set_period(self, attr, period = 0, archive_period = None, archive_abs_change = None, archive_rel_change = None):
+        """
+        Setting the parameters for archiving the attribute. See HDBPP.attr_set_period
+        """
+
+        return await self._run(self.hdbpp.attr_set_period, attr, period, archive_period, archive_abs_change, archive_rel_change)
+
+    async def attr_get_period(self, attr):
+        """
+        Retrieving archive parameters for an attribute. See HDBPP.attr_get_period
+        """
+
+        return await self._run(self.hdbpp.attr_get_period, attr)
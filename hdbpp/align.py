@@ -0,0 +1,169 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import datetime
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# tango.AttrQuality.ATTR_INVALID, the value of such a sample is unknown
+_QUALITY_INVALID = 1
+
+# Quality in the result where an attribute has no sample yet
+_QUALITY_NONE = -1
+
+def _to_us(value):
+    """
+    datetime, datetime64 or number of microseconds since 1970 as an integer number of microseconds.
+    """
+
+    if isinstance(value, datetime.datetime) :
+        return (value - datetime.datetime(1970, 1, 1)) // datetime.timedelta(microseconds=1)
+
+    if isinstance(value, numpy.datetime64) :
+        return int(value.astype("datetime64[us]").astype("int64"))
+
+    return int(value)
+
+def make_grid(times, grid = None, start = None, end = None):
+    """
+    Shared time index of the aligned matrix.
+
+    Parameters
+    ----------
+    times: array(numpy.ndarray)
+        int64 sample times of every attribute, microseconds
+    grid: float, timedelta or array
+        None - union of all sample times, number or timedelta - regular step in seconds,
+        array of datetime / datetime64 / microseconds - the index itself
+    start: int
+        first time of a regular grid, None - the first sample, microseconds
+    end: int
+        last time of a regular grid, None - the last sample, microseconds
+
+    Returns
+    -------
+    numpy.ndarray
+        sorted int64 times, microseconds
+    """
+
+    if grid is None :
+        if len(times) == 0 :
+            return numpy.empty(0, dtype="int64")
+        return numpy.unique(numpy.concatenate(times))
+
+    if isinstance(grid, datetime.timedelta) :
+        grid = grid.total_seconds()
+
+    if numpy.isscalar(grid) :
+        step = int(grid * 1000000)
+        if step <= 0 :
+            raise ValueError("grid step must be positive")
+
+        samples = [t for t in times if len(t) > 0]
+        if start == None :
+            if len(samples) == 0 :
+                return numpy.empty(0, dtype="int64")
+            start = min(int(t.min()) for t in samples)
+        if end == None :
+            if len(samples) == 0 :
+                return numpy.empty(0, dtype="int64")
+            end = max(int(t.max()) for t in samples)
+
+        return numpy.arange(start, end + 1, step, dtype="int64")
+
+    array = numpy.asarray(grid)
+    if array.dtype.kind == "M" :
+        return numpy.sort(array.astype("datetime64[us]").astype("int64"))
+    if array.dtype.kind == "O" :
+        return numpy.sort(numpy.fromiter((_to_us(g) for g in array), dtype="int64", count=len(array)))
+
+    return numpy.sort(array.astype("int64"))
+
+def align_asof(t, v, q, grid, tolerance = None):
+    """
+    For every grid time take the last sample at or before it (merge-asof, forward fill).
+    A sample with INVALID quality or a NULL value gives NaN until the next sample.
+
+    Parameters
+    ----------
+    t: numpy.ndarray
+        sorted int64 sample times, microseconds
+    v: numpy.ndarray
+        float64 values, NaN for NULL
+    q: numpy.ndarray
+        int8 quality of the samples
+    grid: numpy.ndarray
+        int64 grid times, microseconds
+    tolerance: int
+        samples older than this are not carried forward, None - no limit, microseconds
+
+    Returns
+    -------
+    tuple
+        (float64 values, int8 quality) on the grid
+    """
+
+    i = numpy.searchsorted(t, grid, side="right") - 1
+    found = i >= 0
+    if tolerance != None :
+        found &= grid - t[numpy.maximum(i, 0)] <= tolerance
+
+    values = numpy.full(len(grid), numpy.nan)
+    quality = numpy.full(len(grid), _QUALITY_NONE, dtype="int8")
+
+    j = i[found]
+    values[found] = numpy.where(q[j] == _QUALITY_INVALID, numpy.nan, v[j])
+    quality[found] = q[j]
+
+    return values, quality
+
+def align_linear(t, v, q, grid):
+    """
+    Linear interpolation between the samples around every grid time.
+    There is no extrapolation, and an interval next to an INVALID or NULL sample is a gap (NaN).
+    The quality is that of the sample at or before the grid time.
+
+    Parameters
+    ----------
+    t: numpy.ndarray
+        sorted int64 sample times, microseconds
+    v: numpy.ndarray
+        float64 values, NaN for NULL
+    q: numpy.ndarray
+        int8 quality of the samples
+    grid: numpy.ndarray
+        int64 grid times, microseconds
+
+    Returns
+    -------
+    tuple
+        (float64 values, int8 quality) on the grid
+    """
+
+    v = numpy.where(q == _QUALITY_INVALID, numpy.nan, v)
+    values, quality = align_asof(t, v, q, grid)
+
+    if len(t) < 2 :
+        return values, quality
+
+    # Interval [t[i], t[i + 1]] around every grid time
+    i = numpy.clip(numpy.searchsorted(t, grid, side="right") - 1, 0, len(t) - 2)
+    t0 = t[i]
+    t1 = t[i + 1]
+    inside = (grid >= t[0]) & (grid <= t[-1]) & (t1 > t0)
+
+    frac = numpy.zeros(len(grid))
+    frac[inside] = (grid[inside] - t0[inside]) / (t1[inside] - t0[inside])
+
+    # An exact hit takes the sample itself, the neighbour may be a gap
+    at_sample = frac == 0
+    at_next = frac == 1
+    between = inside & ~at_sample & ~at_next
+    values[between] = v[i[between]] + (v[i[between] + 1] - v[i[between]]) * frac[between]
+    values[inside & at_next] = v[i[inside & at_next] + 1]
+    values[grid > t[-1]] = numpy.nan
+
+    return values, quality
@@ -0,0 +1,63 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import importlib
+
+# Modules of the database backends by dbtype, a module is imported with its driver
+# when a connection of its type is first made
+_REGISTRY = {
+    "mysql": "hdbpp.backends.mysql",
+    "postgresql": "hdbpp.backends.postgresql",
+    "sqlite": "hdbpp.backends.sqlite",
+}
+
+_backends = {}
+
+def register(dbtype, module):
+    """
+    Add or replace a database backend.
+
+    Parameters
+    ----------
+    dbtype: str
+        the dbtype of HDBPP that selects the backend
+    module: str/Backend
+        name of a module with a Backend class, imported on first use, or a Backend object
+    """
+
+    _REGISTRY[dbtype] = module
+    _backends.pop(dbtype, None)
+
+def available():
+    """
+    The registered dbtypes.
+    """
+
+    return sorted(_REGISTRY)
+
+def get_backend(dbtype):
+    """
+    The backend of a dbtype, its module is imported on the first call.
+
+    Parameters
+    ----------
+    dbtype: str
+        "mysql", "postgresql", "sqlite" or a registered one
+    Returns
+    -------
+    Backend
+        SQL dialect, driver and fast paths of the database
+    """
+
+    backend = _backends.get(dbtype)
+    if backend != None :
+        return backend
+
+    module = _REGISTRY.get(dbtype)
+    if module == None :
+        raise ValueError("no supported db: {0}".format(dbtype))
+
+    backend = importlib.import_module(module).Backend() if isinstance(module, str) else module
+    _backends[dbtype] = backend
+
+    return backend
@@ -0,0 +1,154 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+class Backend():
+    """
+    SQL dialect, driver and fast paths of one type of database of HS.
+    HDBPP builds its statements with %s placeholders and asks the backend for
+    everything that differs between the databases.
+
+    Attributes
+    ----------
+    name: str
+        dbtype of the backend
+    Error: tuple
+        exception classes of the driver
+    Disconnected: tuple
+        exception classes of a broken connection
+    pooled: bool
+        the connections can be pooled
+    native_arrays: bool
+        spectrums and images are stored as arrays, otherwise as a row per element (idx)
+    has_copy: bool
+        the history can be read with COPY
+    select_att_conf_regexp: str
+        statement finding att_conf rows by a case-insensitive regular expression
+    replace_att_conf: str
+        statement adding or replacing an att_conf row
+    list_tables: str
+        statement listing the tables of the current database
+    """
+
+    name = None
+    Error = ()
+    Disconnected = ()
+    pooled = False
+    native_arrays = False
+    has_copy = False
+
+    select_att_conf_regexp = None
+    replace_att_conf = None
+    list_tables = None
+
+    def connect(self, host, user, password, database):
+        """
+        Open a connection to HS.
+        """
+
+        raise NotImplementedError
+
+    def create_pool(self, host, user, password, database, size):
+        """
+        Driver pool of size connections.
+        """
+
+        raise ValueError("no connection pool for {0}".format(self.name))
+
+    def pool_getconn(self, pool, health_check, discard):
+        """
+        Borrow a connection from a driver pool, checked if health_check.
+        discard(cnx) is called before a dead connection is closed or reconnected.
+        """
+
+        raise NotImplementedError
+
+    def pool_putconn(self, pool, cnx, close):
+        """
+        Return a connection to a driver pool, close it if close.
+        """
+
+        raise NotImplementedError
+
+    def pool_closeall(self, pool):
+        """
+        Close the connections of a driver pool.
+        """
+
+        raise NotImplementedError
+
+    def sql(self, sql):
+        """
+        Statement with %s placeholders in the parameter style of the driver.
+        """
+
+        return sql
+
+    def connection_key(self, cnx):
+        """
+        Key of the server session of a connection. Prepared statements live as long as the session,
+        a reconnect gets a new key, a pooled connection keeps its key between checkouts.
+        """
+
+        return id(cnx)
+
+    def execute(self, cnx, sql, params, name, statements):
+        """
+        Execute a statement with bound parameters.
+
+        Parameters
+        ----------
+        cnx: connection
+            connection to HS
+        sql: str
+            statement with %s placeholders
+        params: list
+            values of the placeholders
+        name: str
+            name of the prepared statement, None - do not prepare
+        statements: dict
+            prepared statements of the connection {name: (sql, cursor)}
+        Returns
+        -------
+        cursor
+            cursor with the result of the statement
+        """
+
+        cursor = cnx.cursor()
+        cursor.execute(self.sql(sql), params)
+        return cursor
+
+    def stream_cursor(self, cnx, chunk_size):
+        """
+        Cursor whose result is fetched chunk_size rows at a time
+        without holding all of it in memory.
+        """
+
+        return cnx.cursor()
+
+    def close_stream(self, cnx, cursor, exhausted):
+        """
+        Release a cursor of stream_cursor, exhausted - all rows were fetched.
+        """
+
+        cursor.close()
+
+    def epoch_us(self, column):
+        """
+        SQL expression of a timestamp column as an integer number of microseconds since 1970-01-01.
+        """
+
+        raise NotImplementedError
+
+    def mogrify(self, cnx, sql, params):
+        """
+        Statement with the parameters inlined, for COPY.
+        """
+
+        raise NotImplementedError
+
+    def copy_to(self, cnx, select, options, f):
+        """
+        Write the result of a SELECT to a file object with COPY ... TO STDOUT WITH (options).
+        """
+
+        raise NotImplementedError
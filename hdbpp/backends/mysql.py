@@ -0,0 +1,87 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import itertools
+import mysql.connector
+import mysql.connector.pooling
+
+from . import base
+
+# Unique names of MySQL pools, mysql.connector keeps pools by name
+_pool_ids = itertools.count()
+
+class Backend(base.Backend):
+    """
+    MySQL / MariaDB with mysql.connector: server-side prepared cursors,
+    unbuffered cursors for streaming, a row per element of spectrums and images.
+    """
+
+    name = "mysql"
+    Error = (mysql.connector.Error, )
+    Disconnected = (mysql.connector.InterfaceError, mysql.connector.OperationalError)
+    pooled = True
+
+    select_att_conf_regexp = "SELECT * FROM att_conf WHERE att_name RLIKE %s"
+    replace_att_conf = "REPLACE INTO att_conf(att_conf_data_type_id, att_name, facility, domain, family, member, name) " \
+        "VALUES(%s, %s, %s, %s, %s, %s, %s)"
+    list_tables = "SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE()"
+
+    def connect(self, host, user, password, database):
+        return mysql.connector.connect(host=host, user=user, password=password, database=database)
+
+    def create_pool(self, host, user, password, database, size):
+        # The session is not reset on return, so the prepared statements of the connection survive
+        return mysql.connector.pooling.MySQLConnectionPool(pool_name="hdbpp_{0}".format(next(_pool_ids)),
+            pool_size=size, pool_reset_session=False, host=host, user=user, password=password, database=database)
+
+    def pool_getconn(self, pool, health_check, discard):
+        cnx = pool.get_connection()
+        if health_check and not cnx.is_connected() :
+            # A new session, the prepared statements of the old one are gone
+            discard(cnx)
+            cnx.reconnect(attempts=1)
+        return cnx
+
+    def pool_putconn(self, pool, cnx, close):
+        if close :
+            # Drop the physical connection, the pool opens a new one on demand
+            cnx.disconnect()
+        else :
+            cnx.consume_results()
+            # End the transaction: the next user must not see the snapshot of this one
+            cnx.rollback()
+        # Returns the connection to the pool
+        cnx.close()
+
+    def pool_closeall(self, pool):
+        # mysql.connector closes only the connections that are in the pool now
+        pool._remove_connections()
+
+    def connection_key(self, cnx):
+        return cnx.connection_id
+
+    def execute(self, cnx, sql, params, name, statements):
+        if name == None :
+            cursor = cnx.cursor()
+            cursor.execute(sql, params)
+            return cursor
+
+        if name not in statements :
+            # The prepared cursor re-prepares the statement unless it gets the same sql object
+            statements[name] = (sql, cnx.cursor(prepared=True))
+
+        sql, cursor = statements[name]
+        cursor.execute(sql, params)
+        return cursor
+
+    def stream_cursor(self, cnx, chunk_size):
+        return cnx.cursor(buffered=False)
+
+    def close_stream(self, cnx, cursor, exhausted):
+        # An unbuffered result must be read to the end before the connection can be reused
+        if not exhausted :
+            cnx.consume_results()
+        cursor.close()
+
+    def epoch_us(self, column):
+        return "TIMESTAMPDIFF(MICROSECOND, '1970-01-01 00:00:00', {0})".format(column)
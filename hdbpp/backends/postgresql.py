@@ -0,0 +1,122 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import re
+import itertools
+import psycopg2
+import psycopg2.pool
+
+from . import base
+
+# Unique names for server-side cursors
+_cursor_ids = itertools.count()
+
+def _numbered_params(sql):
+    """
+    Replace the %s placeholders of a statement with the $1, $2, ... placeholders of PREPARE.
+    """
+
+    n = itertools.count(1)
+    return re.sub("%s", lambda m: "$" + str(next(n)), sql)
+
+class Backend(base.Backend):
+    """
+    PostgreSQL with psycopg2: PREPARE/EXECUTE, named server-side cursors for streaming,
+    native arrays of spectrums and images, COPY for bulk reads.
+    """
+
+    name = "postgresql"
+    Error = (psycopg2.Error, )
+    Disconnected = (psycopg2.InterfaceError, psycopg2.OperationalError)
+    pooled = True
+    native_arrays = True
+    has_copy = True
+
+    select_att_conf_regexp = "SELECT * FROM att_conf WHERE att_name ~* %s"
+    # att_name is unique, the attribute keeps its att_conf_id
+    replace_att_conf = "INSERT INTO att_conf(att_conf_data_type_id, att_name, facility, domain, family, member, name) " \
+        "VALUES(%s, %s, %s, %s, %s, %s, %s) ON CONFLICT (att_name) DO UPDATE SET " \
+        "att_conf_data_type_id = EXCLUDED.att_conf_data_type_id, facility = EXCLUDED.facility, domain = EXCLUDED.domain, " \
+        "family = EXCLUDED.family, member = EXCLUDED.member, name = EXCLUDED.name"
+    list_tables = "SELECT c.relname FROM pg_class c WHERE c.relnamespace = current_schema()::regnamespace " \
+        "AND c.relkind IN ('r', 'p') AND NOT c.relispartition"
+
+    def connect(self, host, user, password, database):
+        return psycopg2.connect(dbname=database, user=user, password=password, host=host)
+
+    def create_pool(self, host, user, password, database, size):
+        # psycopg2 keeps a returned connection only while the pool holds fewer than minconn,
+        # so all size connections are opened now and kept between checkouts
+        return psycopg2.pool.ThreadedConnectionPool(size, size, dbname=database, user=user, password=password, host=host)
+
+    def pool_getconn(self, pool, health_check, discard):
+        cnx = pool.getconn()
+        if health_check and not self._is_alive(cnx) :
+            discard(cnx)
+            pool.putconn(cnx, close=True)
+            cnx = pool.getconn()
+        return cnx
+
+    def pool_putconn(self, pool, cnx, close):
+        pool.putconn(cnx, close=close)
+
+    def pool_closeall(self, pool):
+        pool.closeall()
+
+    def _is_alive(self, cnx):
+        """
+        Check the connection with a trivial query.
+        """
+
+        if cnx.closed :
+            return False
+
+        try:
+            cursor = cnx.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            cnx.rollback()
+            return True
+        except self.Disconnected:
+            return False
+
+    def connection_key(self, cnx):
+        return cnx.get_backend_pid()
+
+    def execute(self, cnx, sql, params, name, statements):
+        cursor = cnx.cursor()
+        if name == None :
+            cursor.execute(sql, params)
+            return cursor
+
+        if name not in statements :
+            cursor.execute("PREPARE {0} AS {1}".format(name, _numbered_params(sql)))
+            statements[name] = (sql, None)
+
+        if len(params) == 0 :
+            cursor.execute("EXECUTE {0}".format(name))
+        else :
+            cursor.execute("EXECUTE {0} ({1})".format(name, ", ".join(["%s"] * len(params))), params)
+        return cursor
+
+    def stream_cursor(self, cnx, chunk_size):
+        # A named cursor lives on the server, rows are transferred chunk_size at a time
+        cursor = cnx.cursor(name="hdbpp_archive_{0}".format(next(_cursor_ids)))
+        cursor.itersize = chunk_size
+        return cursor
+
+    def close_stream(self, cnx, cursor, exhausted):
+        cursor.close()
+        # A named cursor keeps the transaction open until it ends
+        cnx.commit()
+
+    def epoch_us(self, column):
+        return "CAST(EXTRACT(EPOCH FROM {0}) * 1000000 AS BIGINT)".format(column)
+
+    def mogrify(self, cnx, sql, params):
+        return cnx.cursor().mogrify(sql, params).decode()
+
+    def copy_to(self, cnx, select, options, f):
+        cursor = cnx.cursor()
+        cursor.copy_expert("COPY ({0}) TO STDOUT WITH ({1})".format(select, options), f)
+        cnx.commit()
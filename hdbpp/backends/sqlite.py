@@ -0,0 +1,39 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import re
+import sqlite3
+import datetime
+
+from . import base
+
+class Backend(base.Backend):
+    """
+    SQLite file used as a local stand-in of HS in tests and benchmarks.
+    TIMESTAMP columns are read as datetime, REGEXP matches case-insensitively like RLIKE.
+    One connection, no pool; sqlite3 keeps its own cache of prepared statements.
+    """
+
+    name = "sqlite"
+    Error = (sqlite3.Error, )
+
+    select_att_conf_regexp = "SELECT * FROM att_conf WHERE att_name REGEXP %s"
+    replace_att_conf = "REPLACE INTO att_conf(att_conf_data_type_id, att_name, facility, domain, family, member, name) " \
+        "VALUES(%s, %s, %s, %s, %s, %s, %s)"
+    list_tables = "SELECT name FROM sqlite_master WHERE type = 'table'"
+
+    def connect(self, host, user, password, database):
+        sqlite3.register_adapter(datetime.datetime, lambda d: d.isoformat(" "))
+        sqlite3.register_converter("TIMESTAMP", lambda b: datetime.datetime.fromisoformat(b.decode()))
+
+        cnx = sqlite3.connect(database, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        cnx.create_function("REGEXP", 2, lambda pattern, value: value != None and re.search(pattern, value, re.I) != None, deterministic=True)
+
+        return cnx
+
+    def sql(self, sql):
+        return sql.replace("%s", "?")
+
+    def epoch_us(self, column):
+        # Timestamps are stored as 'YYYY-MM-DD HH:MM:SS[.ffffff]', the fraction is padded to 6 digits
+        return "(CAST(ROUND((julianday(substr({0}, 1, 19)) - 2440587.5) * 86400) AS INTEGER) * 1000000 + CAST(substr({0} || '000000', 21, 6) AS INTEGER))".format(column)
@@ -0,0 +1,143 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+from collections import OrderedDict
+
+class MetadataCache():
+    """
+    In-process cache of HDB++ metadata (att_conf and att_conf_data_type rows).
+    Entries expire after ttl seconds, the least recently used entries are evicted
+    when the cache holds more than maxsize entries.
+
+    Attributes
+    ----------
+    ttl: float
+        lifetime of an entry in seconds, None - entries do not expire
+    maxsize: int
+        maximum number of entries, 0 - the cache is disabled
+    hits: int
+        number of lookups answered from the cache
+    misses: int
+        number of lookups that had to go to the database
+    """
+
+    def __init__(self, ttl = 300, maxsize = 10000):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        ttl: float
+            lifetime of an entry in seconds, None - entries do not expire
+        maxsize: int
+            maximum number of entries, 0 - the cache is disabled
+        """
+
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """
+        Get a value from the cache.
+
+        Parameters
+        ----------
+        key: tuple
+            entry key
+        Returns
+        -------
+        object
+            cached value
+        None
+            if there is no entry or it has expired
+        """
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry != None and (entry[0] == None or entry[0] > time.monotonic()) :
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            if entry != None :
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """
+        Put a value into the cache. None values are not cached.
+
+        Parameters
+        ----------
+        key: tuple
+            entry key
+        value: object
+            value to store
+        """
+
+        if value == None or self.maxsize == 0 :
+            return
+
+        expires = None
+        if self.ttl != None :
+            expires = time.monotonic() + self.ttl
+
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize :
+                self._data.popitem(last=False)
+
+    def reserve(self, count):
+        """
+        Raise maxsize so that count more entries fit without evicting any,
+        for bulk loads that must be kept whole. A disabled cache stays disabled.
+
+        Parameters
+        ----------
+        count: int
+            number of entries about to be added
+        """
+
+        with self._lock:
+            if self.maxsize != 0 and len(self._data) + count > self.maxsize :
+                self.maxsize = len(self._data) + count
+
+    def invalidate(self, key = None):
+        """
+        Remove an entry from the cache.
+
+        Parameters
+        ----------
+        key: tuple
+            entry key, None - clear the whole cache
+        """
+
+        with self._lock:
+            if key == None :
+                self._data.clear()
+            else :
+                self._data.pop(key, None)
+
+    def stats(self):
+        """
+        Cache counters.
+
+        Returns
+        -------
+        dict
+            hits, misses and the current number of entries
+        """
+
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
@@ -0,0 +1,197 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class Decimator():
+    """
+    Streaming reduction of a time series to about n_out points for plotting.
+    The time range is split into buckets in advance, every chunk of samples only
+    updates per-bucket state (minimum, maximum, sums for the average), so memory
+    depends on n_out and not on the number of samples.
+
+    "minmax" keeps the minimum and the maximum of n_out / 2 buckets.
+    "lttb" is MinMaxLTTB: the min/max of ratio times finer buckets are the candidates,
+    then Largest-Triangle-Three-Buckets picks one of them per bucket, with the exact
+    average of the next bucket as the third point.
+
+    Attributes
+    ----------
+    count: int
+        number of samples seen, NaN values are skipped
+
+    Methods
+    -------
+    update (t, v)
+        Account a chunk of samples
+    result ()
+        The decimated series
+    """
+
+    def __init__(self, t_from, t_to, n_out = 2000, method = "lttb", ratio = 4):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        t_from: int
+            start of the time range, microseconds since 1970
+        t_to: int
+            end of the time range, microseconds since 1970
+        n_out: int
+            maximum number of points of the result
+        method: str
+            "lttb" or "minmax"
+        ratio: int
+            "lttb": number of min/max buckets per output bucket
+        """
+
+        if numpy == None :
+            raise ImportError("numpy is required for the decimation")
+
+        if method not in ("lttb", "minmax") :
+            raise ValueError("unsupported method: {0}".format(method))
+
+        if n_out < (3 if method == "lttb" else 2) :
+            raise ValueError("too few points: {0}".format(n_out))
+
+        self.method = method
+        self.n_out = n_out
+        self.ratio = ratio if method == "lttb" else 1
+        self.t_from = int(t_from)
+        self.span = max(int(t_to) - self.t_from, 1)
+        self.count = 0
+
+        # LTTB keeps the first and the last sample, the other points are one per bucket
+        self.n_buckets = (n_out - 2) if method == "lttb" else n_out // 2
+        nb = self.n_buckets * self.ratio
+
+        self._min_t = numpy.zeros(nb, dtype="int64")
+        self._min_v = numpy.full(nb, numpy.inf)
+        self._max_t = numpy.zeros(nb, dtype="int64")
+        self._max_v = numpy.full(nb, -numpy.inf)
+        self._n = numpy.zeros(nb, dtype="int64")
+        self._sum_t = numpy.zeros(nb)
+        self._sum_v = numpy.zeros(nb)
+
+        self._first = None
+        self._last = None
+
+    def update(self, t, v):
+        """
+        Account a chunk of samples.
+
+        Parameters
+        ----------
+        t: numpy.ndarray
+            int64 times, microseconds since 1970, in any order
+        v: numpy.ndarray
+            values, NaN are skipped
+        """
+
+        v = numpy.asarray(v, dtype="float64")
+        t = numpy.asarray(t, dtype="int64")
+        keep = ~numpy.isnan(v)
+        t = t[keep]
+        v = v[keep]
+        if len(t) == 0 :
+            return
+
+        self.count += len(t)
+        nb = len(self._n)
+
+        # Float arithmetic, (t - t_from) * nb may not fit into int64
+        b = numpy.clip(((t - self.t_from) / self.span * nb).astype("int64"), 0, nb - 1)
+
+        # Sorted by bucket then value: the first of a bucket is its minimum, the last its maximum
+        order = numpy.lexsort((v, b))
+        bs = b[order]
+        starts = numpy.flatnonzero(numpy.r_[True, bs[1:] != bs[:-1]])
+        ends = numpy.r_[starts[1:] - 1, len(bs) - 1]
+        ub = bs[starts]
+
+        lo = order[starts]
+        better = v[lo] < self._min_v[ub]
+        self._min_v[ub[better]] = v[lo][better]
+        self._min_t[ub[better]] = t[lo][better]
+
+        hi = order[ends]
+        better = v[hi] > self._max_v[ub]
+        self._max_v[ub[better]] = v[hi][better]
+        self._max_t[ub[better]] = t[hi][better]
+
+        self._n += numpy.bincount(b, minlength=nb)
+        self._sum_t += numpy.bincount(b, weights=(t - self.t_from).astype("float64"), minlength=nb)
+        self._sum_v += numpy.bincount(b, weights=v, minlength=nb)
+
+        i = numpy.argmin(t)
+        if self._first == None or t[i] < self._first[0] :
+            self._first = (int(t[i]), float(v[i]))
+        i = numpy.argmax(t)
+        if self._last == None or t[i] > self._last[0] :
+            self._last = (int(t[i]), float(v[i]))
+
+    def _candidates(self, lo, hi):
+        """
+        Min/max points of the fine buckets lo..hi-1 in time order.
+        """
+
+        n = self._n[lo:hi] > 0
+        t = numpy.concatenate([self._min_t[lo:hi][n], self._max_t[lo:hi][n]])
+        v = numpy.concatenate([self._min_v[lo:hi][n], self._max_v[lo:hi][n]])
+        t, i = numpy.unique(t, return_index=True)
+        return t, v[i]
+
+    def result(self):
+        """
+        The decimated series.
+
+        Returns
+        -------
+        tuple
+            (int64 times in microseconds, float64 values), sorted by time
+        """
+
+        if self.count == 0 :
+            return numpy.empty(0, dtype="int64"), numpy.empty(0)
+
+        if self.method == "minmax" :
+            return self._candidates(0, len(self._n))
+
+        r = self.ratio
+        buckets = [j for j in range(self.n_buckets) if self._n[j * r:(j + 1) * r].sum() > 0]
+
+        # Average point of every non-empty bucket
+        avg_t = []
+        avg_v = []
+        for j in buckets:
+            n = self._n[j * r:(j + 1) * r].sum()
+            avg_t.append(self._sum_t[j * r:(j + 1) * r].sum() / n + self.t_from)
+            avg_v.append(self._sum_v[j * r:(j + 1) * r].sum() / n)
+
+        out_t = [self._first[0]]
+        out_v = [self._first[1]]
+        a_t, a_v = float(self._first[0]), self._first[1]
+        for k, j in enumerate(buckets):
+            if k + 1 < len(buckets) :
+                c_t, c_v = avg_t[k + 1], avg_v[k + 1]
+            else :
+                c_t, c_v = float(self._last[0]), self._last[1]
+
+            t, v = self._candidates(j * r, (j + 1) * r)
+            # Doubled area of the triangle (a, candidate, c)
+            area = numpy.abs((a_t - c_t) * (v - a_v) - (a_t - t) * (c_v - a_v))
+            i = int(numpy.argmax(area))
+            if t[i] != out_t[-1] and t[i] != self._last[0] :
+                out_t.append(int(t[i]))
+                out_v.append(float(v[i]))
+            a_t, a_v = float(t[i]), float(v[i])
+
+        if self._last[0] != out_t[-1] :
+            out_t.append(self._last[0])
+            out_v.append(self._last[1])
+
+        return numpy.array(out_t, dtype="int64"), numpy.array(out_v)
@@ -0,0 +1,338 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import json
+import hashlib
+import datetime
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Suffix of the field holding the mask of a masked column in a chunk file
+_MASK = "__mask"
+
+def _now_us():
+    """
+    Current time in microseconds since 1970, in the same local clock as the timestamps of HS.
+    """
+    
+    return (datetime.datetime.now() - datetime.datetime(1970, 1, 1)) // datetime.timedelta(microseconds=1)
+
+def source_name(dbtype, host, database):
+    """
+    Directory name of a database of HS in the cache: the same att_conf_id in two
+    databases is a different attribute.
+
+    Returns
+    -------
+    str
+        for example "mysql_172.18.0.7_hdbpp_3f2a9c01d4e7"
+    """
+    
+    identity = "{0}://{1}/{2}".format(dbtype, host, database)
+    readable = re.sub(r"[^A-Za-z0-9.-]+", "_", "{0}_{1}_{2}".format(dbtype, host, os.path.basename(str(database))))
+    
+    # The hash keeps apart names that differ only in the replaced characters
+    return "{0}_{1}".format(readable[:64], hashlib.sha1(identity.encode()).hexdigest()[:12])
+
+class ArchiveCache():
+    """
+    Persistent local cache of closed time chunks of attribute history.
+    History older than a few minutes does not change, so a chunk read once from HS
+    is kept on disk as a NumPy file (memory-mapped on read) keyed by
+    (database, chunk length, att_conf_id, chunk start) and later reads only fetch
+    the missing chunks and the live tail. The least recently used chunks are evicted
+    when the cache grows over max_bytes. One directory can be shared by several
+    databases (see source_name) and chunk lengths. The column arrays of
+    get_archive_array and the rows of get_archive are kept apart (kind).
+    Note:
+        The cache only knows the TTLs set through it (HDBPP.archiving_set_ttl or set_ttl).
+        A TTL changed elsewhere, by another client or in the configuration of AS, is not
+        seen: chunks HS has already deleted are served until they are evicted or invalidated.
+
+    Attributes
+    ----------
+    path: str
+        cache directory
+    chunk_us: int
+        length of a chunk, microseconds
+    tail_us: int
+        chunks ending later than now - tail are not cached, microseconds
+    max_bytes: int
+        maximum size of the cache on disk
+
+    Methods
+    -------
+    load (source, att_conf_id, start, kind)
+        Get a cached chunk
+    store (source, att_conf_id, start, columns, kind)
+        Put a chunk into the cache
+    set_ttl (source, att_conf_id, ttl)
+        Remember the TTL of an attribute and drop the chunks it deletes
+    invalidate (source, att_conf_id)
+        Drop cached chunks
+    """
+
+    def __init__(self, path, chunk_hours = 24, tail_minutes = 5, max_bytes = 1024 * 1024 * 1024):
+        """
+        Class constructor. Creates the cache directory if there is none.
+
+        Parameters
+        ----------
+        path: str
+            cache directory
+        chunk_hours: float
+            length of a chunk, hours
+        tail_minutes: float
+            history younger than this is always read from HS, minutes
+        max_bytes: int
+            maximum size of the cache on disk
+        """
+
+        if numpy == None :
+            raise ImportError("numpy is required for the archive cache")
+
+        self.path = path
+        self.chunk_us = int(chunk_hours * 3600 * 1000000)
+        self.tail_us = int(tail_minutes * 60 * 1000000)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+
+        # {"source/att_conf_id": days}
+        self._ttl = {}
+        if os.path.exists(self._ttl_path()) :
+            with open(self._ttl_path()) as f:
+                self._ttl = json.load(f)
+
+        self._size = sum(os.path.getsize(p) for p, mtime in self._files())
+
+    def _ttl_path(self):
+        return os.path.join(self.path, "ttl.json")
+
+    def _chunk_path(self, source, att_conf_id, start, kind = "arrays"):
+        # Chunks of another length cover other time ranges, they are kept apart
+        name = "{0}.npy".format(start) if kind == "arrays" else "{0}.{1}.npy".format(start, kind)
+        return os.path.join(self.path, source, "{0}us".format(self.chunk_us), str(att_conf_id), name)
+
+    def _files(self):
+        """
+        All chunk files of the cache with their modification time.
+        """
+
+        files = []
+        for root, dirs, names in os.walk(self.path):
+            for name in names:
+                if name.endswith(".npy") :
+                    path = os.path.join(root, name)
+                    files.append((path, os.stat(path).st_mtime))
+        return files
+
+    def is_valid(self, source, att_conf_id, start):
+        """
+        Find out if a chunk is not touched by the TTL of the attribute.
+
+        Parameters
+        ----------
+        source: str
+            database of HS, see source_name
+        att_conf_id: int
+            attribute id in HS
+        start: int
+            chunk start, microseconds since 1970
+
+        Returns
+        -------
+        bool
+            False if HS deletes (part of) the chunk
+        """
+
+        ttl = self._ttl.get("{0}/{1}".format(source, att_conf_id))
+        if ttl == None or ttl <= 0 :
+            return True
+
+        return start >= _now_us() - ttl * 24 * 3600 * 1000000
+
+    def load(self, source, att_conf_id, start, kind = "arrays"):
+        """
+        Get a cached chunk.
+
+        Parameters
+        ----------
+        source: str
+            database of HS, see source_name
+        att_conf_id: int
+            attribute id in HS
+        start: int
+            chunk start, microseconds since 1970
+        kind: str
+            "arrays" - columns of get_archive_array, "rows" - rows of get_archive
+
+        Returns
+        -------
+        dict
+            column arrays of the chunk
+        None
+            if the chunk is not cached
+        """
+
+        path = self._chunk_path(source, att_conf_id, start, kind)
+        if not self.is_valid(source, att_conf_id, start) or not os.path.exists(path) :
+            return None
+
+        try:
+            data = numpy.load(path, mmap_mode="r")
+        except ValueError:
+            # An empty array can not be memory-mapped
+            data = numpy.load(path)
+        except OSError:
+            return None
+
+        # Recently used chunks are evicted last
+        os.utime(path)
+
+        columns = {}
+        for name in data.dtype.names:
+            if name.endswith(_MASK) :
+                continue
+            columns[name] = data[name]
+            if name + _MASK in data.dtype.names :
+                columns[name] = numpy.ma.MaskedArray(data[name], mask=data[name + _MASK])
+
+        return columns
+
+    def store(self, source, att_conf_id, start, columns, kind = "arrays"):
+        """
+        Put a closed chunk into the cache.
+
+        Parameters
+        ----------
+        source: str
+            database of HS, see source_name
+        att_conf_id: int
+            attribute id in HS
+        start: int
+            chunk start, microseconds since 1970
+        columns: dict
+            column arrays of the chunk, numeric only; the masks of numpy.ma.MaskedArray
+            columns are kept
+        kind: str
+            "arrays" - columns of get_archive_array, "rows" - rows of get_archive
+        """
+
+        if not self.is_valid(source, att_conf_id, start) :
+            return
+
+        # A masked column is stored as its data and a bool column of its mask
+        fields = {}
+        for name, array in columns.items():
+            if isinstance(array, numpy.ma.MaskedArray) :
+                fields[name] = array.data
+                fields[name + _MASK] = numpy.ma.getmaskarray(array)
+            else :
+                fields[name] = array
+
+        dtype = [(name, array.dtype) for name, array in fields.items()]
+        if any(dt.hasobject for name, dt in dtype) :
+            return
+
+        count = len(next(iter(fields.values())))
+        data = numpy.empty(count, dtype=dtype)
+        for name, array in fields.items():
+            data[name] = array
+
+        path = self._chunk_path(source, att_conf_id, start, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write under a temporary name so that a reader never sees half a file
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            numpy.save(f, data)
+
+        with self._lock:
+            if os.path.exists(path) :
+                self._size -= os.path.getsize(path)
+            os.replace(tmp, path)
+            self._size += os.path.getsize(path)
+        self._evict()
+
+    def _evict(self):
+        """
+        Remove the least recently used chunks until the cache fits into max_bytes.
+        """
+
+        with self._lock:
+            if self._size <= self.max_bytes :
+                return
+
+            for path, mtime in sorted(self._files(), key=lambda f: f[1]):
+                if self._size <= self.max_bytes :
+                    break
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                    self._size -= size
+                except OSError:
+                    pass
+
+    def set_ttl(self, source, att_conf_id, ttl):
+        """
+        Remember the TTL of an attribute and drop the chunks that HS will delete.
+
+        Parameters
+        ----------
+        source: str
+            database of HS, see source_name
+        att_conf_id: int
+            attribute id in HS
+        ttl: int
+            number of days the history is kept, 0 - forever
+        """
+
+        with self._lock:
+            self._ttl["{0}/{1}".format(source, att_conf_id)] = int(ttl)
+            with open(self._ttl_path(), "w") as f:
+                json.dump(self._ttl, f)
+
+        self.invalidate(source, att_conf_id, only_expired=True)
+
+    def invalidate(self, source = None, att_conf_id = None, only_expired = False):
+        """
+        Drop cached chunks.
+
+        Parameters
+        ----------
+        source: str
+            database of HS (see source_name), None - all databases
+        att_conf_id: int
+            attribute id in HS, None - all attributes
+        only_expired: bool
+            drop only the chunks touched by the TTL of the attribute
+        """
+
+        with self._lock:
+            for path, mtime in self._files():
+                # <path>/<source>/<chunk length>/<att_conf_id>/<start>[.<kind>].npy
+                parts = os.path.relpath(path, self.path).split(os.sep)
+                if len(parts) != 4 :
+                    continue
+                chunk_source, chunk_id, name = parts[0], int(parts[2]), parts[3]
+                if source != None and chunk_source != source :
+                    continue
+                if att_conf_id != None and chunk_id != att_conf_id :
+                    continue
+                if only_expired and self.is_valid(chunk_source, chunk_id, int(name.split(".")[0])) :
+                    continue
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                    self._size -= size
+                except OSError:
+                    pass
@@ -0,0 +1,215 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import csv
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Columns of an exported chunk, value_w is empty for read-only attributes
+_COLUMNS = ["attr", "data_time", "value_r", "value_w", "quality"]
+
+class _CsvWriter():
+    """
+    Appends chunks to a CSV file: attr, data_time (ISO), value_r, value_w, quality.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "w", newline="")
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(_COLUMNS)
+
+    def write(self, attr, chunk):
+        n = len(chunk["data_time"])
+        times = numpy.datetime_as_string(chunk["data_time"].view("datetime64[us]"))
+        value_w = chunk["value_w"].tolist() if "value_w" in chunk else [None] * n
+        self._csv.writerows(zip([attr] * n, times, chunk["value_r"].tolist(), value_w, chunk["quality"].tolist()))
+
+    def size(self):
+        self._file.flush()
+        return os.fstat(self._file.fileno()).st_size
+
+    def close(self):
+        self._file.close()
+
+class _ParquetWriter():
+    """
+    Appends chunks as row groups of one Parquet file.
+    The values of all attributes are stored as float64, NULL as null.
+    """
+
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("pyarrow is required for the parquet export")
+
+        self._pa = pyarrow
+        self._schema = pyarrow.schema([
+            ("attr", pyarrow.string()),
+            ("data_time", pyarrow.timestamp("us")),
+            ("value_r", pyarrow.float64()),
+            ("value_w", pyarrow.float64()),
+            ("quality", pyarrow.int8()),
+        ])
+        # The file is opened here to know how much has been written
+        self._file = open(path, "wb")
+        self._writer = pyarrow.parquet.ParquetWriter(self._file, self._schema)
+
+    def write(self, attr, chunk):
+        if chunk["value_r"].dtype.hasobject :
+            raise TypeError("string values can not be exported to parquet")
+
+        pa = self._pa
+        n = len(chunk["data_time"])
+        value_w = chunk.get("value_w")
+        table = pa.Table.from_arrays([
+            pa.array([attr] * n, type=pa.string()),
+            pa.array(chunk["data_time"].view("datetime64[us]")),
+            self._values(chunk["value_r"]),
+            self._values(value_w) if value_w is not None else pa.nulls(n, pa.float64()),
+            pa.array(chunk["quality"]),
+        ], schema=self._schema)
+        self._writer.write_table(table)
+
+    def _values(self, array):
+        # Masked integers and booleans: the mask marks the nulls
+        mask = numpy.ma.getmask(array)
+        return self._pa.array(numpy.ma.getdata(array).astype("float64"), mask=None if mask is numpy.ma.nomask else mask)
+
+    def size(self):
+        return self._file.tell()
+
+    def close(self):
+        try:
+            self._writer.close()
+        finally:
+            self._file.close()
+
+class _Hdf5Writer():
+    """
+    Appends chunks to resizable datasets of an HDF5 file, one group per attribute:
+    /ECG/ecg/1/Lead/data_time (int64 microseconds since 1970), value_r, value_w (float64,
+    NaN for NULL, or strings), quality (int8). The types are fixed by column, not by the
+    first chunk, so a later chunk with NULL is not cast into an integer dataset.
+    """
+
+    def __init__(self, path):
+        try:
+            import h5py
+        except ImportError:
+            raise ImportError("h5py is required for the hdf5 export")
+
+        self._h5py = h5py
+        self._path = path
+        self._file = h5py.File(path, "w")
+
+    def write(self, attr, chunk):
+        # tango://tangobox:10000/ECG/ecg/1/Lead -> ECG/ecg/1/Lead
+        group = self._file.require_group("/".join(attr.split("/")[-4:]))
+
+        for name, array in chunk.items():
+            if name == "data_time" :
+                array = array.view("int64")
+                dtype = "int64"
+            elif name == "quality" :
+                dtype = "int8"
+            elif array.dtype.hasobject :
+                dtype = self._h5py.string_dtype()
+            else :
+                dtype = "float64"
+                array = numpy.ma.filled(array.astype(dtype), numpy.nan)
+
+            if name not in group :
+                group.create_dataset(name, shape=(0,), maxshape=(None,), dtype=dtype, chunks=True)
+            ds = group[name]
+
+            n = ds.shape[0]
+            ds.resize((n + len(array),))
+            ds[n:] = array
+
+    def size(self):
+        self._file.flush()
+        return os.path.getsize(self._path)
+
+    def close(self):
+        self._file.close()
+
+_WRITERS = {
+    "csv": _CsvWriter,
+    "parquet": _ParquetWriter,
+    "hdf5": _Hdf5Writer,
+}
+
+def export_archive(hdbpp, attrs, date_from, date_to, path, format = "parquet", chunk_size = 100000, progress = None):
+    """
+    Export the history of attributes to a file with bounded memory: the rows are
+    streamed from HS chunk by chunk, converted to columns and appended to the file.
+
+    Parameters
+    ----------
+    hdbpp: HDBPP
+        connected HDBPP object
+    attrs: array(str)
+        array of attribute names
+    date_from: datetime
+        date from which to take history
+    date_to: datetime
+        date by which to take history
+    path: str
+        output file
+    format: str
+        "parquet", "csv" or "hdf5"
+    chunk_size: int
+        maximum number of rows held in memory
+    progress: function
+        called with the report after every chunk
+
+    Returns
+    -------
+    dict
+        "rows", "bytes" written, "seconds", "rows_per_s", "errors": {attribute: error},
+        an attribute that is not a scalar attribute of HS or fails is an error and the others are exported
+    """
+
+    if numpy == None :
+        raise ImportError("numpy is required for the export")
+
+    if format not in _WRITERS :
+        raise ValueError("unsupported format: {0}".format(format))
+
+    start = time.monotonic()
+    report = {"rows": 0, "bytes": 0, "seconds": 0, "rows_per_s": 0, "errors": {}}
+
+    writer = _WRITERS[format](path)
+    try:
+        for a in attrs:
+            try:
+                if hdbpp._array_query(a) == None :
+                    report["errors"][a] = "no scalar attribute in HS"
+                    continue
+                for chunk in hdbpp.iter_archive_array(a, date_from, date_to, chunk_size, epoch=True):
+                    writer.write(hdbpp.attr_set_server(a), chunk)
+
+                    report["rows"] += len(chunk["data_time"])
+                    report["bytes"] = writer.size()
+                    report["seconds"] = time.monotonic() - start
+                    report["rows_per_s"] = report["rows"] / report["seconds"] if report["seconds"] > 0 else 0
+                    if progress :
+                        progress(report)
+            except Exception as err:
+                # One attribute does not stop the export of the others
+                report["errors"][a] = str(err)
+    finally:
+        writer.close()
+
+    report["bytes"] = os.path.getsize(path)
+    report["seconds"] = time.monotonic() - start
+    report["rows_per_s"] = report["rows"] / report["seconds"] if report["seconds"] > 0 else 0
+
+    return report
@@ -0,0 +1,340 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import queue
+import datetime
+import threading
+import contextlib
+import collections
+
+# One sample delivered by Follower
+Sample = collections.namedtuple("Sample", ["attr", "data_time", "value_r", "value_w", "quality"])
+
+class Follower():
+    """
+    Live tail of the history of attributes.
+    The history since a given time is delivered once, after that only new samples:
+    a poller thread reads the rows inserted after a watermark on insert_time,
+    optionally archive events of the devices deliver the samples before they reach HS.
+    Samples of an attribute are delivered in data_time order and only once: a sample
+    not newer than the last delivered one of its attribute is dropped, so the rows
+    read again in the overlap of the polls and the rows of the events already
+    delivered are skipped. The rows are read chunk_size at a time in insert_time order
+    and the samples wait in a bounded queue; when it is full the poller stops reading HS
+    until the consumer catches up, so a long history since a given time does not fill
+    the memory. Without a pool the poller opens its own connection: the single
+    connection of HDBPP is not shared between threads. The transaction of that
+    connection is ended after every read, so each poll sees the rows committed since.
+
+    Attributes
+    ----------
+    attrs: array(str)
+        followed attributes
+    delivered: int
+        number of samples put into the queue
+    dropped: int
+        number of archive events not queued because the queue was full; until the poller
+        has delivered them from HS, the events of that attribute are not queued
+
+    Methods
+    -------
+    get (timeout)
+        Next sample
+    close ()
+        Stop following
+    """
+
+    def __init__(self, hdbpp, attrs, since = None, interval = 1.0, maxsize = 10000, events = False, lag = 2.0, chunk_size = 10000):
+        """
+        Class constructor. Starts the poller thread and subscribes to the events.
+
+        Parameters
+        ----------
+        hdbpp: HDBPP
+            connected HDBPP object
+        attrs: array(str)
+            names of scalar attributes
+        since: datetime/timedelta
+            the history from this time is delivered first, a timedelta is counted back from now,
+            None - only new samples
+        interval: float
+            time between polls of HS, seconds
+        maxsize: int
+            maximum number of samples waiting in the queue
+        events: bool
+            also subscribe to the archive events of the attributes
+        lag: float
+            every poll reads again the rows inserted this long before the watermark,
+            for the transactions that commit late, seconds
+        chunk_size: int
+            maximum number of rows read from HS at a time
+        """
+
+        self.hdbpp = hdbpp
+        self.attrs = list(attrs)
+        self.interval = interval
+        self.lag = datetime.timedelta(seconds=lag)
+        self.chunk_size = chunk_size
+        self.delivered = 0
+        self.dropped = 0
+
+        now = datetime.datetime.now()
+        if since == None :
+            since = now
+        elif isinstance(since, datetime.timedelta) :
+            since = now - since
+
+        self._queue = queue.Queue(maxsize)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        # Per attribute: (att_conf_id, table, value_w is stored), watermark on insert_time, last delivered data_time
+        self._tables = {}
+        self._watermark = {}
+        self._last = {}
+        # Attributes with dropped events: the latest dropped data_time
+        self._gap = {}
+        # Attribute by tango name without the server, for the events
+        self._names = {}
+        for a in self.attrs:
+            full = hdbpp.attr_set_server(a)
+            self._names["/".join(full.split("/")[-4:]).lower()] = a
+
+            result = hdbpp._archive_table(full)
+            if result == None :
+                print("[error]: no attribute in HS: {0}".format(a))
+                continue
+            att_conf_id, table = result
+            table_type = table.split("_")
+            if table_type[1] != "scalar" :
+                print("[error]: not a scalar attribute: {0}".format(a))
+                continue
+            self._tables[a] = (att_conf_id, table, table_type[3] == "rw")
+            self._watermark[a] = since + self.lag
+            # Samples older than since are not delivered
+            self._last[a] = since - datetime.timedelta(microseconds=1) if since < now else now
+
+        # Connection of the poller thread when HDBPP has no pool
+        self._cnx = None
+        if hdbpp.pool == None :
+            self._cnx = hdbpp.backend.connect(hdbpp.host, hdbpp.user, hdbpp.password, hdbpp.database)
+
+        self._subscriptions = []
+        if events :
+            self._subscribe()
+
+        self._thread = threading.Thread(target=self._run, name="hdbpp-follow", daemon=True)
+        self._thread.start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True :
+            try:
+                return self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set() :
+                    raise StopIteration
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, timeout = None):
+        """
+        Next sample.
+
+        Parameters
+        ----------
+        timeout: float
+            how long to wait, None - wait until a sample arrives or the follower is closed
+
+        Returns
+        -------
+        Sample
+            (attr, data_time, value_r, value_w, quality)
+        None
+            if there was no sample in time
+        """
+
+        try:
+            if timeout == None :
+                return next(self)
+            return self._queue.get(timeout=timeout)
+        except (queue.Empty, StopIteration):
+            return None
+
+    def close(self):
+        """
+        Stop the poller and unsubscribe from the events.
+        """
+
+        self._stop.set()
+
+        for dp, event_id in self._subscriptions:
+            try:
+                dp.unsubscribe_event(event_id)
+            except Exception as err:
+                print("[error]: unsubscribe: {0}".format(err))
+        self._subscriptions = []
+
+        if self._thread.is_alive() and self._thread != threading.current_thread() :
+            self._thread.join()
+
+    def _deliver(self, samples, block):
+        """
+        Put the new samples into the queue in data_time order.
+
+        Parameters
+        ----------
+        samples: list
+            Sample objects, in any order
+        block: bool
+            wait for room in the queue, otherwise drop what does not fit
+
+        Returns
+        -------
+        bool
+            False if the follower was closed
+        """
+
+        samples.sort(key=lambda s: s.data_time)
+        for s in samples:
+            while True :
+                # The check and the put are done under the lock, so that the events
+                # and the poller can not deliver the same or an older sample
+                with self._lock:
+                    if s.data_time <= self._last[s.attr] :
+                        break
+                    # After a drop the events would skip the lost samples, the poller delivers them first
+                    if not block and s.attr in self._gap :
+                        self._gap[s.attr] = max(self._gap[s.attr], s.data_time)
+                        self.dropped += 1
+                        break
+                    try:
+                        self._queue.put_nowait(s)
+                    except queue.Full:
+                        if not block :
+                            self._gap[s.attr] = s.data_time
+                            self.dropped += 1
+                            break
+                    else:
+                        self._last[s.attr] = s.data_time
+                        self.delivered += 1
+                        if s.attr in self._gap and s.data_time >= self._gap[s.attr] :
+                            del self._gap[s.attr]
+                        break
+
+                # Backpressure: the poller waits here and does not read HS meanwhile
+                if self._stop.wait(0.05) :
+                    return False
+
+        return True
+
+    @contextlib.contextmanager
+    def _connection(self):
+        """
+        Connection of the poller: its own one, or borrowed from the pool of HDBPP.
+        """
+
+        if self._cnx == None :
+            with self.hdbpp._connection() as cnx:
+                yield cnx
+        else :
+            try:
+                yield self._cnx
+            finally:
+                # The connection is not in autocommit mode: without ending the transaction
+                # a REPEATABLE READ snapshot would never see the new rows
+                self._cnx.rollback()
+
+    def _poll(self):
+        """
+        Read the rows inserted since the watermarks chunk by chunk and deliver the new ones.
+        The connection is not held while the poller waits for room in the queue.
+        """
+
+        h = self.hdbpp
+        now = datetime.datetime.now()
+
+        for a, (att_conf_id, table, rw) in self._tables.items():
+            columns = "data_time, insert_time, value_r, {0}quality".format("value_w, " if rw else "")
+            order = " ORDER BY insert_time, data_time LIMIT {0}".format(int(self.chunk_size))
+            sql = h._archive_sql(table, columns) + order
+            params = [att_conf_id, self._watermark[a] - self.lag, now]
+            name = "hdbpp_follow_" + table
+
+            while True :
+                with self._connection() as cnx:
+                    rows = h._query(cnx, sql, params, name, a)
+
+                samples = []
+                for r in rows:
+                    samples.append(Sample(a, r[0], r[2], r[3] if rw else None, r[-1]))
+                    if r[1] > self._watermark[a] :
+                        self._watermark[a] = r[1]
+
+                if not self._deliver(samples, True) :
+                    return False
+                if len(rows) < self.chunk_size :
+                    break
+
+                # The next chunk starts after the last row, rows with the same insert_time are told apart by data_time
+                last = rows[-1]
+                sql = h._archive_sql(table, columns) + " and (insert_time > %s or data_time > %s)" + order
+                params = [att_conf_id, last[1], now, last[1], last[0]]
+                name = "hdbpp_follow_next_" + table
+
+        return True
+
+    def _run(self):
+        try:
+            while not self._stop.is_set() :
+                try:
+                    if not self._poll() :
+                        break
+                except Exception as err:
+                    print("[error]: follow: {0}".format(err))
+                self._stop.wait(self.interval)
+        finally:
+            if self._cnx != None :
+                h = self.hdbpp
+                h._forget_statements(h._connection_key(self._cnx))
+                self._cnx.close()
+                self._cnx = None
+
+    def _subscribe(self):
+        """
+        Subscribe to the archive events of the followed attributes.
+        """
+
+        import tango
+
+        for a in self._tables:
+            full = self.hdbpp.attr_set_server(a)
+            device, name = full.rsplit("/", 1)
+            try:
+                dp = self.hdbpp.proxies.device(device)
+                event_id = dp.subscribe_event(name, tango.EventType.ARCHIVE_EVENT, self._on_event)
+                self._subscriptions.append((dp, event_id))
+            except tango.DevFailed as df:
+                print("[error]: subscribe to {0}: {1}".format(a, df))
+
+    def _on_event(self, event):
+        """
+        Archive event callback, runs in a thread of Tango and must not block.
+        """
+
+        if event.err or event.attr_value is None :
+            return
+
+        a = self._names.get("/".join(event.attr_name.split("/")[-4:]).lower())
+        if a not in self._tables :
+            return
+
+        v = event.attr_value
+        rw = self._tables[a][2]
+        self._deliver([Sample(a, v.time.todatetime(), v.value, v.w_value if rw else None, int(v.quality))], False)
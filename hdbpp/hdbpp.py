@@ -2,11 +2,294 @@
 # -*- coding: utf-8 -*-
 
 import re
+import time
 import datetime
-import psycopg2
-import mysql.connector
-import json, tango
-from tango import Database, DbDevInfo, DeviceProxy, DeviceAttribute, AttributeProxy, EventType, DeviceData
+import io
+import itertools
+import threading
+import contextlib
+import collections
+import concurrent.futures
+
+from .lazy import LazyModule
+from .backends import get_backend
+from .cache import MetadataCache
+from .pool import ConnectionPool
+from .proxies import ProxyRegistry
+from .diskcache import _now_us, source_name
+from .metrics import statement_label, approx_bytes
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# PyTango is imported when AS or the devices are first used
+tango = LazyModule("tango")
+
+# NumPy type of the value_r/value_w columns by the Tango type of the att_* table
+_NUMPY_TYPES = {
+    "devboolean": "bool",
+    "devuchar": "uint8",
+    "devshort": "int16",
+    "devushort": "uint16",
+    "devlong": "int32",
+    "devulong": "uint32",
+    "devlong64": "int64",
+    "devulong64": "uint64",
+    "devfloat": "float32",
+    "devdouble": "float64",
+    "devstate": "int8",
+    "devenum": "int16",
+    "devstring": "object",
+    "devencoded": "object",
+}
+
+def _column_array(column, dtype):
+    """
+    Convert a value column of a result chunk to a NumPy array of its own type.
+    NULL becomes NaN in floats, integers and booleans keep their type in a
+    numpy.ma.MaskedArray with NULL masked. The type does not depend on the values
+    of the chunk, so every chunk of an attribute has the same type.
+    """
+    
+    if dtype == "object" or numpy.dtype(dtype).kind == "f" :
+        return numpy.array(column, dtype=dtype)
+    
+    if None in column :
+        mask = numpy.fromiter((v == None for v in column), dtype="bool", count=len(column))
+        column = [0 if v == None else v for v in column]
+    else :
+        mask = numpy.zeros(len(column), dtype="bool")
+    
+    return numpy.ma.MaskedArray(numpy.array(column, dtype=dtype), mask=mask)
+
+def _concatenate(arrays):
+    """
+    Concatenate the chunks of a column, the masks of integer columns are kept.
+    """
+    
+    if any(isinstance(a, numpy.ma.MaskedArray) for a in arrays) :
+        return numpy.ma.concatenate(arrays)
+    
+    return numpy.concatenate(arrays)
+
+def _float_array(array):
+    """
+    float64 copy of a value column, masked NULL values become NaN.
+    """
+    
+    return numpy.ma.filled(array.astype("float64"), numpy.nan)
+
+def _quality_array(column):
+    """
+    Convert the quality column of a result chunk to int8, NULL becomes -1.
+    """
+    
+    if None in column :
+        column = [-1 if q == None else q for q in column]
+    
+    return numpy.array(column, dtype="int8")
+
+def _row_columns(rows):
+    """
+    Column arrays of rows of an att_* table for the archive cache: booleans, integers
+    and floats keep their type, timestamps become datetime64[us], NULL is masked.
+    The UTC offsets of aware timestamps are kept in a column of their own.
+    
+    Returns
+    -------
+    dict
+        {"c0": array, "c1": array, ...} in the order of the columns
+    None
+        if a column can not be stored: strings, mixed or out of range values
+    """
+    
+    columns = {}
+    for k, column in enumerate(zip(*rows)):
+        name = "c{0}".format(k)
+        mask = numpy.fromiter((v == None for v in column), dtype="bool", count=len(column))
+        kinds = set(type(v) for v in column if v != None)
+        
+        if len(kinds) == 0 or kinds == {float} :
+            dtype, fill = "float64", 0.0
+        elif kinds == {bool} :
+            dtype, fill = "bool", False
+        elif kinds == {int} :
+            dtype, fill = "int64", 0
+        elif kinds == {datetime.datetime} :
+            dtype, fill = "datetime64[us]", datetime.datetime(1970, 1, 1)
+            offsets = [v.utcoffset() for v in column if v != None]
+            if any(o != None for o in offsets) :
+                if None in offsets :
+                    return None
+                columns[name + "_tz"] = numpy.ma.MaskedArray(numpy.array([0 if v == None else v.utcoffset().total_seconds() for v in column], dtype="int32"), mask=mask)
+                column = [None if v == None else v.replace(tzinfo=None) for v in column]
+        else :
+            return None
+        
+        try:
+            columns[name] = numpy.ma.MaskedArray(numpy.array([fill if v == None else v for v in column], dtype=dtype), mask=mask)
+        except OverflowError:
+            return None
+    
+    return columns
+
+def _column_rows(columns, keep):
+    """
+    The rows of the keep positions back from the column arrays of _row_columns.
+    """
+    
+    values = []
+    k = 0
+    while "c{0}".format(k) in columns :
+        name = "c{0}".format(k)
+        # Masked values are None, datetime64[us] becomes datetime
+        column = columns[name][keep].tolist()
+        if name + "_tz" in columns :
+            offsets = columns[name + "_tz"][keep].tolist()
+            column = [v if v == None else v.replace(tzinfo=datetime.timezone(datetime.timedelta(seconds=o))) for v, o in zip(column, offsets)]
+        values.append(column)
+        k += 1
+    
+    return list(zip(*values))
+
+def _decode_copy_binary(buf, fields):
+    """
+    Decode the output of COPY ... TO STDOUT WITH (FORMAT binary) whose columns all have
+    a fixed width and no NULL, without building Python rows: every tuple has the same
+    size, so the body is viewed as a NumPy record array.
+    
+    Parameters
+    ----------
+    buf: bytes-like
+        the COPY output
+    fields: list
+        (name, big-endian NumPy type) of the columns, for example ("data_time", ">i8")
+    Returns
+    -------
+    numpy.ndarray
+        record array with one field per column
+    """
+    
+    # Signature, flags, length of the header extension, the extension; the trailer is int16 -1
+    view = memoryview(buf)
+    if len(view) < 21 or bytes(view[:11]) != b"PGCOPY\n\xff\r\n\x00" :
+        raise ValueError("not a binary COPY output")
+    ext = int.from_bytes(view[15:19], "big")
+    body = view[19 + ext:len(view) - 2]
+    
+    # Every tuple: int16 number of fields, then int32 length and the data of each field
+    dtype = [("count", ">i2")]
+    for name, t in fields:
+        dtype += [(name + "_len", ">i4"), (name, t)]
+    dtype = numpy.dtype(dtype)
+    
+    if len(body) % dtype.itemsize != 0 :
+        raise ValueError("binary COPY output with variable width tuples")
+    
+    return numpy.frombuffer(body, dtype=dtype)
+
+def _pivot_elements(n, sample, idx, dim_x, dim_y, values, dtype):
+    """
+    Put the elements of spectrum or image samples into one array in a single vectorized
+    assignment. Shorter samples are padded with NaN for floats, None for strings;
+    integers and booleans are a numpy.ma.MaskedArray with the padding and NULL masked.
+    
+    Parameters
+    ----------
+    n: int
+        number of samples
+    sample: numpy.ndarray
+        sample number of every element
+    idx: numpy.ndarray
+        position of every element in its sample, y * dim_x + x for images
+    dim_x, dim_y: numpy.ndarray
+        dimensions of every sample, dim_y is 0 for spectrums
+    values: numpy.ndarray
+        values of the elements
+    dtype: str
+        NumPy type of the values
+    Returns
+    -------
+    numpy.ndarray
+        (n, max dim_x) for spectrums, (n, max dim_y, max dim_x) for images
+    """
+    
+    def empty(shape):
+        if dtype == "object" :
+            return numpy.full(shape, None, dtype="object")
+        if numpy.dtype(dtype).kind == "f" :
+            return numpy.full(shape, numpy.nan, dtype=dtype)
+        return numpy.ma.masked_all(shape, dtype=dtype)
+    
+    width = int(max(dim_x.max() if len(dim_x) else 0, idx.max() + 1 if len(idx) else 0))
+    
+    if len(dim_y) and dim_y.max() > 0 :
+        w = numpy.maximum(dim_x[sample], 1)
+        height = int(max(dim_y.max(), (idx // w).max() + 1 if len(idx) else 0))
+        out = empty((n, height, int(dim_x.max())))
+        out[sample, idx // w, idx % w] = values
+    else :
+        out = empty((n, width))
+        out[sample, idx] = values
+    
+    return out
+
+def _device_data(arg_type, value):
+    """
+    Command argument of AS.
+    """
+    
+    argIn = tango.DeviceData()
+    argIn.insert(arg_type, value)
+    return argIn
+
+def _parse_status(ret):
+    """
+    Convert the string returned by the AttributeStatus command to a dictionary of statuses.
+    """
+    
+    status = {}
+    
+    # Преобразуем возвращаемую строку статсусов к словарю статусов
+    ret = ret.split("\n")
+    for r in ret:
+        r = re.sub(' +', ' ', r)
+        r = r.split(":")
+        status[r[0].lstrip().rstrip()] = r[1].lstrip().rstrip()
+        
+    return status
+
+# Metadata lookups, also checked by the schema advisor
+_SELECT_ATT_CONF = "SELECT * FROM att_conf WHERE att_name = %s LIMIT 1"
+_SELECT_DATA_TYPE = "SELECT data_type FROM att_conf_data_type WHERE att_conf_data_type_id = %s LIMIT 1"
+_FIRST_INSERT_TIME = "SELECT MIN(insert_time) FROM {0} WHERE att_conf_id = %s"
+_LAST_INSERT_TIME = "SELECT MAX(insert_time) FROM {0} WHERE att_conf_id = %s"
+
+# State lists of the event subscriber and the archiving status of their attributes
+_SNAPSHOT_STATES = [
+    ("AttributeStartedList", "Started"),
+    ("AttributePausedList", "Paused"),
+    ("AttributeStoppedList", "Stopped"),
+]
+
+# Lists of the event subscriber with one value per attribute of AttributeList, and their status keys
+_SNAPSHOT_VALUES = [
+    ("AttributeRecordFreqList", "Record freq"),
+    ("AttributeFailureFreqList", "Failure freq"),
+    ("AttributeEventNumberList", "Event number"),
+    ("AttributeErrorList", "Error"),
+    ("AttributeStrategyList", "Strategy"),
+    ("AttributeTTLList", "TTL"),
+]
+
+# Lists of the event subscriber whose attributes get a True flag
+_SNAPSHOT_FLAGS = [
+    ("AttributeOkList", "Ok"),
+    ("AttributeNokList", "Nok"),
+    ("AttributePendingList", "Pending"),
+]
 
 class HDBPP():
     """
@@ -19,7 +302,10 @@ class HDBPP():
     Attributes
     ----------
     dbtype: str
-        type of database, "mysql" or "postgresql"
+        type of database, "mysql", "postgresql", "sqlite" (local stand-in, database is the file name)
+        or one added with hdbpp.backends.register
+    backend: Backend
+        SQL dialect, driver and fast paths of the database, None until connected
     host: str
          history server base ip address (HS)
     user: str
@@ -32,6 +318,16 @@ class HDBPP():
         the name of the tango Device Server (Archive Server (AS)) that records history
     server_default: str
         the address of the server on which the archived Device Servers are running
+    meta_cache: MetadataCache
+        cache of att_conf and att_conf_data_type lookups
+    pool: ConnectionPool
+        pool of connections to HS, None - one connection is used
+    proxies: ProxyRegistry
+        cache of device and attribute proxies
+    archive_cache: ArchiveCache
+        local disk cache of closed history chunks used by get_archive and get_archive_array, None - no cache
+    metrics: Instrumentation
+        measurements of the SQL statements and Tango commands, None - nothing is measured
         
     Methods
     -------
@@ -47,16 +343,56 @@ class HDBPP():
         Disconnect from HS
     get_att_conf (attr)
         Get attribute information from HS
+    find_att_conf (pattern)
+        Find attributes in HS by regular expression
     replace_att_conf(self, data_type, attr)
         Add attribute to HS. Required for archiving. Adds to hdbpp.att_conf
     get_data_type_id(self, data_format, data_type, writable):
         Get numeric data type id by data_format, data_type and writable.
     get_data_type(att_conf_data_type_id)
         Получить тип атрибута
+    cache_preload ()
+        Load att_conf and att_conf_data_type into the metadata cache
+    cache_invalidate (attr)
+        Drop cached metadata
+    cache_stats ()
+        Metadata cache hit/miss counters
     get_archive (attr, date_from, date_to)
         Get the history of an attribute's persistence
+    iter_archive (attr, date_from, date_to, chunk_size)
+        Stream the history of an attribute in chunks
+    get_archive_many (attrs, date_from, date_to)
+        Get the history of several attributes in one pass
+    get_archive_parallel (attr, date_from, date_to, slice_size, workers)
+        Get the history of an attribute by time slices fetched in parallel
+    get_archive_array (attr, date_from, date_to, epoch)
+        Get the history of an attribute as NumPy column arrays
+    iter_archive_array (attr, date_from, date_to, chunk_size, epoch)
+        Stream the history of an attribute as chunks of NumPy column arrays
+    get_archive_aggregated (attr, date_from, date_to, bucket, funcs)
+        Get the history of an attribute aggregated by time buckets in HS
+    get_archive_matrix (attr, date_from, date_to, column, epoch)
+        Get the history of a spectrum or image attribute as a 2-D or 3-D NumPy array
+    get_archive_copy (attr, date_from, date_to, epoch)
+        Get the history of an attribute as NumPy column arrays with PostgreSQL COPY
+    copy_archive (attr, path, date_from, date_to, format)
+        Write the history of an attribute to a file with PostgreSQL COPY
+    export_archive (attrs, date_from, date_to, path, format)
+        Stream the history of attributes to a CSV, Parquet or HDF5 file
+    follow (attrs, since, interval)
+        Deliver the history of attributes once, then only their new samples
+    get_aligned (attrs, date_from, date_to, grid, method)
+        Get the history of several attributes as one matrix on a shared time index
+    get_archive_decimated (attr, date_from, date_to, n_out, method)
+        Get the history of an attribute reduced to a number of points for plotting
+    check_schema (tables, create_indexes, follow)
+        Check the indexes and the query plans of HS, create the missing indexes
+    maintain_partitions (period, ahead, retention, tables, dry_run)
+        Create future and drop expired time-range partitions of the att_* tables
     archiving_add (attrs)
         Add attributes to AS
+    archiving_add_bulk (dp, attrs)
+        Add many attributes to AS, with a result per attribute
     archiving_pause (attr)
         Pause attribute archiving
     archiving_remove (attr)
@@ -75,8 +411,13 @@ class HDBPP():
         Get an Attribute Archiving Strategy
     archiving_get_ttl (attr)
         Get the number of days the attribute was archived
-    attr_is_archiving (attr)
+    attr_is_archiving (attr, snapshot)
         Find out if the attribute is being archived.
+    archiver_snapshot ()
+        Archiving status of all attributes of AS in one call
+    archiving_start_many, archiving_stop_many, archiving_pause_many,
+    archiving_remove_many, archiving_status_many (attrs)
+        The same commands for many attributes at once, with a result per attribute
     attr_set_period (attr, period, archive_period, archive_abs_change, archive_rel_change)
         Setting the parameters for archiving the attribute.
     attr_get_period (attr)
@@ -85,13 +426,14 @@ class HDBPP():
     
     def __init__(self, dbtype="mysql", host="172.18.0.7", user="tango", password="tango",
 			database="hdbpp", archive_server_name="archiving/hdbpp/eventsubscriber.1", 
-			server_default="tango://tangobox:10000"):
+			server_default="tango://tangobox:10000", cache_ttl=300, cache_size=10000,
+			pool_size=0, pool_timeout=30, proxy_capacity=256, archive_cache=None, metrics=None):
         """
         Class constructor. Set all the necessary attributes for the HDBPP object
         Parameters
         ----------
         dbtype: str
-            type of database, "mysql" or "postgresql"
+            type of database, "mysql", "postgresql" or "sqlite" (local stand-in, database is the file name)
         host: str
             history server base ip address (HS)
         user: str
@@ -104,10 +446,30 @@ class HDBPP():
             the name of the tango Device Server (Archive Server (AS)) that records history
         server_default: str
             the address of the server on which the archived Device Servers are running
+        cache_ttl: float
+            lifetime of cached metadata in seconds, None - never expires
+        cache_size: int
+            maximum number of cached metadata entries, 0 - no caching;
+            cache_preload raises it to hold the whole att_conf table
+        pool_size: int
+            number of pooled connections to HS, 0 - one connection, the object
+            can then be used by one thread only. SQLite always uses one connection
+        pool_timeout: float
+            how many seconds to wait for a free pooled connection
+        proxy_capacity: int
+            maximum number of cached device and attribute proxies
+        archive_cache: ArchiveCache
+            local disk cache of closed history chunks, None - no cache
+        metrics: Instrumentation
+            measurements of the SQL statements and Tango commands, None - nothing is measured
         """
         
-	self.dbtype = dbtype
+        self.dbtype = dbtype
+        self.backend = None
         self.cnx = None
+        self.pool = None
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
         self.archive_server = None
         
         self.host = host
@@ -119,12 +481,21 @@ class HDBPP():
         # "tango://tangobox:10000" is the default server that our servers run on
         self.server_default = server_default
         
+        self.meta_cache = MetadataCache(cache_ttl, cache_size)
+        self.proxies = ProxyRegistry(proxy_capacity)
+        self.archive_cache = archive_cache
+        self.metrics = metrics
+        
+        # Prepared statements of every connection: {connection key: {name: (sql, cursor)}}
+        self._statements = {}
+        self._statements_lock = threading.Lock()
+        
     def __del__(self):
         """
         Class destructor. Close connections if you forgot to do this.
         """
         
-        if self.cnx :
+        if self.cnx or self.pool :
             self.close()
                     
     # If the attribute does not have the server on which it is running, add the default server before.
@@ -179,21 +550,21 @@ class HDBPP():
             True if successful, otherwise False
         """
         
-        if self.dbtype == "mysql" :
-            try:
-                self.cnx = mysql.connector.connect(host=self.host, user=self.user, password=self.password, database=self.database)
-            except mysql.connector.Error as err:
-                print("[error]: connect to {}: {}".format(self.database, err))
-                return False
-        elif self.dbtype == "postgresql" :
-            try:
-                self.cnx = psycopg2.connect(dbname=self.database, user=self.user, password=self.password, host=self.host)
-            except OperationalError as err:
-                print("[error]: connect to {}: {}".format(self.database, err))
-                print_psycopg2_exception(err)
-                return False
-        else :
-            print("[error]: no supported db: {}".format(self.dbtype))
+        # The backend module imports its driver now
+        try:
+            self.backend = get_backend(self.dbtype)
+        except (ValueError, ImportError) as err:
+            print("[error]: {} backend: {}".format(self.dbtype, err))
+            return False
+        
+        try:
+            if self.pool_size > 0 and self.backend.pooled :
+                self.pool = ConnectionPool(self.dbtype, self.host, self.user, self.password, self.database,
+                    self.pool_size, self.pool_timeout, on_discard=self._forget_statements)
+            else :
+                self.cnx = self.backend.connect(self.host, self.user, self.password, self.database)
+        except self.backend.Error as err:
+            print("[error]: connect to {}: {}".format(self.database, err))
             return False
             
         return True
@@ -209,8 +580,8 @@ class HDBPP():
         """
         
         try:
-            self.archive_server = DeviceProxy(self.archive_server_name)
-        except DevFailed as err:
+            self.archive_server = self.proxies.device(self.archive_server_name)
+        except tango.DevFailed as err:
             print("[error]: Failed to create proxy to {}: {}".format(self.archive_server_name, err))
             return False
         
@@ -225,6 +596,25 @@ class HDBPP():
             self.cnx.close()
             self.cnx = None
         
+        if self.pool :
+            self.pool.closeall()
+            self.pool = None
+        
+        self._statements = {}
+    
+    @contextlib.contextmanager
+    def _connection(self):
+        """
+        Connection to HS for the duration of a with block: borrowed from the pool
+        if there is one, otherwise the single connection of the object.
+        """
+        
+        if self.pool :
+            with self.pool.connection() as cnx:
+                yield cnx
+        else :
+            yield self.cnx
+        
     def get_att_conf(self, attr):
         """
         Get information about an attribute from HS. Required to take the archive.
@@ -243,18 +633,142 @@ class HDBPP():
         
         attr = self.attr_set_server(attr)
         
-        cursor = self.cnx.cursor()
+        key = ("att_conf", attr.lower())
+        result = self.meta_cache.get(key)
+        if result != None :
+            return result
         
-        sql = "SELECT * FROM att_conf WHERE att_name RLIKE '{0}' LIMIT 0,1".format(attr)
-
-        cursor.execute(sql)
-                
-        result = cursor.fetchall()
+        with self._connection() as cnx:
+            result = self._query(cnx, _SELECT_ATT_CONF, [attr], "hdbpp_att_conf", attr)
 
         if len(result) == 0 :
             return None
         else :
+            self.meta_cache.set(key, result[0])
             return result[0]
+    
+    def find_att_conf(self, pattern):
+        """
+        Find attributes in HS whose name matches a regular expression.
+        Note:
+            A regular expression can not use the att_name index, use get_att_conf
+            when the exact attribute name is known.
+
+        Parameters
+        ----------
+        pattern: str
+            regular expression, for example 'ECG/ecg/.*/Lead'
+        Returns
+        -------
+        list
+            Fields from att_conf table of every matching attribute
+        """
+        
+        with self._connection() as cnx:
+            return self._query(cnx, self.backend.select_att_conf_regexp, [pattern])
+    
+    def _connection_key(self, cnx):
+        """
+        Key of the server session of a connection. Prepared statements live as long as the session,
+        a reconnect gets a new key, a pooled connection keeps its key between checkouts.
+        """
+        
+        return self.backend.connection_key(cnx)
+    
+    def _sql(self, sql):
+        """
+        Statement with %s placeholders in the parameter style of the driver.
+        """
+        
+        return self.backend.sql(sql)
+    
+    def _execute(self, cnx, sql, params = (), name = None, attr = None):
+        """
+        Execute a statement with bound parameters, see _execute_statement.
+        With metrics the time of the execution is recorded.
+        
+        Returns
+        -------
+        cursor
+            cursor with the result of the statement
+        """
+        
+        if self.metrics == None :
+            return self._execute_statement(cnx, sql, params, name)
+        
+        start = time.perf_counter()
+        try:
+            cursor = self._execute_statement(cnx, sql, params, name)
+        except self.backend.Error as err:
+            self.metrics.record("sql", name or statement_label(sql), time.perf_counter() - start, attr=attr, error=str(err))
+            raise
+        self.metrics.record("sql", name or statement_label(sql), time.perf_counter() - start,
+            cursor.rowcount if cursor.rowcount >= 0 else None, attr=attr)
+        
+        return cursor
+    
+    def _query(self, cnx, sql, params = (), name = None, attr = None):
+        """
+        Execute a statement and fetch all of its rows, see _execute_statement.
+        With metrics the time of the execution and the fetch, the number of rows
+        and their approximate size are recorded.
+        
+        Returns
+        -------
+        list
+            rows of the result
+        """
+        
+        if self.metrics == None :
+            return self._execute_statement(cnx, sql, params, name).fetchall()
+        
+        start = time.perf_counter()
+        try:
+            rows = self._execute_statement(cnx, sql, params, name).fetchall()
+        except self.backend.Error as err:
+            self.metrics.record("sql", name or statement_label(sql), time.perf_counter() - start, attr=attr, error=str(err))
+            raise
+        self.metrics.record("sql", name or statement_label(sql), time.perf_counter() - start, len(rows), approx_bytes(rows), attr)
+        
+        return rows
+    
+    def _execute_statement(self, cnx, sql, params = (), name = None):
+        """
+        Execute a statement with bound parameters.
+        A named statement is prepared on the server once per connection and then
+        only executed by the backend: a prepared cursor on MySQL, PREPARE/EXECUTE
+        on PostgreSQL, SQLite keeps its own cache of prepared statements.
+
+        Parameters
+        ----------
+        cnx: connection
+            connection to HS
+        sql: str
+            statement with %s placeholders
+        params: list
+            values of the placeholders
+        name: str
+            name of the prepared statement, None - do not prepare
+        Returns
+        -------
+        cursor
+            cursor with the result of the statement
+        """
+        
+        statements = None
+        if name != None :
+            with self._statements_lock:
+                statements = self._statements.setdefault(self._connection_key(cnx), {})
+        
+        return self.backend.execute(cnx, sql, params, name, statements)
+    
+    def _forget_statements(self, key):
+        """
+        Drop the prepared statements of a closed or reconnected session of the pool.
+        """
+        
+        with self._statements_lock:
+            self._statements.pop(key, None)
         
     def replace_att_conf(self, data_type, attr):
         """
@@ -277,23 +791,32 @@ class HDBPP():
         
         attr = self.attr_set_server(attr)
         
-        cursor = self.cnx.cursor()
-        
-        attrs = attr.split('/')
+        sql = self.backend.replace_att_conf
         
         try :
-            sql = "REPLACE INTO att_conf(att_conf_data_type_id, att_name, facility, domain, family, member, name) " \
-            "VALUES({0}, '{1}', '{2}', '{3}', '{4}', '{5}', '{6}') ".format(data_type, attr, self.server_default, attrs[3], attrs[4], attrs[5], attrs[6])
-        
-            cursor.execute(sql)
+            with self._connection() as cnx:
+                self._execute(cnx, sql, self._att_conf_row(data_type, attr), attr=attr)
                 
-            self.cnx.commit()
+                cnx.commit()
+            
+            # MySQL REPLACE gives the attribute a new att_conf_id
+            self.cache_invalidate(attr)
             
             return True
-        except mysql.connector.Error as error:
+        except self.backend.Error as error:
             print("[error]: ", sql)
             return False
 
+    def _att_conf_row(self, data_type, attr):
+        """
+        Values of an att_conf row in the order of Backend.replace_att_conf.
+        The attribute name must be full: tango://tangobox:10000/ECG/ecg/1/Lead
+        """
+        
+        attrs = attr.split('/')
+        
+        return [data_type, attr, self.server_default, attrs[3], attrs[4], attrs[5], attrs[6]]
+
     def get_data_type_id(self, data_format, data_type, writable):
         """
         Get numeric data type id by data_format, data_type and writable.
@@ -301,7 +824,7 @@ class HDBPP():
         Parameters
         ----------
         data_format: tango._tango.AttrDataFormat
-            attribute data format, SCALAR or ARRAY (tango._tango.AttrDataFormat.SCALAR)
+            attribute data format, SCALAR, SPECTRUM or IMAGE (tango._tango.AttrDataFormat.SCALAR)
         data_type: tango._tango.CmdArgType
             type of given (tango._tango.CmdArgType.DevString)
         writable: tango._tango.AttrWriteType
@@ -318,8 +841,11 @@ class HDBPP():
         dt = ""
         if (data_format == tango._tango.AttrDataFormat.SCALAR) :
             dt += "scalar_"
-        elif (data_format == tango._tango.AttrDataFormat.ARRAY) :
+        elif (data_format in (tango._tango.AttrDataFormat.SPECTRUM, tango._tango.AttrDataFormat.IMAGE)) :
+            # Spectrums and images share the att_array_* tables
             dt += "array_"
+        else :
+            return 0
             
         dt += "%"
         
@@ -328,17 +854,19 @@ class HDBPP():
         else :
             dt += "_rw"
         
-        cursor = self.cnx.cursor()
+        key = ("data_type_id", dt, int(data_type))
+        result = self.meta_cache.get(key)
+        if result != None :
+            return result
         
-        sql = "SELECT att_conf_data_type_id FROM att_conf_data_type WHERE data_type LIKE '{0}' and tango_data_type = {1}".format(dt, data_type)
-        #print(sql)
-        cursor.execute(sql)
-
-        result = cursor.fetchall()
+        sql = "SELECT att_conf_data_type_id FROM att_conf_data_type WHERE data_type LIKE %s and tango_data_type = %s"
+        with self._connection() as cnx:
+            result = self._query(cnx, sql, [dt, int(data_type)], "hdbpp_data_type_id")
         
         if len(result) == 0 :
             return 0
         else :
+            self.meta_cache.set(key, result[0])
             return result[0]
 
     def get_data_type(self, att_conf_data_type_id):
@@ -357,46 +885,111 @@ class HDBPP():
             in case of error
         """
         
-        cursor = self.cnx.cursor()
+        key = ("data_type", att_conf_data_type_id)
+        result = self.meta_cache.get(key)
+        if result != None :
+            return result
         
-        sql = "SELECT data_type FROM att_conf_data_type WHERE att_conf_data_type_id = {0} LIMIT 0,1".format(att_conf_data_type_id)
-        cursor.execute(sql)
-                
-        result = cursor.fetchall()
+        with self._connection() as cnx:
+            result = self._query(cnx, _SELECT_DATA_TYPE, [att_conf_data_type_id], "hdbpp_data_type")
         
         if len(result) == 0 :
             return None
         else :
+            self.meta_cache.set(key, result[0])
             return result[0]
-               
-    def get_archive(self, attr, date_from = None, date_to = None):
+    
+    def cache_preload(self):
         """
-        Get the history of saving an attribute.
+        Load the whole att_conf and att_conf_data_type tables into the metadata cache,
+        one bulk query per table, so that later lookups do not go to HS.
         Note:
-            With default parameters takes history for all time
+            The maximum size of the cache is raised when the tables do not fit into it,
+            otherwise the least recently used rows would be evicted at once.
+        
+        Returns
+        -------
+        int
+            number of att_conf rows kept in the cache, 0 if the cache is disabled
+        """
+        
+        self._preload_data_types()
+        
+        with self._connection() as cnx:
+            result = self._query(cnx, "SELECT * FROM att_conf")
+        
+        self.meta_cache.reserve(len(result))
+        for r in result:
+            # The second column of att_conf is att_name
+            self.meta_cache.set(("att_conf", r[1].lower()), r)
+        
+        return len(result) if self.meta_cache.maxsize != 0 else 0
+    
+    def _preload_data_types(self):
+        """
+        Load the whole att_conf_data_type table into the metadata cache with one query.
+        """
+        
+        with self._connection() as cnx:
+            rows = self._query(cnx, "SELECT att_conf_data_type_id, data_type, tango_data_type FROM att_conf_data_type")
+        
+        # An entry per row and at most one data_type_id key per row
+        self.meta_cache.reserve(2 * len(rows))
+        
+        data_type_ids = {}
+        for att_conf_data_type_id, data_type, tango_data_type in rows:
+            self.meta_cache.set(("data_type", att_conf_data_type_id), (data_type,))
+            
+            # The same key that get_data_type_id builds, for example ("data_type_id", "scalar_%_ro", 5)
+            dt = data_type.split("_")
+            data_type_ids.setdefault(("data_type_id", dt[0] + "_%_" + dt[-1], int(tango_data_type)), (att_conf_data_type_id,))
+        
+        for key, value in data_type_ids.items():
+            self.meta_cache.set(key, value)
+    
+    def cache_invalidate(self, attr = None):
+        """
+        Drop cached metadata.
 
         Parameters
         ----------
         attr: str
-            attribute name
+            attribute name, None - drop everything
+        """
+        
+        if attr == None :
+            self.meta_cache.invalidate()
+        else :
+            self.meta_cache.invalidate(("att_conf", self.attr_set_server(attr).lower()))
+    
+    def cache_stats(self):
+        """
+        Metadata cache counters.
+
+        Returns
+        -------
+        dict
+            hits, misses and the current number of entries
+        """
+        
+        return self.meta_cache.stats()
+               
+    def _date_range(self, date_from, date_to):
+        """
+        Fill in the default bounds of a history request.
+
+        Parameters
+        ----------
         date_from: datetime
-            date from which to take history
+            date from which to take history, None for all time
         date_to: datetime
-            date by which to take history
+            date by which to take history, None for now
         Returns
         -------
-        array
-            values archive
-        None
-            in case of error
+        tuple
+            (date_from, date_to)
         """
         
-        attr = self.attr_set_server(attr)
-        
-        att_conf_id = 0
-        att_conf_data_type_id = 0
-        table = ''
-        
         # If (date_from && date_to) == None, then we take data for all time
         # Time until which we take data
         if date_to == None :
@@ -407,7 +1000,25 @@ class HDBPP():
         if date_from == None :
             # По умолчанию все данные
             date_from = datetime.datetime(1, 1, 1, 0, 0, 0) 
-            
+        
+        return date_from, date_to
+    
+    def _archive_table(self, attr):
+        """
+        Find the att_conf_id of an attribute and the table its history is stored in.
+
+        Parameters
+        ----------
+        attr: str
+            attribute name
+        Returns
+        -------
+        tuple
+            (att_conf_id, table), for example (5, 'att_scalar_devdouble_ro')
+        None
+            in case of error
+        """
+        
         result = self.get_att_conf(attr)
         if result :
             att_conf_id = result[0]
@@ -422,51 +1033,1528 @@ class HDBPP():
         else:
             return None
         
-        cursor = self.cnx.cursor()
-        sql = "SELECT * FROM {0} WHERE att_conf_id = {1} and (insert_time >= '{2}' and insert_time <= '{3}')".format(table, att_conf_id, date_from, date_to)
+        return att_conf_id, table
+    
+    def _archive_sql(self, table, columns = "*", include_end = True):
+        """
+        Statement reading the history of one attribute from an att_* table.
+        The parameters are att_conf_id, date_from and date_to,
+        date_to is excluded from the range if include_end is False.
+        """
         
-        cursor.execute(sql)
-                
-        result = cursor.fetchall()
-        if len(result) == 0 :
-            return None
-        else :
-            return result
+        return "SELECT {0} FROM {1} WHERE att_conf_id = %s and (insert_time >= %s and insert_time {2} %s)".format(columns, table, "<=" if include_end else "<")
     
-    def archiving_add(self, dp, attrs):
+    def _archive_many_sql(self, table, n):
         """
-        Add attributes to the AS. It must be done if it is not.
-
-        Parameters
-        ----------
-        attrs: array(str)
-            array of attribute names
-
+        Statement reading the history of n attributes stored in one att_* table.
+        The parameters are the n att_conf_id, date_from and date_to.
+        """
+        
+        return "SELECT * FROM {0} WHERE att_conf_id IN ({1}) and (insert_time >= %s and insert_time <= %s)".format(table, ", ".join(["%s"] * n))
+    
+    def _sql_epoch_us(self, column):
+        """
+        SQL expression of a timestamp column as an integer number of microseconds since 1970-01-01.
+        """
+        
+        return self.backend.epoch_us(column)
+    
+    def _sql_aggregate(self, func, column):
+        """
+        SQL expression of an aggregate function over a column of an att_* table.
+        
         Returns
         -------
-        bool
-            True if successful, otherwise False
+        str
+            expression
+        None
+            if the function is not supported
         """
         
-        for i, a in enumerate(attrs):
-            ac = dp.get_attribute_config(attrs[i].split("/")[3])
-            dti = self.get_data_type_id(ac.data_format, ac.data_type, ac.writable)
+        if func in ("min", "max", "avg", "count", "sum") :
+            return "{0}({1})".format(func.upper(), column)
+        
+        if func in ("first", "last") :
+            # Column of the window function of _sql_ordered_values, one value per bucket
+            return "value_" + func
+        
+        return None
+    
+    def _sql_ordered_values(self, table, column, bucket):
+        """
+        Statement reading the history of one attribute from an att_* table with the
+        first and the last value of a column in each bucket by data_time.
+        Window functions are used on all databases, so the values keep their type, strings included;
+        they need MySQL 8.0, MariaDB 10.2 or SQLite 3.25. The parameters are those of _archive_sql.
+        """
+        
+        columns = ["{0} AS bucket".format(bucket), column]
+        for func, order in (("first", "ASC"), ("last", "DESC")):
+            columns.append("FIRST_VALUE({0}) OVER (PARTITION BY {1} ORDER BY data_time {2}) AS value_{3}".format(column, bucket, order, func))
+        
+        return self._archive_sql(table, ", ".join(columns))
+    
+    def _iter_rows(self, sql, params, chunk_size, attr = None):
+        """
+        Execute a statement and yield its result chunk_size rows at a time.
+        MySQL uses an unbuffered cursor, PostgreSQL a named server-side cursor,
+        SQLite steps through the result as it is fetched.
+        With metrics one event is recorded for the whole result, the time the
+        consumer spends between the chunks is not counted.
+        """
+        
+        with self._connection() as cnx:
+            cursor = self.backend.stream_cursor(cnx, chunk_size)
+            
+            exhausted = False
+            seconds = 0.0
+            count = 0
+            nbytes = 0
+            error = None
+            try:
+                start = time.perf_counter()
+                cursor.execute(self._sql(sql), params)
+                while True :
+                    rows = cursor.fetchmany(chunk_size)
+                    seconds += time.perf_counter() - start
+                    if len(rows) == 0 :
+                        exhausted = True
+                        break
+                    if self.metrics != None :
+                        count += len(rows)
+                        nbytes += approx_bytes(rows)
+                    yield rows
+                    start = time.perf_counter()
+            except self.backend.Error as err:
+                error = str(err)
+                raise
+            finally:
+                if self.metrics != None :
+                    self.metrics.record("sql", statement_label(sql), seconds, count, nbytes, attr, error)
+                self.backend.close_stream(cnx, cursor, exhausted)
+               
+    def get_archive(self, attr, date_from = None, date_to = None):
+        """
+        Get the history of saving an attribute.
+        Note:
+            With default parameters takes history for all time.
+            With archive_cache closed chunks of the history are read from the local disk cache.
+
+        Parameters
+        ----------
+        attr: str
+            attribute name
+        date_from: datetime
+            date from which to take history
+        date_to: datetime
+            date by which to take history
+        Returns
+        -------
+        array
+            values archive
+        None
+            in case of error
+        """
+        
+        attr = self.attr_set_server(attr)
+        
+        date_from, date_to = self._date_range(date_from, date_to)
+        
+        result = self._archive_table(attr)
+        if result == None :
+            return None
+        att_conf_id, table = result
+        
+        if self.archive_cache != None :
+            result = self._cached_rows(attr, att_conf_id, table, date_from, date_to)
+        else :
+            with self._connection() as cnx:
+                result = self._query(cnx, self._archive_sql(table), [att_conf_id, date_from, date_to], "hdbpp_archive_" + table, attr)
+        if len(result) == 0 :
+            return None
+        else :
+            return result
+    
+    def get_archive_parallel(self, attr, date_from = None, date_to = None, slice_size = None, workers = None):
+        """
+        Get the history of saving an attribute, split into time slices that are
+        fetched at the same time over several pooled connections.
+        Note:
+            Without a pool of connections the history is fetched by get_archive, with a warning.
+            No more slices are fetched at the same time than the pool has connections.
+
+        Parameters
+        ----------
+        attr: str
+            attribute name
+        date_from: datetime
+            date from which to take history, None - from the first record
+        date_to: datetime
+            date by which to take history
+        slice_size: timedelta
+            length of one slice, None - the range is split into workers slices
+        workers: int
+            number of slices fetched at the same time, at most and by default the pool size
+        Returns
+        -------
+        array
+            values archive, the slices in time order
+        None
+            in case of error
+        """
+        
+        if self.pool == None :
+            print("[warning]: no connection pool, the history of {0} is read serially".format(attr))
+            return self.get_archive(attr, date_from, date_to)
+        
+        attr = self.attr_set_server(attr)
+        
+        result = self._archive_table(attr)
+        if result == None :
+            return None
+        att_conf_id, table = result
+        
+        if date_from == None :
+            # Do not split the centuries before the first record
+            date_from = self._first_insert_time(att_conf_id, table)
+            if date_from == None :
+                return None
+        
+        date_from, date_to = self._date_range(date_from, date_to)
+        
+        # More threads than connections would wait for the pool and time out
+        if workers == None :
+            workers = self.pool.size
+        workers = max(min(workers, self.pool.size), 1)
+        
+        if slice_size == None :
+            slice_size = (date_to - date_from) / workers
+        if slice_size <= datetime.timedelta(0) :
+            slice_size = datetime.timedelta(seconds=1)
+        
+        # [from, to) slices, the last one includes date_to
+        slices = []
+        start = date_from
+        while start + slice_size < date_to :
+            slices.append((start, start + slice_size, False))
+            start += slice_size
+        slices.append((start, date_to, True))
+        
+        def fetch(s):
+            sql = self._archive_sql(table, include_end=s[2])
+            name = "hdbpp_archive_{0}_{1}".format("closed" if s[2] else "open", table)
+            with self._connection() as cnx:
+                return self._query(cnx, sql, [att_conf_id, s[0], s[1]], name, attr)
+        
+        result = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            # map returns the results in the order of the slices
+            for rows in executor.map(fetch, slices):
+                result.extend(rows)
+        
+        if len(result) == 0 :
+            return None
+        else :
+            return result
+    
+    def iter_archive(self, attr, date_from = None, date_to = None, chunk_size = 10000):
+        """
+        Stream the history of saving an attribute in chunks.
+        Unlike get_archive, the rows are not loaded into memory all at once:
+        MySQL uses an unbuffered cursor, PostgreSQL a named server-side cursor,
+        so memory stays flat whatever the time range.
+        Note:
+            With default parameters takes history for all time.
+            While the generator is not exhausted or closed, the connection is busy.
+
+        Parameters
+        ----------
+        attr: str
+            attribute name
+        date_from: datetime
+            date from which to take history
+        date_to: datetime
+            date by which to take history
+        chunk_size: int
+            maximum number of rows in one chunk
+        Yields
+        ------
+        list
+            chunk of rows of the archive table
+        """
+        
+        attr = self.attr_set_server(attr)
+        
+        date_from, date_to = self._date_range(date_from, date_to)
+        
+        result = self._archive_table(attr)
+        if result == None :
+            return
+        att_conf_id, table = result
+        
+        for rows in self._iter_rows(self._archive_sql(table), [att_conf_id, date_from, date_to], chunk_size, attr):
+            yield rows
+    
+    def iter_archive_array(self, attr, date_from = None, date_to = None, chunk_size = 100000, epoch = False):
+        """
+        Stream the history of saving a scalar attribute as chunks of NumPy column arrays.
+        Only the needed columns are read, the time is transferred as an integer.
+        Note:
+            Integer and boolean values keep their type in a numpy.ma.MaskedArray with NULL masked,
+            NULL floats are NaN, NULL quality is -1: every chunk of an attribute has the same types.
+
+        Parameters
+        ----------
+        attr: str
+            attribute name
+        date_from: datetime
+            date from which to take history
+        date_to: datetime
+            date by which to take history
+        chunk_size: int
+            maximum number of rows in one chunk
+        epoch: bool
+            True - data_time as int64 microseconds since 1970, False - as datetime64[us]
+        Yields
+        ------
+        dict
+            arrays "data_time", "value_r", "value_w" (for _rw attributes) and "quality" (int8)
+        """
+        
+        date_from, date_to = self._date_range(date_from, date_to)
+        
+        result = self._array_query(attr)
+        if result == None :
+            return
+        att_conf_id, table, names, dtype = result
+        
+        for chunk in self._iter_arrays(table, att_conf_id, names, dtype, date_from, date_to, True, chunk_size, epoch, attr):
+            yield chunk
+    
+    def get_archive_matrix(self, attr, date_from = None, date_to = None, column = "value_r", epoch = False):
+        """
+        Get the history of saving a spectrum or image attribute as one NumPy array with
+        a row per sample. MySQL stores a row per element (idx, dim_x, dim_y), the rows
+        are pivoted on (data_time, idx) in one vectorized step; PostgreSQL stores
+        native arrays, they are flattened and placed the same way.
+        Note:
+            Samples of different lengths are padded with NaN for floats and None for strings.
+            Integer and boolean values keep their type in a numpy.ma.MaskedArray, the padding
+            and NULL values are masked.
+
+        Parameters
+        ----------
+        attr: str
+            attribute name
+        date_from: datetime
+            date from which to take history
+        date_to: datetime
+            date by which to take history
+        column: str
+            "value_r" or "value_w"
+        epoch: bool
+            True - data_time as int64 microseconds since 1970, False - as datetime64[us]
+        Returns
+        -------
+        dict
+            "data_time" (n), column (n, dim_x) for spectrums or (n, dim_y, dim_x) for images,
+            "dim_x" and "dim_y" (n) of every sample, "quality" (n)
+        None
+            in case of error
+        """
+        
+        if numpy == None :
+            raise ImportError("numpy is required for the NumPy result mode")
+        
+        attr = self.attr_set_server(attr)
+        
+        date_from, date_to = self._date_range(date_from, date_to)
+        
+        result = self._archive_table(attr)
+        if result == None :
+            return None
+        att_conf_id, table = result
+        
+        # att_array_devdouble_rw -> ["att", "array", "devdouble", "rw"]
+        table_type = table.split("_")
+        if table_type[1] != "array" :
+            print("[error]: not an array attribute: {0}".format(attr))
+            return None
+        if column not in ("value_r", "value_w") or (column == "value_w" and table_type[3] != "rw") :
+            print("[error]: wrong column: {0}".format(column))
+            return None
+        
+        dtype = _NUMPY_TYPES.get(table_type[2], "object")
+        suffix = column[-2:]
+        dims = ["dim_x" + suffix, "dim_y" + suffix]
+        
+        if self.backend.native_arrays :
+            names = ["data_time"] + dims + ["quality"]
+            columns = [self._sql_epoch_us("data_time")] + dims + ["quality", column]
+            times, dim_x, dim_y, quality, arrays = [], [], [], [], []
+            for rows in self._iter_rows(self._archive_sql(table, ", ".join(columns)), [att_conf_id, date_from, date_to], 100000, attr):
+                chunk = self._rows_to_arrays([r[:-1] for r in rows], names, "int64", True)
+                times.append(chunk["data_time"])
+                dim_x.append(chunk[dims[0]])
+                dim_y.append(chunk[dims[1]])
+                quality.append(chunk["quality"])
+                for r in rows:
+                    v = r[-1] or []
+                    # A two-dimensional array of an image is stored row by row
+                    if len(v) and isinstance(v[0], list) :
+                        v = list(itertools.chain.from_iterable(v))
+                    arrays.append(v)
+            if len(times) == 0 :
+                return None
+            
+            times = numpy.concatenate(times)
+            lengths = numpy.fromiter((len(v) for v in arrays), dtype="int64", count=len(arrays))
+            values = _column_array(list(itertools.chain.from_iterable(arrays)), dtype)
+            
+            # Element positions, then samples in time order
+            sample = numpy.repeat(numpy.arange(len(times)), lengths)
+            idx = numpy.arange(len(values)) - numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+            order = numpy.argsort(times, kind="stable")
+            rank = numpy.empty(len(order), dtype="int64")
+            rank[order] = numpy.arange(len(order))
+            sample = rank[sample]
+            
+            times = times[order]
+            dim_x = numpy.ma.filled(_concatenate(dim_x), 0)[order]
+            dim_y = numpy.ma.filled(_concatenate(dim_y), 0)[order]
+            quality = numpy.concatenate(quality)[order]
+        else :
+            names = ["data_time", "idx"] + dims + ["quality", column]
+            columns = [self._sql_epoch_us("data_time")] + names[1:]
+            chunks = []
+            for rows in self._iter_rows(self._archive_sql(table, ", ".join(columns)), [att_conf_id, date_from, date_to], 100000, attr):
+                chunk = self._rows_to_arrays([r[:-1] for r in rows], names[:-1], "int64", True)
+                chunk[column] = _column_array([r[-1] for r in rows], dtype)
+                chunks.append(chunk)
+            if len(chunks) == 0 :
+                return None
+            
+            data = {n: _concatenate([c[n] for c in chunks]) for n in names}
+            values = data[column]
+            idx = numpy.ma.filled(data["idx"], 0)
+            
+            # One row per element: the samples are the distinct data_time
+            times, first, sample = numpy.unique(data["data_time"], return_index=True, return_inverse=True)
+            sample = sample.ravel()
+            dim_x = numpy.ma.filled(data[dims[0]][first], 0)
+            dim_y = numpy.ma.filled(data[dims[1]][first], 0)
+            quality = data["quality"][first]
+        
+        return {
+            "data_time": times if epoch else times.view("datetime64[us]"),
+            column: _pivot_elements(len(times), sample, idx, dim_x, dim_y, values, dtype),
+            "dim_x": dim_x,
+            "dim_y": dim_y,
+            "quality": quality,
+        }
+    
+    def _array_query(self, attr):
+        """
+        What to read for the NumPy result mode of a scalar attribute.
+        
+        Returns
+        -------
+        tuple
+            (att_conf_id, table, column names, NumPy type of the values)
+        None
+            in case of error
+        """
+        
+        if numpy == None :
+            raise ImportError("numpy is required for the NumPy result mode")
+        
+        attr = self.attr_set_server(attr)
+        
+        result = self._archive_table(attr)
+        if result == None :
+            return None
+        att_conf_id, table = result
+        
+        # att_scalar_devdouble_rw -> ["att", "scalar", "devdouble", "rw"]
+        table_type = table.split("_")
+        if table_type[1] != "scalar" :
+            print("[error]: not a scalar attribute: {0}".format(attr))
+            return None
+        
+        dtype = _NUMPY_TYPES.get(table_type[2], "object")
+        names = ["data_time", "value_r"]
+        if table_type[3] == "rw" :
+            names.append("value_w")
+        names.append("quality")
+        
+        return att_conf_id, table, names, dtype
+    
+    def _iter_arrays(self, table, att_conf_id, names, dtype, date_from, date_to, include_end, chunk_size, epoch, attr = None):
+        """
+        Read columns of an att_* table chunk by chunk as NumPy arrays.
+        data_time and insert_time are read as integer microseconds.
+        """
+        
+        columns = [self._sql_epoch_us(n) if n in ("data_time", "insert_time") else n for n in names]
+        sql = self._archive_sql(table, ", ".join(columns), include_end)
+        
+        for rows in self._iter_rows(sql, [att_conf_id, date_from, date_to], chunk_size, attr):
+            yield self._rows_to_arrays(rows, names, dtype, epoch)
+    
+    def _rows_to_arrays(self, rows, names, dtype, epoch):
+        """
+        Turn a chunk of (data_time, value_r, [value_w], quality) rows into NumPy column arrays.
+        """
+        
+        chunk = {}
+        for name, column in zip(names, zip(*rows)):
+            if name in ("data_time", "insert_time") :
+                array = numpy.fromiter(column, dtype=numpy.int64, count=len(column))
+                if not epoch :
+                    array = array.view("datetime64[us]")
+            elif name == "quality" :
+                array = _quality_array(column)
+            else :
+                array = _column_array(column, dtype)
+            chunk[name] = array
+        
+        return chunk
+    
+    def get_archive_array(self, attr, date_from = None, date_to = None, epoch = False):
+        """
+        Get the history of saving a scalar attribute as NumPy column arrays.
+        Note:
+            With default parameters takes history for all time.
+            Integer and boolean values keep their type in a numpy.ma.MaskedArray with NULL masked,
+            NULL floats are NaN.
+
+        Parameters
+        ----------
+        attr: str
+            attribute name
+        date_from: datetime
+            date from which to take history
+        date_to: datetime
+            date by which to take history
+        epoch: bool
+            True - data_time as int64 microseconds since 1970, False - as datetime64[us]
+        Returns
+        -------
+        dict
+            arrays "data_time", "value_r", "value_w" (for _rw attributes) and "quality"
+        None
+            in case of error
+        """
+        
+        if self.archive_cache != None :
+            chunks = self._cached_arrays(attr, date_from, date_to)
+            if chunks != None and not epoch :
+                for c in chunks:
+                    c["data_time"] = c["data_time"].view("datetime64[us]")
+        else :
+            chunks = list(self.iter_archive_array(attr, date_from, date_to, epoch=epoch))
+        
+        if chunks == None or len(chunks) == 0 :
+            return None
+        
+        result = {name: _concatenate([c[name] for c in chunks]) for name in chunks[0]}
+        if len(result["data_time"]) == 0 :
+            return None
+        
+        return result
+    
+    def _copy_select(self, table, att_conf_id, date_from, date_to, columns):
+        """
+        History query of an attribute for COPY, with the parameters inlined:
+        COPY does not take bound parameters.
+        """
+        
+        date_from, date_to = self._date_range(date_from, date_to)
+        
+        with self._connection() as cnx:
+            return self.backend.mogrify(cnx, self._archive_sql(table, columns), [att_conf_id, date_from, date_to])
+    
+    def get_archive_copy(self, attr, date_from = None, date_to = None, epoch = False):
+        """
+        Get the history of saving a scalar attribute as NumPy column arrays with
+        PostgreSQL COPY: HS streams the rows in the binary COPY format, every column
+        is made fixed width and the buffer is decoded as one record array,
+        so no Python object is built per row.
+        Note:
+            On MySQL and for string attributes get_archive_array is used.
+
+        Parameters
+        ----------
+        attr: str
+            attribute name
+        date_from: datetime
+            date from which to take history
+        date_to: datetime
+            date by which to take history
+        epoch: bool
+            True - data_time as int64 microseconds since 1970, False - as datetime64[us]
+        Returns
+        -------
+        dict
+            arrays "data_time", "value_r", "value_w" (for _rw attributes) and "quality"
+        None
+            in case of error
+        """
+        
+        if not self.backend.has_copy :
+            return self.get_archive_array(attr, date_from, date_to, epoch)
+        
+        result = self._array_query(attr)
+        if result == None :
+            return None
+        att_conf_id, table, names, dtype = result
+        if dtype == "object" :
+            return self.get_archive_array(attr, date_from, date_to, epoch)
+        
+        # Fixed width columns: NULL floats become NaN, NULL integers get a flag column that becomes their mask
+        floating = numpy.dtype(dtype).kind == "f"
+        columns = [self._sql_epoch_us("data_time")]
+        fields = [("data_time", ">i8")]
+        for n in names[1:-1]:
+            if floating :
+                columns.append("COALESCE(CAST({0} AS FLOAT8), 'NaN')".format(n))
+                fields.append((n, ">f8"))
+            else :
+                value = "CAST({0} AS INT4)".format(n) if dtype == "bool" else n
+                columns.append("COALESCE(CAST({0} AS INT8), 0)".format(value))
+                columns.append("{0} IS NULL".format(n))
+                fields += [(n, ">i8"), (n + "_null", "u1")]
+        columns.append("COALESCE(CAST(quality AS INT2), -1)")
+        fields.append(("quality", ">i2"))
+        
+        select = self._copy_select(table, att_conf_id, date_from, date_to, ", ".join(columns))
+        
+        buf = io.BytesIO()
+        start = time.perf_counter()
+        with self._connection() as cnx:
+            self.backend.copy_to(cnx, select, "FORMAT binary", buf)
+        
+        data = _decode_copy_binary(buf.getbuffer(), fields)
+        if self.metrics != None :
+            self.metrics.record("sql", "copy " + table, time.perf_counter() - start, len(data), buf.tell(), attr)
+        if len(data) == 0 :
+            return None
+        
+        chunk = {"data_time": data["data_time"].astype("int64")}
+        if not epoch :
+            chunk["data_time"] = chunk["data_time"].view("datetime64[us]")
+        for n in names[1:-1]:
+            if floating :
+                chunk[n] = data[n].astype(dtype)
+            else :
+                chunk[n] = numpy.ma.MaskedArray(data[n].astype(dtype), mask=data[n + "_null"] != 0)
+        chunk["quality"] = data["quality"].astype("int8")
+        
+        return chunk
+    
+    def copy_archive(self, attr, path, date_from = None, date_to = None, format = "csv"):
+        """
+        Write the history of saving an attribute to a file with PostgreSQL COPY.
+        HS streams the rows straight into the file, they are not decoded by Python.
+
+        Parameters
+        ----------
+        attr: str
+            attribute name
+        path: str
+            output file
+        date_from: datetime
+            date from which to take history
+        date_to: datetime
+            date by which to take history
+        format: str
+            "csv" - with a header, data_time and insert_time as text,
+            "binary" - the PostgreSQL binary COPY format
+        Returns
+        -------
+        int
+            number of bytes written
+        None
+            in case of error
+        """
+        
+        if not self.backend.has_copy :
+            print("[error]: COPY needs postgresql, not {0}".format(self.dbtype))
+            return None
+        
+        if format not in ("csv", "binary") :
+            print("[error]: unsupported format: {0}".format(format))
+            return None
+        
+        result = self._archive_table(self.attr_set_server(attr))
+        if result == None :
+            return None
+        att_conf_id, table = result
+        
+        select = self._copy_select(table, att_conf_id, date_from, date_to, "*")
+        
+        start = time.perf_counter()
+        with open(path, "wb") as f:
+            with self._connection() as cnx:
+                self.backend.copy_to(cnx, select, "FORMAT {0}{1}".format(format, ", HEADER" if format == "csv" else ""), f)
+            size = f.tell()
+        
+        if self.metrics != None :
+            self.metrics.record("sql", "copy " + table, time.perf_counter() - start, None, size, attr)
+        
+        return size
+    
+    def _cached_arrays(self, attr, date_from, date_to):
+        """
+        Read the history of an attribute through the local disk cache: closed chunks come
+        from the cache or are fetched once and stored, the live tail is always read from HS.
+        
+        Returns
+        -------
+        list
+            chunks of column arrays, data_time in integer microseconds
+        None
+            in case of error
+        """
+        
+        result = self._array_query(attr)
+        if result == None :
+            return None
+        att_conf_id, table, names, dtype = result
+        
+        date_from, date_to = self._date_range(date_from, date_to)
+        
+        if dtype == "object" :
+            # Strings are not cached
+            return list(self._iter_arrays(table, att_conf_id, names, dtype, date_from, date_to, True, 100000, True, attr))
+        
+        cache = self.archive_cache
+        source = self._cache_source()
+        epoch = datetime.datetime(1970, 1, 1)
+        
+        first = self._first_insert_time(att_conf_id, table)
+        if first == None :
+            return []
+        
+        date_from = max(date_from, first)
+        from_us = (date_from - epoch) // datetime.timedelta(microseconds=1)
+        to_us = (date_to - epoch) // datetime.timedelta(microseconds=1)
+        
+        # The cached chunks also keep insert_time to cut them to the requested range
+        names = names + ["insert_time"]
+        
+        def fetch(start_us, end_us, include_end):
+            chunks = list(self._iter_arrays(table, att_conf_id, names, dtype,
+                epoch + datetime.timedelta(microseconds=start_us), epoch + datetime.timedelta(microseconds=end_us),
+                include_end, 100000, True, attr))
+            if len(chunks) == 0 :
+                types = {"data_time": "int64", "insert_time": "int64", "quality": "int8"}
+                return {n: numpy.empty(0, dtype=types[n]) if n in types else _column_array([], dtype) for n in names}
+            return {n: _concatenate([c[n] for c in chunks]) for n in names}
+        
+        pieces = []
+        closed_until = _now_us() - cache.tail_us
+        start = from_us - from_us % cache.chunk_us
+        while start <= to_us :
+            end = start + cache.chunk_us
+            if end > closed_until :
+                # The live tail, it may still change
+                pieces.append(fetch(start, to_us, True))
+                break
+            
+            piece = cache.load(source, att_conf_id, start)
+            # A chunk stored before the values kept their type is read again
+            if piece != None and piece["value_r"].dtype != numpy.dtype(dtype) :
+                piece = None
+            if piece == None :
+                piece = fetch(start, end, False)
+                cache.store(source, att_conf_id, start, piece)
+            pieces.append(piece)
+            start = end
+        
+        chunks = []
+        for piece in pieces:
+            t = piece["insert_time"]
+            mask = (t >= from_us) & (t <= to_us)
+            chunks.append({n: piece[n][mask] if isinstance(piece[n], numpy.ma.MaskedArray) else numpy.asarray(piece[n][mask]) for n in names[:-1]})
+        
+        return chunks
+    
+    def _cached_rows(self, attr, att_conf_id, table, date_from, date_to):
+        """
+        Read the rows of get_archive through the local disk cache, as _cached_arrays:
+        closed chunks come from the cache or are fetched once and stored, the live
+        tail is always read from HS. Chunks whose values NumPy can not hold
+        (strings) are not cached.
+        
+        Returns
+        -------
+        list
+            rows of the att_* table
+        """
+        
+        cache = self.archive_cache
+        source = self._cache_source()
+        epoch = datetime.datetime(1970, 1, 1)
+        
+        first = self._first_insert_time(att_conf_id, table)
+        if first == None :
+            return []
+        
+        date_from = max(date_from, first)
+        from_us = (date_from - epoch) // datetime.timedelta(microseconds=1)
+        to_us = (date_to - epoch) // datetime.timedelta(microseconds=1)
+        
+        # insert_time in microseconds is added as the last column to cut the chunks to the requested range
+        columns = "*, " + self._sql_epoch_us("insert_time")
+        
+        def fetch(start_us, end_us, include_end):
+            sql = self._archive_sql(table, columns, include_end)
+            name = "hdbpp_archive_cache_{0}_{1}".format("closed" if include_end else "open", table)
+            with self._connection() as cnx:
+                return self._query(cnx, sql, [att_conf_id, epoch + datetime.timedelta(microseconds=start_us),
+                    epoch + datetime.timedelta(microseconds=end_us)], name, attr)
+        
+        def cut(rows):
+            return [r[:-1] for r in rows if from_us <= r[-1] <= to_us]
+        
+        result = []
+        closed_until = _now_us() - cache.tail_us
+        start = from_us - from_us % cache.chunk_us
+        while start <= to_us :
+            end = start + cache.chunk_us
+            if end > closed_until :
+                # The live tail, it may still change
+                result += cut(fetch(start, to_us, True))
+                break
+            
+            piece = cache.load(source, att_conf_id, start, "rows")
+            if piece == None :
+                rows = fetch(start, end, False)
+                piece = _row_columns([r[:-1] for r in rows])
+                if piece == None :
+                    result += cut(rows)
+                    start = end
+                    continue
+                piece["insert_time"] = numpy.fromiter((r[-1] for r in rows), dtype="int64", count=len(rows))
+                cache.store(source, att_conf_id, start, piece, "rows")
+            
+            t = piece["insert_time"]
+            result += _column_rows(piece, (t >= from_us) & (t <= to_us))
+            start = end
+        
+        return result
+    
+    def _cache_source(self):
+        """
+        Name of the database of HS in the archive cache, chunks of different databases do not mix.
+        """
+        
+        return source_name(self.dbtype, self.host, self.database)
+    
+    def _first_insert_time(self, att_conf_id, table):
+        """
+        The insert_time of the first record of an attribute, None if there are no records.
+        """
+        
+        return self._insert_time_bound(_FIRST_INSERT_TIME, att_conf_id, table)
+    
+    def _last_insert_time(self, att_conf_id, table):
+        """
+        The insert_time of the last record of an attribute, None if there are no records.
+        """
+        
+        return self._insert_time_bound(_LAST_INSERT_TIME, att_conf_id, table)
+    
+    def _insert_time_bound(self, sql, att_conf_id, table):
+        with self._connection() as cnx:
+            bound = self._query(cnx, sql.format(table), [att_conf_id])[0][0]
+        
+        # SQLite does not convert the result of an aggregate
+        if isinstance(bound, str) :
+            bound = datetime.datetime.fromisoformat(bound)
+        
+        return bound
+    
+    def get_archive_aggregated(self, attr, date_from = None, date_to = None, bucket = 60, funcs = ("min", "max", "avg", "count", "last"), column = "value_r"):
+        """
+        Get the history of saving an attribute aggregated by time buckets.
+        The grouping is done by HS, only one row per bucket is transferred.
+        Note:
+            With default parameters takes history for all time
+
+        Parameters
+        ----------
+        attr: str
+            attribute name
+        date_from: datetime
+            date from which to take history
+        date_to: datetime
+            date by which to take history
+        bucket: int/float/timedelta
+            bucket size, seconds
+        funcs: array(str)
+            aggregate functions: min, max, avg, count, sum, first, last
+        column: str
+            aggregated column, value_r or value_w
+        Returns
+        -------
+        array
+            rows (bucket start datetime, one value per function), ordered by time
+        None
+            in case of error
+        """
+        
+        attr = self.attr_set_server(attr)
+        
+        date_from, date_to = self._date_range(date_from, date_to)
+        
+        if isinstance(bucket, datetime.timedelta) :
+            bucket = bucket.total_seconds()
+        bucket_us = int(bucket * 1000000)
+        if bucket_us <= 0 :
+            print("[error]: wrong bucket: {0}".format(bucket))
+            return None
+        
+        if column not in ("value_r", "value_w") :
+            print("[error]: wrong column: {0}".format(column))
+            return None
+        
+        bucket_sql = "FLOOR({0} / {1})".format(self._sql_epoch_us("data_time"), bucket_us)
+        columns = [bucket_sql]
+        for f in funcs:
+            expr = self._sql_aggregate(f, column)
+            if expr == None :
+                print("[error]: unsupported aggregate function: {0}".format(f))
+                return None
+            columns.append(expr)
+        
+        result = self._archive_table(attr)
+        if result == None :
+            return None
+        att_conf_id, table = result
+        
+        if "first" in funcs or "last" in funcs :
+            # The first and last values are the same in all rows of a bucket, grouping by them keeps one row
+            sql = "SELECT {0} FROM ({1}) b GROUP BY bucket, value_first, value_last ORDER BY bucket".format(
+                ", ".join(["bucket"] + columns[1:]), self._sql_ordered_values(table, column, bucket_sql))
+        else :
+            sql = self._archive_sql(table, ", ".join(columns)) + " GROUP BY 1 ORDER BY 1"
+        with self._connection() as cnx:
+            rows = self._query(cnx, sql, [att_conf_id, date_from, date_to], attr=attr)
+        
+        epoch = datetime.datetime(1970, 1, 1)
+        result = []
+        for r in rows:
+            result.append((epoch + datetime.timedelta(microseconds=int(r[0]) * bucket_us),) + tuple(r[1:]))
+        
+        if len(result) == 0 :
+            return None
+        else :
+            return result
+    
+    def get_archive_many(self, attrs, date_from = None, date_to = None):
+        """
+        Get the history of several attributes at once.
+        The att_conf rows and data types of all attributes are resolved in one query,
+        then one query is made per att_<data_type> table instead of three per attribute.
+        Note:
+            With default parameters takes history for all time
+
+        Parameters
+        ----------
+        attrs: array(str)
+            array of attribute names
+        date_from: datetime
+            date from which to take history
+        date_to: datetime
+            date by which to take history
+        Returns
+        -------
+        dict
+            values archive by attribute name, None for attributes without history
+        """
+        
+        date_from, date_to = self._date_range(date_from, date_to)
+        
+        archive = {}
+        names = {}
+        for a in attrs:
+            archive[a] = None
+            # Tango names are case insensitive
+            names[self.attr_set_server(a).lower()] = a
+        
+        if len(names) == 0 :
+            return archive
+        
+        with self._connection() as cnx:
+            sql = "SELECT c.att_conf_id, c.att_name, t.data_type FROM att_conf c " \
+                "JOIN att_conf_data_type t ON c.att_conf_data_type_id = t.att_conf_data_type_id " \
+                "WHERE c.att_name IN ({0})".format(", ".join(["%s"] * len(names)))
+            rows = self._query(cnx, sql, [self.attr_set_server(a) for a in names.values()])
+        
+            # Group the attributes by the table in which their history is stored
+            tables = {}
+            ids = {}
+            for att_conf_id, att_name, data_type in rows:
+                if att_name.lower() not in names :
+                    continue
+                tables.setdefault("att_" + str(data_type), []).append(att_conf_id)
+                ids[att_conf_id] = names[att_name.lower()]
+        
+            for table, att_conf_ids in tables.items():
+                sql = self._archive_many_sql(table, len(att_conf_ids))
+                # The first column of the att_* tables is att_conf_id
+                for row in self._query(cnx, sql, att_conf_ids + [date_from, date_to]):
+                    a = ids[row[0]]
+                    if archive[a] == None :
+                        archive[a] = []
+                    archive[a].append(row)
+        
+        return archive
+    
+    def export_archive(self, attrs, date_from = None, date_to = None, path = "archive.parquet", format = "parquet", chunk_size = 100000, progress = None):
+        """
+        Export the history of scalar attributes to a CSV, Parquet or HDF5 file.
+        The rows are streamed from HS in chunks, so memory does not grow with the period.
+        Note:
+            Parquet needs pyarrow, HDF5 needs h5py
+
+        Parameters
+        ----------
+        attrs: array(str)
+            array of attribute names
+        date_from: datetime
+            date from which to take history
+        date_to: datetime
+            date by which to take history
+        path: str
+            output file
+        format: str
+            "parquet", "csv" or "hdf5"
+        chunk_size: int
+            maximum number of rows held in memory
+        progress: function
+            called with the report after every chunk
+        Returns
+        -------
+        dict
+            "rows", "bytes" written, "seconds", "rows_per_s", "errors": {attribute: error}
+        """
+        
+        from .export import export_archive
+        
+        return export_archive(self, attrs, date_from, date_to, path, format, chunk_size, progress)
+    
+    def get_aligned(self, attrs, date_from = None, date_to = None, grid = None, method = "asof", tolerance = None, column = "value_r", epoch = False):
+        """
+        Get the history of several scalar attributes as one matrix on a shared time index.
+        Every attribute is read as NumPy arrays and put on the index with a vectorized
+        merge-asof (forward fill) or linear interpolation on data_time.
+        Note:
+            Samples with INVALID quality and NULL values are gaps (NaN), they are not filled
+            from older samples. Before the first sample of an attribute its column is NaN.
+
+        Parameters
+        ----------
+        attrs: array(str)
+            array of attribute names
+        date_from: datetime
+            date from which to take history
+        date_to: datetime
+            date by which to take history
+        grid: float, timedelta or array
+            None - union of the sample times of all attributes,
+            number or timedelta - regular step in seconds from date_from to date_to,
+            array of datetime / datetime64 - the index itself
+        method: str
+            "asof" - last sample at or before the index time, "linear" - linear interpolation
+        tolerance: float
+            "asof" does not carry a sample further than this, None - no limit, seconds
+        column: str
+            "value_r" or "value_w"
+        epoch: bool
+            True - time as int64 microseconds since 1970, False - as datetime64[us]
+        Returns
+        -------
+        dict
+            "time" (n), "attrs" (m), "values" float64 (n, m) and "quality" int8 (n, m), -1 - no sample
+        None
+            if there is no history
+        """
+        
+        from .align import make_grid, align_asof, align_linear, _to_us
+        
+        if method not in ("asof", "linear") :
+            raise ValueError("unsupported method: {0}".format(method))
+        
+        series = []
+        for a in attrs:
+            data = self.get_archive_array(a, date_from, date_to, epoch=True)
+            if data == None :
+                series.append(None)
+                continue
+            if column not in data or data[column].dtype.hasobject :
+                print("[error]: no numeric {0} in the history of {1}".format(column, a))
+                series.append(None)
+                continue
+            
+            # The rows of the att_* tables come in no particular order
+            order = numpy.argsort(data["data_time"], kind="stable")
+            quality = data["quality"][order]
+            series.append((data["data_time"][order], _float_array(data[column][order]), quality))
+        
+        index = make_grid([s[0] for s in series if s != None], grid,
+            _to_us(date_from) if date_from != None else None, _to_us(date_to) if date_to != None else None)
+        if len(index) == 0 :
+            return None
+        
+        values = numpy.full((len(index), len(series)), numpy.nan)
+        quality = numpy.full((len(index), len(series)), -1, dtype="int8")
+        for k, s in enumerate(series):
+            if s == None :
+                continue
+            if method == "asof" :
+                values[:, k], quality[:, k] = align_asof(*s, index, None if tolerance == None else int(tolerance * 1000000))
+            else :
+                values[:, k], quality[:, k] = align_linear(*s, index)
+        
+        return {
+            "time": index if epoch else index.view("datetime64[us]"),
+            "attrs": list(attrs),
+            "values": values,
+            "quality": quality,
+        }
+    
+    def get_archive_decimated(self, attr, date_from = None, date_to = None, n_out = 2000, method = "lttb", column = "value_r", epoch = False, chunk_size = 100000):
+        """
+        Get the history of a scalar attribute reduced to at most n_out points for plotting.
+        The history is streamed with iter_archive_array and every chunk is reduced on the fly,
+        so memory depends on n_out and chunk_size, not on the length of the history.
+        The time range is split into equal buckets on the client, no time-bucket
+        functions of HS are needed.
+        Note:
+            NULL values are skipped. Samples with INVALID quality are kept, their value is plotted.
+        
+        Parameters
+        ----------
+        attr: str
+            attribute name
+        date_from: datetime
+            date from which to take history, None - from the first record
+        date_to: datetime
+            date by which to take history, None - up to the last record
+        n_out: int
+            maximum number of points
+        method: str
+            "lttb" - Largest-Triangle-Three-Buckets on the min/max of finer buckets,
+            "minmax" - minimum and maximum of n_out / 2 buckets
+        column: str
+            "value_r" or "value_w"
+        epoch: bool
+            True - data_time as int64 microseconds since 1970, False - as datetime64[us]
+        chunk_size: int
+            maximum number of rows read at once
+        Returns
+        -------
+        dict
+            "data_time" and column (float64), sorted by time
+        None
+            in case of error
+        """
+        
+        from .align import _to_us
+        from .decimate import Decimator
+        
+        if numpy == None :
+            raise ImportError("numpy is required for the NumPy result mode")
+        
+        attr = self.attr_set_server(attr)
+        
+        # The buckets cover the requested range, without bounds the range of the history
+        if date_from == None or date_to == None :
+            result = self._archive_table(attr)
+            if result == None :
+                return None
+            if date_from == None :
+                date_from = self._first_insert_time(*result) or datetime.datetime.now()
+            if date_to == None :
+                date_to = self._last_insert_time(*result)
+        date_from, date_to = self._date_range(date_from, date_to)
+        
+        decimator = Decimator(_to_us(date_from), _to_us(date_to), n_out, method)
+        found = False
+        for chunk in self.iter_archive_array(attr, date_from, date_to, chunk_size, epoch=True):
+            found = True
+            if column not in chunk or chunk[column].dtype.hasobject :
+                print("[error]: no numeric {0} in the history of {1}".format(column, attr))
+                return None
+            decimator.update(chunk["data_time"], _float_array(chunk[column]))
+        
+        if not found and self._array_query(attr) == None :
+            return None
+        
+        t, v = decimator.result()
+        
+        return {
+            "data_time": t if epoch else t.view("datetime64[us]"),
+            column: v,
+        }
+    
+    def follow(self, attrs, since = None, interval = 1.0, maxsize = 10000, events = False, lag = 2.0, chunk_size = 10000):
+        """
+        Follow the history of scalar attributes: the history since a time is delivered once,
+        then only new samples, read by a poller thread from the rows inserted after a
+        watermark on insert_time and, optionally, taken from the archive events of the devices.
+        Note:
+            Samples of an attribute come in data_time order without duplicates,
+            a late sample older than the last delivered one is skipped.
+
+        Parameters
+        ----------
+        attrs: array(str)
+            array of attribute names
+        since: datetime/timedelta
+            the history from this time is delivered first, a timedelta is counted back from now,
+            None - only new samples
+        interval: float
+            time between polls of HS, seconds
+        maxsize: int
+            maximum number of samples waiting to be read, the poller waits when the queue is full
+        events: bool
+            also subscribe to the ARCHIVE_EVENT of the attributes, for sub-second latency
+        lag: float
+            the rows inserted this long before the watermark are read again, seconds
+        chunk_size: int
+            maximum number of rows read from HS at a time
+        Returns
+        -------
+        Follower
+            iterator of Sample(attr, data_time, value_r, value_w, quality), stopped by close()
+        None
+            in case of error
+        """
+        
+        from .follow import Follower
+        
+        try:
+            # Without a pool the follower opens its own connection
+            return Follower(self, attrs, since, interval, maxsize, events, lag, chunk_size)
+        except self.backend.Error as err:
+            print("[error]: follow: {0}".format(err))
+            return None
+    
+    def check_schema(self, tables = None, create_indexes = False, follow = False):
+        """
+        Check that HS has the indexes the reads need: att_conf, att_conf_data_type and every
+        att_* history table are inspected, the statements of this class are run through
+        EXPLAIN and full scans and sorts (filesort) are reported. An (att_conf_id, insert_time)
+        index is only wanted with follow, otherwise the (att_conf_id, data_time) index of the
+        HDB++ schema serves the reads. Missing indexes are created online if create_indexes is set.
+        See SchemaAdvisor, also runnable as python -m hdbpp.advisor
+
+        Parameters
+        ----------
+        tables: array(str)
+            table names, None - all
+        create_indexes: bool
+            create the missing indexes
+        follow: bool
+            the history is also read in insert_time order by Follower
+        Returns
+        -------
+        dict
+            {table: {"indexes", "missing", "create", "created", "plans", "problems", "warnings"}}
+        """
+        
+        from .advisor import SchemaAdvisor
+        
+        return SchemaAdvisor(self, follow).check(tables, create_indexes)
+    
+    def maintain_partitions(self, period = "month", ahead = 3, retention = None, tables = None, column = "insert_time", dry_run = True):
+        """
+        Maintain time-range partitions of the att_* history tables (MySQL RANGE partitioning,
+        PostgreSQL declarative partitioning): partition the tables, keep the partitions of the
+        next periods ready and drop the expired ones instead of deleting rows.
+        With the tables partitioned by insert_time the reads of the history scan only the
+        partitions of the requested period. See PartitionManager.
+        Note:
+            The first partitioning of a big table takes long, MySQL rebuilds it. Run with
+            dry_run first: it reports the partitions, their sizes and the planned statements.
+
+        Parameters
+        ----------
+        period: str
+            "month" or "day"
+        ahead: int
+            number of future partitions kept ready
+        retention: int/timedelta
+            partitions that ended more than this ago are dropped, days, None - nothing is dropped
+        tables: array(str)
+            table names, None - all att_* history tables
+        column: str
+            partitioning column
+        dry_run: bool
+            only report, do not change anything
+        Returns
+        -------
+        dict
+            {table: {"partitioned", "partitions", "create", "drop", "statements", "warnings", "errors", "applied"}}
+        """
+        
+        from .partitions import PartitionManager
+        
+        return PartitionManager(self, period, ahead, retention, column).maintain(tables, dry_run)
+    
+    def _archiver_command(self, cmd, arg_type, value):
+        """
+        Execute a command of AS.
+
+        Parameters
+        ----------
+        cmd: str
+            command name, for example AttributeStart
+        arg_type: tango._tango.CmdArgType
+            type of the command argument
+        value: str/array(str)
+            command argument
+        Returns
+        -------
+        object
+            command result
+        """
+        
+        if self.metrics == None :
+            return self.archive_server.command_inout(cmd, _device_data(arg_type, value))
+        
+        attr = value if isinstance(value, str) else None
+        start = time.perf_counter()
+        try:
+            ret = self.archive_server.command_inout(cmd, _device_data(arg_type, value))
+        except tango.DevFailed as df:
+            self.metrics.record("tango", cmd, time.perf_counter() - start, attr=attr, error=str(df))
+            raise
+        self.metrics.record("tango", cmd, time.perf_counter() - start, attr=attr)
+        
+        return ret
+    
+    def _archiver_command_many(self, cmd, arg_type, attrs, window = 64, parse = None, report = None):
+        """
+        Execute a command of AS for many attributes. The commands are sent with
+        command_inout_asynch, at most window of them wait for a reply at the same time.
+
+        Parameters
+        ----------
+        cmd: str
+            command name, for example AttributeStart
+        arg_type: tango._tango.CmdArgType
+            type of the command argument
+        attrs: array(str)
+            attribute names, the command argument is the full name
+        window: int
+            maximum number of commands waiting for a reply
+        parse: function
+            conversion of a reply, None - the reply is kept as is
+        report: dict
+            report to add the results to, None - a new one
+        Returns
+        -------
+        dict
+            "ok": attributes the command succeeded for, "errors": {attribute: error},
+            "results": {attribute: reply}, "elapsed": seconds
+        """
+        
+        start = time.monotonic()
+        if report == None :
+            report = {"ok": [], "errors": {}, "results": {}, "elapsed": 0}
+        
+        pending = collections.deque()
+        
+        # A failure of one attribute, of any kind, is its error and does not stop the others
+        def collect():
+            a, idx, sent = pending.popleft()
+            try:
+                # 0 - wait until the reply arrives
+                ret = self.archive_server.command_inout_reply(idx, 0)
+                result = parse(ret) if parse else ret
+            except Exception as err:
+                report["errors"][a] = str(err)
+                if self.metrics != None :
+                    self.metrics.record("tango", cmd, time.perf_counter() - sent, attr=a, error=str(err))
+                return
+            if self.metrics != None :
+                # From sending the request to receiving the reply
+                self.metrics.record("tango", cmd, time.perf_counter() - sent, attr=a)
+            report["ok"].append(a)
+            report["results"][a] = result
+        
+        for a in attrs:
+            if len(pending) >= window :
+                collect()
+            sent = time.perf_counter()
+            try:
+                idx = self.archive_server.command_inout_asynch(cmd, _device_data(arg_type, self.attr_set_server(a)))
+            except Exception as err:
+                report["errors"][a] = str(err)
+                if self.metrics != None :
+                    self.metrics.record("tango", cmd, time.perf_counter() - sent, attr=a, error=str(err))
+                continue
+            pending.append((a, idx, sent))
+        
+        while len(pending) > 0 :
+            collect()
+        
+        report["elapsed"] += time.monotonic() - start
+        
+        return report
+    
+    def archiving_add(self, dp, attrs):
+        """
+        Add attributes to the AS. It must be done if it is not.
+
+        Parameters
+        ----------
+        dp: tango.DeviceProxy
+            proxy to the device of the attributes, None - the proxies of the
+            devices of the attributes are taken from the registry
+        attrs: array(str)
+            array of attribute names
+
+        Returns
+        -------
+        bool
+            True if successful, otherwise False
+        """
+        
+        report = self.archiving_add_bulk(dp, attrs)
+        
+        for a, err in report["errors"].items():
+            print("[error]: {0}: {1}".format(a, err))
+        
+        return len(report["errors"]) == 0
+    
+    def _attribute_configs(self, dp, attrs, errors):
+        """
+        Read the configs of attributes of one device with one call.
+        
+        Returns
+        -------
+        list
+            tango.AttributeInfoEx for every attribute, None for the failed ones,
+            their errors are put into errors
+        """
+        
+        names = [a.split("/")[-1] for a in attrs]
+        try:
+            return list(dp.get_attribute_config(names))
+        except (tango.ConnectionFailed, tango.CommunicationFailed):
+            raise
+        except tango.DevFailed as df:
+            # One bad attribute fails the whole call, find out which one
+            configs = []
+            for a, n in zip(attrs, names):
+                try:
+                    configs.append(dp.get_attribute_config(n))
+                except tango.DevFailed as df:
+                    configs.append(None)
+                    errors[a] = str(df)
+            return configs
+    
+    def archiving_add_bulk(self, dp, attrs):
+        """
+        Add many attributes to the AS.
+        The attribute configs are read with one call per device, the data type ids come from
+        one cached read of att_conf_data_type, all att_conf rows are written with one
+        executemany in one transaction and AS gets one AttributeAdd command.
+
+        Parameters
+        ----------
+        dp: tango.DeviceProxy
+            proxy to the device of the attributes, None - the proxies of the
+            devices of the attributes are taken from the registry
+        attrs: array(str)
+            array of attribute names
+
+        Returns
+        -------
+        dict
+            "ok": added attributes, "errors": {attribute: error} for the others,
+            "elapsed": seconds
+        """
+        
+        start = time.monotonic()
+        report = {"ok": [], "errors": {}, "elapsed": 0}
+        
+        if dp == None :
+            # Group the attributes by device: tango://tangobox:10000/ECG/ecg/1
+            devices = collections.OrderedDict()
+            for a in attrs:
+                devices.setdefault(self.attr_set_server(a).rsplit("/", 1)[0], []).append(a)
+            
+            configs = {}
+            for device, device_attrs in devices.items():
+                try:
+                    device_configs = self.proxies.call_device(device, lambda dp: self._attribute_configs(dp, device_attrs, report["errors"]))
+                except tango.DevFailed as df:
+                    device_configs = [None] * len(device_attrs)
+                    for a in device_attrs:
+                        report["errors"][a] = str(df)
+                configs.update(zip(device_attrs, device_configs))
+            configs = [configs[a] for a in attrs]
+        else :
+            configs = self._attribute_configs(dp, attrs, report["errors"])
+        
+        # One query instead of one per attribute in get_data_type_id
+        self._preload_data_types()
+        
+        rows = []
+        added = []
+        for a, ac in zip(attrs, configs):
+            if ac == None :
+                continue
+            
+            dti = self.get_data_type_id(ac.data_format, ac.data_type, ac.writable)
             if dti == 0 :
-                print("[error]: get_data_type_id({0}, {1}, {2})".format(ac.data_format, ac.data_type, ac.writable))
-                return False
+                report["errors"][a] = "get_data_type_id({0}, {1}, {2})".format(ac.data_format, ac.data_type, ac.writable)
+                continue
             
-            attrs[i] = self.attr_set_server(attrs[i])
+            full = self.attr_set_server(a)
+            rows.append(self._att_conf_row(dti[0], full))
+            added.append((a, full))
+        
+        if len(rows) > 0 :
+            try:
+                with self._connection() as cnx:
+                    cursor = cnx.cursor()
+                    start_sql = time.perf_counter()
+                    try:
+                        cursor.executemany(self._sql(self.backend.replace_att_conf), rows)
+                        cnx.commit()
+                    except self.backend.Error:
+                        cnx.rollback()
+                        raise
+                    if self.metrics != None :
+                        self.metrics.record("sql", statement_label(self.backend.replace_att_conf), time.perf_counter() - start_sql, len(rows))
+            except self.backend.Error as err:
+                for a, full in added:
+                    report["errors"][a] = str(err)
+                added = []
             
-            self.replace_att_conf(dti[0], attrs[i])
+            # MySQL REPLACE gives the attributes new att_conf_ids
+            for a, full in added:
+                self.cache_invalidate(full)
         
-        argIn = DeviceData()
-        argIn.insert(tango._tango.CmdArgType.DevVarStringArray, attrs)
-        try:
-            self.archive_server.command_inout("AttributeAdd", argIn)
-            return True
-        except tango.DevFailed as df:
-            print("[error]: ", df)
-            return False
+        if len(added) > 0 :
+            try:
+                self._archiver_command("AttributeAdd", tango._tango.CmdArgType.DevVarStringArray, [full for a, full in added])
+                report["ok"] = [a for a, full in added]
+            except tango.DevFailed as df:
+                for a, full in added:
+                    report["errors"][a] = str(df)
+        
+        report["elapsed"] = time.monotonic() - start
+        
+        return report
     
     def archiving_pause(self, attr):
         """
@@ -485,10 +2573,8 @@ class HDBPP():
         
         attr = self.attr_set_server(attr)
         
-        argIn = DeviceData()
-        argIn.insert(tango._tango.CmdArgType.DevString, attr)
         try:
-            self.archive_server.command_inout("AttributePause", argIn)
+            self._archiver_command("AttributePause", tango._tango.CmdArgType.DevString, attr)
             return True
         except tango.DevFailed as df:
             return False
@@ -510,10 +2596,8 @@ class HDBPP():
         
         attr = self.attr_set_server(attr)
         
-        argIn = DeviceData()
-        argIn.insert(tango._tango.CmdArgType.DevString, attr)
         try:
-            self.archive_server.command_inout("AttributeRemove", argIn)
+            self._archiver_command("AttributeRemove", tango._tango.CmdArgType.DevString, attr)
             return True
         except tango.DevFailed as df:
             return False
@@ -542,11 +2626,9 @@ class HDBPP():
         sp = attr.split('/')
         attr_short = sp[-4] + "/" + sp[-3] + "/" + sp[-2] + "/" + sp[-1]
         
-        argIn = DeviceData()
-        argIn.insert(tango._tango.CmdArgType.DevString, attr)
         try:
             self.attr_set_period(attr_short, period, archive_period, archive_abs_change, archive_rel_change)
-            self.archive_server.command_inout("AttributeStart", argIn)
+            self._archiver_command("AttributeStart", tango._tango.CmdArgType.DevString, attr)
             return True
         except tango.DevFailed as df:
             return False
@@ -567,24 +2649,12 @@ class HDBPP():
         """
         
         attr = self.attr_set_server(attr)
-        status = {}
-        
-        argIn = DeviceData()
-        argIn.insert(tango._tango.CmdArgType.DevString, attr)
         try:
-            ret = self.archive_server.command_inout("AttributeStatus", argIn)
+            ret = self._archiver_command("AttributeStatus", tango._tango.CmdArgType.DevString, attr)
         except tango.DevFailed as df:
-            status["Archiving"] = False
-            return status
-        
-        # Преобразуем возвращаемую строку статсусов к словарю статусов
-        ret = ret.split("\n")
-        for r in ret:
-            r = re.sub(' +', ' ', r)
-            r = r.split(":")
-            status[r[0].lstrip().rstrip()] = r[1].lstrip().rstrip()
-            
-        return status
+            return {"Archiving": False}
+        
+        return _parse_status(ret)
         
     def archiving_stop(self, attr):
         """
@@ -603,10 +2673,8 @@ class HDBPP():
         
         attr = self.attr_set_server(attr)
         
-        argIn = DeviceData()
-        argIn.insert(tango._tango.CmdArgType.DevString, attr)
         try:
-            self.archive_server.command_inout("AttributeStop", argIn)
+            self._archiver_command("AttributeStop", tango._tango.CmdArgType.DevString, attr)
             return True
         except tango.DevFailed as df:
             return False
@@ -630,10 +2698,8 @@ class HDBPP():
         
         attr = self.attr_set_server(attr)
         
-        argIn = DeviceData()
-        argIn.insert(tango._tango.CmdArgType.DevVarStringArray, [attr, str(strategy)])
         try:
-            self.archive_server.command_inout("SetAttributeStrategy", argIn)
+            self._archiver_command("SetAttributeStrategy", tango._tango.CmdArgType.DevVarStringArray, [attr, str(strategy)])
             return True
         except tango.DevFailed as df:
             return False
@@ -657,14 +2723,26 @@ class HDBPP():
         
         attr = self.attr_set_server(attr)
         
-        argIn = DeviceData()
-        argIn.insert(tango._tango.CmdArgType.DevVarStringArray, [attr, str(ttl)])
         try:
-            self.archive_server.command_inout("SetAttributeTTL", argIn)
-            return True
+            self._archiver_command("SetAttributeTTL", tango._tango.CmdArgType.DevVarStringArray, [attr, str(ttl)])
         except tango.DevFailed as df:
             return False
         
+        self._cache_set_ttl(attr, ttl)
+        
+        return True
+    
+    def _cache_set_ttl(self, attr, ttl):
+        """
+        Pass a new TTL of an attribute to the archive cache:
+        cached chunks that HS is going to delete must not be served.
+        """
+        
+        if self.archive_cache != None :
+            result = self.get_att_conf(attr)
+            if result :
+                self.archive_cache.set_ttl(self._cache_source(), result[0], ttl)
+        
     def archiving_get_strategy(self, attr):
         """
         Get the archiving strategy for an attribute.
@@ -682,10 +2760,8 @@ class HDBPP():
         
         attr = self.attr_set_server(attr)
         
-        argIn = DeviceData()
-        argIn.insert(tango._tango.CmdArgType.DevString, attr)
         try:
-            return self.archive_server.command_inout("GetAttributeStrategy", argIn)
+            return self._archiver_command("GetAttributeStrategy", tango._tango.CmdArgType.DevString, attr)
         except tango.DevFailed as df:
             return False
         
@@ -708,14 +2784,12 @@ class HDBPP():
         
         attr = self.attr_set_server(attr)
         
-        argIn = DeviceData()
-        argIn.insert(tango._tango.CmdArgType.DevString, attr)
         try:
-            return self.archive_server.command_inout("GetAttributeTTL", argIn)
+            return self._archiver_command("GetAttributeTTL", tango._tango.CmdArgType.DevString, attr)
         except tango.DevFailed as df:
             return False
     
-    def attr_is_archiving(self, attr):
+    def attr_is_archiving(self, attr, snapshot = None):
         """
         Find out if the attribute is being archived.
 
@@ -723,6 +2797,8 @@ class HDBPP():
         ----------
         attr: str
             attribute name
+        snapshot: dict
+            result of archiver_snapshot, None - ask AS about this attribute
 
         Returns
         -------
@@ -730,13 +2806,193 @@ class HDBPP():
             True if yes, False otherwise
         """
         
-        ret = self.archiving_status(attr)
+        if snapshot != None :
+            ret = snapshot.get(self.attr_set_server(attr).lower(), {"Archiving": False})
+        else :
+            ret = self.archiving_status(attr)
         
         if ret["Archiving"] == "Started":
             return True
         
         return False
     
+    def archiver_snapshot(self):
+        """
+        Archiving status of all attributes of AS. The status lists of the event
+        subscriber are read with one read_attributes call, so checking N attributes
+        does not cost N AttributeStatus calls.
+
+        Returns
+        -------
+        dict
+            {full lower case attribute name: status dictionary}, the status has the
+            "Archiving" key as archiving_status and the values of the lists of AS
+            ("Record freq", "Event number", "Error", "Ok", ...)
+        None
+            in case of error
+        """
+        
+        names = ["AttributeList"] + [n for n, k in _SNAPSHOT_STATES + _SNAPSHOT_VALUES + _SNAPSHOT_FLAGS]
+        
+        try:
+            try:
+                values = self.archive_server.read_attributes(names)
+            except tango.DevFailed as df:
+                # Older event subscribers do not have some of the lists
+                present = set(n.lower() for n in self.archive_server.get_attribute_list())
+                names = [n for n in names if n.lower() in present]
+                values = self.archive_server.read_attributes(names)
+        except tango.DevFailed as df:
+            print("[error]: ", df)
+            return None
+        
+        lists = {}
+        for n, v in zip(names, values):
+            # An empty spectrum is read as None
+            lists[n] = [] if v.has_failed or v.value is None else list(v.value)
+        
+        attrs = [a.lower() for a in lists["AttributeList"]]
+        snapshot = {a: {"Archiving": False} for a in attrs}
+        
+        for n, state in _SNAPSHOT_STATES:
+            for a in lists.get(n, []):
+                snapshot.setdefault(a.lower(), {})["Archiving"] = state
+        
+        for n, key in _SNAPSHOT_VALUES:
+            values = lists.get(n, [])
+            if len(values) != len(attrs) :
+                continue
+            for a, v in zip(attrs, values):
+                snapshot[a][key] = v
+        
+        for n, key in _SNAPSHOT_FLAGS:
+            for a in lists.get(n, []):
+                snapshot.setdefault(a.lower(), {"Archiving": False})[key] = True
+        
+        return snapshot
+    
+    def archiving_start_many(self, attrs, period = 0, archive_period = None, archive_abs_change = None, archive_rel_change = None, window = 64, workers = 16):
+        """
+        Start archiving many attributes. The archiving parameters are set by a pool of
+        workers threads, then AttributeStart is sent asynchronously for the attributes
+        whose parameters were set.
+
+        Parameters
+        ----------
+        attrs: array(str)
+            array of attribute names
+        window: int
+            maximum number of commands waiting for a reply
+        workers: int
+            number of threads setting the archiving parameters
+
+        Returns
+        -------
+        dict
+            "ok", "errors", "results" and "elapsed", see _archiver_command_many
+        """
+        
+        start = time.monotonic()
+        report = {"ok": [], "errors": {}, "results": {}, "elapsed": 0}
+        
+        def set_period(a):
+            # Convert the full name to short
+            # 'ECG/ecg/1/Lead'
+            sp = self.attr_set_server(a).split('/')
+            self.attr_set_period(sp[-4] + "/" + sp[-3] + "/" + sp[-2] + "/" + sp[-1], period, archive_period, archive_abs_change, archive_rel_change)
+        
+        started = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(set_period, a) for a in attrs]
+            for a, f in zip(attrs, futures):
+                try:
+                    f.result()
+                    started.append(a)
+                except Exception as err:
+                    # Not only DevFailed: a wrong name or a broken proxy must not lose the other attributes
+                    report["errors"][a] = str(err)
+        
+        report["elapsed"] = time.monotonic() - start
+        
+        return self._archiver_command_many("AttributeStart", tango._tango.CmdArgType.DevString, started, window, report=report)
+    
+    def archiving_stop_many(self, attrs, window = 64):
+        """
+        Stop archiving many attributes.
+
+        Parameters
+        ----------
+        attrs: array(str)
+            array of attribute names
+        window: int
+            maximum number of commands waiting for a reply
+
+        Returns
+        -------
+        dict
+            "ok", "errors", "results" and "elapsed", see _archiver_command_many
+        """
+        
+        return self._archiver_command_many("AttributeStop", tango._tango.CmdArgType.DevString, attrs, window)
+    
+    def archiving_pause_many(self, attrs, window = 64):
+        """
+        Pause archiving many attributes.
+
+        Parameters
+        ----------
+        attrs: array(str)
+            array of attribute names
+        window: int
+            maximum number of commands waiting for a reply
+
+        Returns
+        -------
+        dict
+            "ok", "errors", "results" and "elapsed", see _archiver_command_many
+        """
+        
+        return self._archiver_command_many("AttributePause", tango._tango.CmdArgType.DevString, attrs, window)
+    
+    def archiving_remove_many(self, attrs, window = 64):
+        """
+        Remove many attributes from AS.
+
+        Parameters
+        ----------
+        attrs: array(str)
+            array of attribute names
+        window: int
+            maximum number of commands waiting for a reply
+
+        Returns
+        -------
+        dict
+            "ok", "errors", "results" and "elapsed", see _archiver_command_many
+        """
+        
+        return self._archiver_command_many("AttributeRemove", tango._tango.CmdArgType.DevString, attrs, window)
+    
+    def archiving_status_many(self, attrs, window = 64):
+        """
+        The archiving status of many attributes.
+
+        Parameters
+        ----------
+        attrs: array(str)
+            array of attribute names
+        window: int
+            maximum number of commands waiting for a reply
+
+        Returns
+        -------
+        dict
+            "ok", "errors", "results" ({attribute: status dictionary}) and "elapsed",
+            see _archiver_command_many
+        """
+        
+        return self._archiver_command_many("AttributeStatus", tango._tango.CmdArgType.DevString, attrs, window, _parse_status)
+    
     def attr_set_period(self, attr, period = 0, archive_period = None, archive_abs_change = None, archive_rel_change = None):
         """
         Setting the parameters for archiving the attribute.
@@ -755,25 +3011,26 @@ class HDBPP():
             attribute change threshold in percent
         """
 
-        
-        ap = AttributeProxy(attr)
-            
-        if (period > 0) :
-            ap.poll(period)                
-        else :
-            if (ap.is_polled()) :
-                ap.stop_poll(attr)
+        def apply(ap):
+            if (period > 0) :
+                ap.poll(period)                
+            else :
+                if (ap.is_polled()) :
+                    ap.stop_poll()
+                
+            attr_conf = ap.get_config()
+                    
+            attr_conf.events.arch_event.archive_period = str(archive_period)
+            attr_conf.events.arch_event.archive_abs_change = str(archive_abs_change)
+            attr_conf.events.arch_event.archive_rel_change = str(archive_rel_change)
             
-        attr_conf = ap.get_config()
+            attr_conf.events.ch_event.abs_change = str(archive_abs_change)
+            attr_conf.events.ch_event.rel_change = str(archive_rel_change)
                 
-        attr_conf.events.arch_event.archive_period = str(archive_period)
-        attr_conf.events.arch_event.archive_abs_change = str(archive_abs_change)
-        attr_conf.events.arch_event.archive_rel_change = str(archive_rel_change)
+            ap.set_config(attr_conf)
         
-        attr_conf.events.ch_event.abs_change = str(archive_abs_change)
-        attr_conf.events.ch_event.rel_change = str(archive_rel_change)
-            
-        ap.set_config(attr_conf)
+        # The proxy is reused between calls and recreated if the connection has failed
+        self.proxies.call_attribute(attr, apply)
         
     def attr_get_period(self, attr):
         """
@@ -789,14 +3046,10 @@ class HDBPP():
             Archiving options
         """
        
-        ap = AttributeProxy(attr)
+        period, a = self.proxies.call_attribute(attr, lambda ap: (ap.get_poll_period(), ap.get_config()))
             
-        d = {}
         arch_event = {}
             
-        period = ap.get_poll_period()
-        a = ap.get_config()
-            
         arch_event["archive_period"] = a.events.arch_event.archive_period
         arch_event["archive_abs_change"] = a.events.arch_event.archive_abs_change
         arch_event["archive_rel_change"] = a.events.arch_event.archive_rel_change
@@ -0,0 +1,24 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import importlib
+
+class LazyModule():
+    """
+    Module imported on the first access to one of its attributes.
+    PyTango takes a long time to import and is not needed to read the history,
+    so it is imported only when AS or the devices are first used.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module == None :
+            self._module = importlib.import_module(self._name)
+
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return "<lazy module {0}{1}>".format(self._name, "" if self._module == None else " (imported)")
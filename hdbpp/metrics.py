@@ -0,0 +1,245 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import re
+import sys
+import threading
+import collections
+
+# One measured call: kind "sql" or "tango", statement or command name, wall time,
+# rows and approximate bytes of the result (None if unknown), attribute, error text
+Event = collections.namedtuple("Event", ["kind", "name", "seconds", "rows", "bytes", "attr", "error"])
+
+# Upper bounds of the latency histogram buckets, seconds
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_LABEL = re.compile(r"^\s*(\w+)(?:.*?\b(?:FROM|INTO|UPDATE)\s+(\w+))?", re.I | re.S)
+
+def statement_label(sql):
+    """
+    Short name of an unnamed statement: the verb and the first table, for example "select att_conf".
+    """
+
+    m = _LABEL.match(sql)
+    if m == None :
+        return "sql"
+
+    return " ".join(g.lower() for g in m.groups() if g)
+
+def approx_bytes(rows):
+    """
+    Approximate size of a result, from the size of its first row.
+    """
+
+    if not rows :
+        return 0
+
+    return len(rows) * sum(sys.getsizeof(v) for v in rows[0])
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+class _Series():
+    """
+    Counters and latency histogram of one (kind, name).
+    """
+
+    __slots__ = ("count", "errors", "rows", "bytes", "seconds", "buckets")
+
+    def __init__(self, n_buckets):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.buckets = [0] * n_buckets
+
+class Instrumentation():
+    """
+    Measurements of the SQL statements and Tango commands made by HDBPP.
+    Every call gives an Event that updates counters and latency histograms,
+    is passed to the hooks and, if it is slower than the threshold, to the slow log.
+    Nothing is measured while HDBPP.metrics is None.
+
+    Attributes
+    ----------
+    slow_threshold: float
+        calls longer than this go to the slow log, None - no slow log, seconds
+    slow_log: function
+        called with the Event of a slow call, by default prints it
+    buckets: tuple
+        upper bounds of the latency histogram buckets, seconds
+
+    Methods
+    -------
+    record (kind, name, seconds, rows, nbytes, attr, error)
+        Account one call
+    add_hook (func), remove_hook (func)
+        Functions called with every Event
+    stats ()
+        Counters by (kind, name)
+    prometheus (prefix)
+        Counters and histograms in the Prometheus text format
+    reset ()
+        Zero all counters
+    """
+
+    def __init__(self, slow_threshold = None, slow_log = None, hooks = (), buckets = _BUCKETS):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        slow_threshold: float
+            calls longer than this go to the slow log, None - no slow log, seconds
+        slow_log: function
+            called with the Event of a slow call, None - print it
+        hooks: array(function)
+            functions called with every Event
+        buckets: tuple
+            upper bounds of the latency histogram buckets, seconds
+        """
+
+        self.slow_threshold = slow_threshold
+        self.slow_log = slow_log or self._print_slow
+        self.buckets = tuple(sorted(buckets))
+
+        self._hooks = list(hooks)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _print_slow(event):
+        print("[slow]: {0} {1} {2:.3f} s, rows: {3}, attr: {4}".format(event.kind, event.name, event.seconds, event.rows, event.attr))
+
+    def add_hook(self, func):
+        """
+        Call func with the Event of every measured call.
+        """
+
+        self._hooks.append(func)
+
+    def remove_hook(self, func):
+        """
+        Stop calling func.
+        """
+
+        self._hooks.remove(func)
+
+    def record(self, kind, name, seconds, rows = None, nbytes = None, attr = None, error = None):
+        """
+        Account one call.
+
+        Parameters
+        ----------
+        kind: str
+            "sql" or "tango"
+        name: str
+            statement name or command
+        seconds: float
+            wall time of the call
+        rows: int
+            number of rows or items of the result, None - unknown
+        nbytes: int
+            approximate size of the result, None - unknown
+        attr: str
+            attribute the call was made for, None - several or none
+        error: str
+            error of a failed call, None - success
+        """
+
+        event = Event(kind, name, seconds, rows, nbytes, attr, error)
+
+        with self._lock:
+            series = self._series.get((kind, name))
+            if series == None :
+                series = self._series[(kind, name)] = _Series(len(self.buckets))
+            series.count += 1
+            series.seconds += seconds
+            if error != None :
+                series.errors += 1
+            if rows != None :
+                series.rows += rows
+            if nbytes != None :
+                series.bytes += nbytes
+            for i, le in enumerate(self.buckets):
+                if seconds <= le :
+                    series.buckets[i] += 1
+                    break
+
+        if self.slow_threshold != None and seconds >= self.slow_threshold :
+            self.slow_log(event)
+
+        for hook in self._hooks:
+            try:
+                hook(event)
+            except Exception as err:
+                print("[error]: metrics hook {0}: {1}".format(hook, err))
+
+    def stats(self):
+        """
+        Counters by (kind, name).
+
+        Returns
+        -------
+        dict
+            {(kind, name): {"count", "errors", "rows", "bytes", "seconds"}}
+        """
+
+        with self._lock:
+            return {key: {"count": s.count, "errors": s.errors, "rows": s.rows, "bytes": s.bytes, "seconds": s.seconds}
+                for key, s in self._series.items()}
+
+    def reset(self):
+        """
+        Zero all counters.
+        """
+
+        with self._lock:
+            self._series = {}
+
+    def prometheus(self, prefix = "hdbpp"):
+        """
+        Counters and latency histograms in the Prometheus text exposition format.
+
+        Parameters
+        ----------
+        prefix: str
+            prefix of the metric names
+
+        Returns
+        -------
+        str
+            metrics text, for example to serve on /metrics
+        """
+
+        with self._lock:
+            series = [(kind, name, s.count, s.errors, s.rows, s.bytes, s.seconds, list(s.buckets))
+                for (kind, name), s in sorted(self._series.items())]
+
+        lines = []
+        counters = [
+            ("calls_total", "Number of calls", 2),
+            ("errors_total", "Number of failed calls", 3),
+            ("rows_total", "Number of rows or items returned", 4),
+            ("bytes_total", "Approximate number of bytes returned", 5),
+        ]
+        for metric, help, i in counters:
+            lines.append("# HELP {0}_{1} {2}".format(prefix, metric, help))
+            lines.append("# TYPE {0}_{1} counter".format(prefix, metric))
+            for s in series:
+                lines.append("{0}_{1}{{kind=\"{2}\",name=\"{3}\"}} {4}".format(prefix, metric, s[0], _escape(s[1]), s[i]))
+
+        lines.append("# HELP {0}_duration_seconds Wall time of the calls".format(prefix))
+        lines.append("# TYPE {0}_duration_seconds histogram".format(prefix))
+        for kind, name, count, errors, rows, nbytes, seconds, buckets in series:
+            labels = "kind=\"{0}\",name=\"{1}\"".format(kind, _escape(name))
+            cumulative = 0
+            for le, n in zip(self.buckets, buckets):
+                cumulative += n
+                lines.append("{0}_duration_seconds_bucket{{{1},le=\"{2}\"}} {3}".format(prefix, labels, le, cumulative))
+            lines.append("{0}_duration_seconds_bucket{{{1},le=\"+Inf\"}} {2}".format(prefix, labels, count))
+            lines.append("{0}_duration_seconds_sum{{{1}}} {2}".format(prefix, labels, seconds))
+            lines.append("{0}_duration_seconds_count{{{1}}} {2}".format(prefix, labels, count))
+
+        return "\n".join(lines) + "\n"
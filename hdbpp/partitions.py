@@ -0,0 +1,414 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import re
+import datetime
+
+# History tables of the attributes: att_scalar_devdouble_ro, att_array_devlong_rw, att_scalar_devdouble (PostgreSQL)
+_DATA_TABLE = re.compile(r"^att_(scalar|array)_[a-z0-9]+(_ro|_rw)?$")
+
+# Bound of a PostgreSQL range partition: FOR VALUES FROM ('2026-10-01 00:00:00') TO ('2026-11-01 00:00:00')
+_PG_BOUND = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+_PG_INDEX = re.compile(r"^CREATE (UNIQUE )?INDEX \S+ ON \S+ (USING .*)$")
+
+def _period_start(t, period):
+    """
+    Start of the day or the month containing t.
+    """
+
+    if period == "month" :
+        return datetime.datetime(t.year, t.month, 1)
+
+    return datetime.datetime(t.year, t.month, t.day)
+
+def _next_period(t, period):
+    """
+    Start of the day or the month following the one containing t.
+    """
+
+    t = _period_start(t, period)
+    if period == "month" :
+        return datetime.datetime(t.year + t.month // 12, t.month % 12 + 1, 1)
+
+    return t + datetime.timedelta(days=1)
+
+def _literal(t):
+    return "'{0:%Y-%m-%d %H:%M:%S}'".format(t)
+
+def _pg_bound(value):
+    """
+    datetime of a bound of a PostgreSQL partition, None for MINVALUE and MAXVALUE.
+    """
+
+    value = value.strip("'")
+    if value in ("MINVALUE", "MAXVALUE") :
+        return None
+
+    # timestamptz bounds carry the offset of the session
+    return datetime.datetime.fromisoformat(value).replace(tzinfo=None)
+
+class PartitionManager():
+    """
+    Time-range partitions of the att_* history tables.
+    Reads select by att_conf_id and a range of insert_time, so with the tables partitioned
+    by RANGE on insert_time only the partitions of the requested period are scanned,
+    and expired history is removed by dropping whole partitions instead of deleting rows.
+
+    MySQL: PARTITION BY RANGE on UNIX_TIMESTAMP(column) (TO_DAYS for DATETIME columns),
+    partitions p<YYYYMMDD> named by their start, p_history for the rows older than the
+    first partition and p_future (MAXVALUE) that new partitions are split from.
+    PostgreSQL: declarative partitioning, partitions <table>_p<YYYYMMDD> and <table>_history.
+    Note:
+        Partitioning an existing table is done once: MySQL rebuilds the table,
+        PostgreSQL renames it to <table>_history and attaches it to a new partitioned table
+        up to the end of the period of its newest row (at least the current period).
+        MySQL does not partition tables with foreign keys, they are dropped only
+        if drop_foreign_keys is set.
+
+    Attributes
+    ----------
+    period: str
+        "month" or "day"
+    ahead: int
+        number of future partitions kept ready
+    retention: datetime.timedelta
+        partitions that ended before now - retention are dropped, None - nothing is dropped
+    column: str
+        partitioning column
+
+    Methods
+    -------
+    tables ()
+        The att_* history tables
+    partitions (table)
+        The partitions of a table and their sizes
+    plan (table, now)
+        Statements bringing a table to the wanted partitions
+    maintain (tables, dry_run, now)
+        Plan and, unless dry_run, execute the statements for all tables
+    """
+
+    def __init__(self, hdbpp, period = "month", ahead = 3, retention = None, column = "insert_time", drop_foreign_keys = False):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        hdbpp: HDBPP
+            connected HDBPP object, MySQL or PostgreSQL
+        period: str
+            "month" or "day"
+        ahead: int
+            number of future partitions kept ready
+        retention: int/timedelta
+            partitions that ended more than this ago are dropped, days, None - nothing is dropped
+        column: str
+            partitioning column, insert_time is what the reads of HDBPP select by
+        drop_foreign_keys: bool
+            MySQL: drop the foreign keys of a table to partition it
+        """
+
+        if period not in ("month", "day") :
+            raise ValueError("unsupported period: {0}".format(period))
+
+        if hdbpp.dbtype not in ("mysql", "postgresql") :
+            raise ValueError("partitioning is not supported for {0}".format(hdbpp.dbtype))
+
+        if retention != None and not isinstance(retention, datetime.timedelta) :
+            retention = datetime.timedelta(days=retention)
+
+        self.hdbpp = hdbpp
+        self.period = period
+        self.ahead = ahead
+        self.retention = retention
+        self.column = column
+        self.drop_foreign_keys = drop_foreign_keys
+
+    def _query(self, sql, params = ()):
+        h = self.hdbpp
+        with h._connection() as cnx:
+            rows = h._query(cnx, sql, params)
+            # Do not keep a transaction open on the catalog
+            cnx.rollback()
+        return rows
+
+    def tables(self):
+        """
+        The att_* history tables.
+
+        Returns
+        -------
+        list
+            table names, partitions themselves are not included
+        """
+
+        return sorted(r[0] for r in self._query(self.hdbpp.backend.list_tables) if _DATA_TABLE.match(r[0]))
+
+    def partitions(self, table):
+        """
+        The partitions of a table and their sizes.
+        Note:
+            The numbers of rows are the estimates of the database statistics.
+
+        Parameters
+        ----------
+        table: str
+            table name
+        Returns
+        -------
+        tuple
+            (partitioned, [{"name", "start", "end", "rows", "bytes"}]), start is None for the history
+            partition, end is None for p_future. Not partitioned - one entry for the whole table
+        """
+
+        if self.hdbpp.dbtype == "postgresql" :
+            return self._pg_partitions(table)
+
+        return self._mysql_partitions(table)
+
+    def _mysql_partitions(self, table):
+        rows = self._query("SELECT PARTITION_NAME, PARTITION_METHOD, PARTITION_EXPRESSION, "
+            "CASE WHEN PARTITION_DESCRIPTION IS NULL OR PARTITION_DESCRIPTION = 'MAXVALUE' THEN NULL "
+            "WHEN LOCATE('to_days', LOWER(PARTITION_EXPRESSION)) > 0 THEN FROM_DAYS(PARTITION_DESCRIPTION) "
+            "ELSE FROM_UNIXTIME(PARTITION_DESCRIPTION) END, "
+            "TABLE_ROWS, DATA_LENGTH + INDEX_LENGTH "
+            "FROM information_schema.PARTITIONS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s "
+            "ORDER BY PARTITION_ORDINAL_POSITION", [table])
+
+        if len(rows) == 0 or rows[0][0] == None :
+            return False, [{"name": table, "start": None, "end": None,
+                "rows": rows[0][4] if rows else 0, "bytes": rows[0][5] if rows else 0}]
+
+        if rows[0][1] != "RANGE" or self.column not in (rows[0][2] or "") :
+            raise ValueError("{0} is partitioned by {1} ({2}), not by RANGE of {3}".format(table, rows[0][1], rows[0][2], self.column))
+
+        result = []
+        start = None
+        for name, method, expression, end, n, size in rows:
+            if isinstance(end, datetime.date) and not isinstance(end, datetime.datetime) :
+                end = datetime.datetime(end.year, end.month, end.day)
+            result.append({"name": name, "start": start, "end": end, "rows": n, "bytes": size})
+            start = end
+
+        return True, result
+
+    def _pg_partitions(self, table):
+        kind = self._query("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [table])[0][0]
+
+        if kind != "p" :
+            rows = self._query("SELECT GREATEST(reltuples, 0)::bigint, pg_total_relation_size(oid) FROM pg_class WHERE oid = %s::regclass", [table])
+            return False, [{"name": table, "start": None, "end": None, "rows": rows[0][0], "bytes": rows[0][1]}]
+
+        rows = self._query("SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), GREATEST(c.reltuples, 0)::bigint, "
+            "pg_total_relation_size(c.oid) FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass", [table])
+
+        result = []
+        for name, bound, n, size in rows:
+            m = _PG_BOUND.search(bound)
+            start, end = (_pg_bound(m.group(1)), _pg_bound(m.group(2))) if m else (None, None)
+            result.append({"name": name, "start": start, "end": end, "rows": n, "bytes": size})
+
+        # DEFAULT partition and MAXVALUE last
+        result.sort(key=lambda p: (p["end"] == None, p["end"] or datetime.datetime.min))
+
+        return True, result
+
+    def _missing(self, last_end, now):
+        """
+        (start, end) of the partitions to create after last_end, up to ahead periods after now.
+        """
+
+        until = _period_start(now, self.period)
+        for i in range(self.ahead + 1):
+            until = _next_period(until, self.period)
+
+        s = last_end or _period_start(now, self.period)
+        result = []
+        while s < until :
+            e = _next_period(s, self.period)
+            result.append((s, e))
+            s = e
+
+        return result
+
+    def plan(self, table, now = None):
+        """
+        Statements bringing a table to the wanted partitions.
+
+        Parameters
+        ----------
+        table: str
+            table name
+        now: datetime
+            current time, None - now
+        Returns
+        -------
+        dict
+            "table", "partitioned", "partitions" (see partitions), "create" and "drop" (partition names),
+            "statements", "warnings" and "errors" - the table is left as it is
+        """
+
+        now = now or datetime.datetime.now()
+        report = {"table": table, "partitioned": False, "partitions": [], "create": [], "drop": [], "statements": [], "warnings": [], "errors": []}
+
+        try:
+            report["partitioned"], report["partitions"] = self.partitions(table)
+            if self.hdbpp.dbtype == "postgresql" :
+                self._pg_plan(table, now, report)
+            else :
+                self._mysql_plan(table, now, report)
+        except (ValueError, ) + self.hdbpp.backend.Error as err:
+            report["errors"].append(str(err))
+
+        return report
+
+    def _expired(self, partitions, now):
+        if self.retention == None :
+            return []
+
+        cutoff = now - self.retention
+        return [p["name"] for p in partitions if p["end"] != None and p["end"] <= cutoff]
+
+    def _mysql_plan(self, table, now, report):
+        rows = self._query("SELECT DATA_TYPE FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s", [table, self.column])
+        if len(rows) == 0 :
+            raise ValueError("no column {0} in {1}".format(self.column, table))
+
+        # Only UNIX_TIMESTAMP() is allowed on TIMESTAMP columns
+        if rows[0][0].lower() == "timestamp" :
+            expression = "UNIX_TIMESTAMP({0})".format(self.column)
+            bound = lambda t: "UNIX_TIMESTAMP({0})".format(_literal(t))
+        else :
+            expression = "TO_DAYS({0})".format(self.column)
+            bound = lambda t: "TO_DAYS({0})".format(_literal(t))
+
+        if not report["partitioned"] :
+            keys = [r[0] for r in self._query("SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = %s", [table])]
+            if keys and not self.drop_foreign_keys :
+                raise ValueError("{0} has foreign keys {1}, partitioned tables can not have them".format(table, ", ".join(keys)))
+            for k in keys:
+                report["statements"].append("ALTER TABLE {0} DROP FOREIGN KEY {1}".format(table, k))
+
+            missing = self._missing(None, now)
+            parts = ["PARTITION p_history VALUES LESS THAN ({0})".format(bound(missing[0][0]))]
+            parts += ["PARTITION p{0:%Y%m%d} VALUES LESS THAN ({1})".format(s, bound(e)) for s, e in missing]
+            parts.append("PARTITION p_future VALUES LESS THAN MAXVALUE")
+            report["create"] = ["p_history"] + ["p{0:%Y%m%d}".format(s) for s, e in missing] + ["p_future"]
+            report["statements"].append("ALTER TABLE {0} PARTITION BY RANGE ({1}) ({2})".format(table, expression, ", ".join(parts)))
+            return
+
+        partitions = report["partitions"]
+        ends = [p["end"] for p in partitions if p["end"] != None]
+        missing = self._missing(max(ends) if ends else None, now)
+        if missing :
+            parts = ["PARTITION p{0:%Y%m%d} VALUES LESS THAN ({1})".format(s, bound(e)) for s, e in missing]
+            report["create"] = ["p{0:%Y%m%d}".format(s) for s, e in missing]
+            future = [p["name"] for p in partitions if p["end"] == None]
+            if future :
+                # New partitions are split from the MAXVALUE partition, it is empty if maintained in time
+                parts.append("PARTITION {0} VALUES LESS THAN MAXVALUE".format(future[0]))
+                report["statements"].append("ALTER TABLE {0} REORGANIZE PARTITION {1} INTO ({2})".format(table, future[0], ", ".join(parts)))
+            else :
+                report["statements"].append("ALTER TABLE {0} ADD PARTITION ({1})".format(table, ", ".join(parts)))
+
+        report["drop"] = self._expired(partitions, now)
+        if report["drop"] :
+            report["statements"].append("ALTER TABLE {0} DROP PARTITION {1}".format(table, ", ".join(report["drop"])))
+
+    def _pg_plan(self, table, now, report):
+        partitions = report["partitions"]
+
+        if not report["partitioned"] :
+            history = table + "_history"
+            # The old table keeps its rows up to the end of the period of the newest one, at least the current
+            # period: ATTACH checks that every row fits the bound. MAX is a scan of the old table, like ATTACH
+            latest = self._query("SELECT MAX({0}) FROM {1}".format(self.column, table))[0][0]
+            if latest != None :
+                # timestamptz in the offset of the session, like the bounds
+                latest = latest.replace(tzinfo=None)
+            end = _next_period(max(latest or now, now), self.period)
+            missing = self._missing(end, now)
+            indexes = self._query("SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s", [table])
+
+            report["statements"] += [
+                "ALTER TABLE {0} RENAME TO {1}".format(table, history),
+                "CREATE TABLE {0} (LIKE {1} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) PARTITION BY RANGE ({2})".format(table, history, self.column),
+                # Checks that all the old rows are before the first partition, a scan of the old table
+                "ALTER TABLE {0} ATTACH PARTITION {1} FOR VALUES FROM (MINVALUE) TO ({2})".format(table, history, _literal(end)),
+            ]
+            # Indexes of the partitioned table, the equal indexes of the old table are attached to them
+            for name, definition in indexes:
+                m = _PG_INDEX.match(definition)
+                if m == None :
+                    report["warnings"].append("index {0} is not recreated: {1}".format(name, definition))
+                    continue
+                if m.group(1) and self.column not in m.group(2) :
+                    report["warnings"].append("unique index {0} does not contain {1}, it is kept on {2} only".format(name, self.column, history))
+                    continue
+                report["statements"].append("CREATE {0}INDEX ON {1} {2}".format(m.group(1) or "", table, m.group(2)))
+            report["create"] = [history]
+        else :
+            # Unlike MySQL the ranges may have gaps, the periods not covered by any partition are created
+            bounded = [p for p in partitions if p["start"] != None or p["end"] != None]
+            missing = [(s, e) for s, e in self._missing(None, now)
+                if not any((p["start"] == None or p["start"] < e) and (p["end"] == None or p["end"] > s) for p in bounded)]
+
+        for s, e in missing:
+            name = "{0}_p{1:%Y%m%d}".format(table, s)
+            report["create"].append(name)
+            report["statements"].append("CREATE TABLE {0} PARTITION OF {1} FOR VALUES FROM ({2}) TO ({3})".format(name, table, _literal(s), _literal(e)))
+
+        report["drop"] = self._expired(partitions, now)
+        for name in report["drop"]:
+            report["statements"].append("DROP TABLE {0}".format(name))
+
+    def _apply(self, report):
+        """
+        Execute the statements of a plan. On PostgreSQL they are one transaction,
+        MySQL commits every DDL statement by itself.
+        """
+
+        h = self.hdbpp
+        with h._connection() as cnx:
+            try:
+                for sql in report["statements"]:
+                    h._execute(cnx, sql, (), attr=report["table"])
+                cnx.commit()
+                return True
+            except h.backend.Error as err:
+                cnx.rollback()
+                print("[error]: partitioning {0}: {1}".format(report["table"], err))
+                report["errors"].append(str(err))
+                return False
+
+    def maintain(self, tables = None, dry_run = True, now = None):
+        """
+        Plan and, unless dry_run, execute the statements for all tables:
+        partition the tables that are not, create the partitions of the current period
+        and of the next ahead periods, drop the expired partitions.
+
+        Parameters
+        ----------
+        tables: array(str)
+            table names, None - all att_* history tables
+        dry_run: bool
+            only report the partitions, their sizes and the planned statements
+        now: datetime
+            current time, None - now
+        Returns
+        -------
+        dict
+            {table: plan}, see plan, with "applied" - the statements were executed
+        """
+
+        result = {}
+        for table in tables or self.tables():
+            report = self.plan(table, now)
+            report["applied"] = False
+            if not dry_run and report["statements"] and not report["errors"] :
+                report["applied"] = self._apply(report)
+            result[table] = report
+
+        return result
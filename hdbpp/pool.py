@@ -0,0 +1,189 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import threading
+import contextlib
+
+from .backends import get_backend
+
+class PoolTimeout(Exception):
+    """
+    No free connection in the pool during the checkout timeout.
+    """
+
+class ConnectionPool():
+    """
+    Thread-safe pool of connections to HS.
+    The pool of the driver comes from the backend of the dbtype:
+    mysql.connector.pooling for MySQL, psycopg2.pool for PostgreSQL.
+
+    Attributes
+    ----------
+    dbtype: str
+        type of database, "mysql" or "postgresql"
+    backend: Backend
+        driver and dialect of the database
+    size: int
+        maximum number of connections
+    timeout: float
+        how many seconds to wait for a free connection, None - wait forever
+    health_check: bool
+        check that the connection is alive before giving it out
+    on_discard: callable
+        on_discard(key) is called with the session key (Backend.connection_key) of
+        every connection that is closed or reconnected, None - not called
+
+    Methods
+    -------
+    connection ()
+        Context manager, borrow a connection
+    getconn (timeout)
+        Borrow a connection
+    putconn (cnx, close)
+        Return a connection
+    closeall ()
+        Close all connections
+    """
+
+    def __init__(self, dbtype, host, user, password, database, size = 5, timeout = 30, health_check = True, on_discard = None):
+        """
+        Class constructor. Opens the pool.
+
+        Parameters
+        ----------
+        dbtype: str
+            type of database, "mysql" or "postgresql"
+        host: str
+            history server base ip address (HS)
+        user: str
+            username to connect to HS
+        password: str
+            user password for connecting to HS
+        database: str
+            the name of the base in HS where the history is stored
+        size: int
+            maximum number of connections
+        timeout: float
+            how many seconds to wait for a free connection, None - wait forever
+        health_check: bool
+            check that the connection is alive before giving it out
+        on_discard: callable
+            on_discard(key) is called with the session key of every connection that is closed or reconnected
+        """
+
+        self.dbtype = dbtype
+        self.backend = get_backend(dbtype)
+        self.size = size
+        self.timeout = timeout
+        self.health_check = health_check
+        self.on_discard = on_discard
+
+        # Session keys of the connections of the pool: {id(cnx): key}
+        self._keys = {}
+        self._keys_lock = threading.Lock()
+
+        # The pools of both drivers fail at once when they are empty, the semaphore makes the caller wait
+        self._free = threading.BoundedSemaphore(size)
+
+        self._pool = self.backend.create_pool(host, user, password, database, size)
+
+    def getconn(self, timeout = None):
+        """
+        Borrow a connection from the pool.
+
+        Parameters
+        ----------
+        timeout: float
+            how many seconds to wait for a free connection, None - the pool timeout
+
+        Returns
+        -------
+        connection
+            connection to HS, it must be returned with putconn
+        """
+
+        if timeout == None :
+            timeout = self.timeout
+
+        if not self._free.acquire(timeout=timeout) :
+            raise PoolTimeout("no free connection in {0} s".format(timeout))
+
+        try:
+            cnx = self.backend.pool_getconn(self._pool, self.health_check, self._discard)
+            key = self.backend.connection_key(cnx)
+        except Exception:
+            self._free.release()
+            raise
+
+        with self._keys_lock:
+            self._keys[id(cnx)] = key
+
+        return cnx
+
+    def _discard(self, cnx):
+        """
+        Forget the session of a connection that is closed or reconnected.
+        """
+
+        with self._keys_lock:
+            key = self._keys.pop(id(cnx), None)
+
+        if key != None and self.on_discard != None :
+            self.on_discard(key)
+
+    def putconn(self, cnx, close = False):
+        """
+        Return a connection to the pool.
+
+        Parameters
+        ----------
+        cnx: connection
+            connection received from getconn
+        close: bool
+            close the connection instead of reusing it
+        """
+
+        if close :
+            self._discard(cnx)
+
+        try:
+            self.backend.pool_putconn(self._pool, cnx, close)
+        finally:
+            self._free.release()
+
+    @contextlib.contextmanager
+    def connection(self, timeout = None):
+        """
+        Borrow a connection for the duration of a with block.
+
+        Parameters
+        ----------
+        timeout: float
+            how many seconds to wait for a free connection, None - the pool timeout
+        """
+
+        cnx = self.getconn(timeout)
+        close = False
+        try:
+            yield cnx
+        except self.backend.Disconnected:
+            # The connection is broken, do not give it to anyone else
+            close = True
+            raise
+        finally:
+            self.putconn(cnx, close)
+
+    def closeall(self):
+        """
+        Close all connections of the pool.
+        """
+
+        with self._keys_lock:
+            keys = list(self._keys.values())
+            self._keys = {}
+
+        if self.on_discard != None :
+            for key in keys:
+                self.on_discard(key)
+
+        self.backend.pool_closeall(self._pool)
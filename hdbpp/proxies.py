@@ -0,0 +1,186 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import threading
+from collections import OrderedDict
+
+from .lazy import LazyModule
+
+tango = LazyModule("tango")
+
+class ProxyRegistry():
+    """
+    Cache of tango DeviceProxy and AttributeProxy objects.
+    Creating a proxy costs a tango database lookup and a connection, so the proxies
+    are kept by normalized name and the least recently used ones are evicted.
+
+    Attributes
+    ----------
+    capacity: int
+        maximum number of kept proxies
+
+    Methods
+    -------
+    device (name)
+        Get a DeviceProxy
+    attribute (name)
+        Get an AttributeProxy
+    call_device (name, func)
+        Call func(proxy) with a reconnect on a connection failure
+    call_attribute (name, func)
+        Call func(proxy) with a reconnect on a connection failure
+    invalidate (name)
+        Drop proxies
+    """
+
+    def __init__(self, capacity = 256):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        capacity: int
+            maximum number of kept proxies
+        """
+
+        self.capacity = capacity
+
+        self._proxies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._proxies)
+
+    def _get(self, kind, name):
+        """
+        Get a proxy from the cache or create it.
+        """
+
+        # Tango names are case insensitive
+        key = (kind, name.strip().lower())
+
+        with self._lock:
+            proxy = self._proxies.get(key)
+            if proxy != None :
+                self._proxies.move_to_end(key)
+                return proxy
+
+        # Creating a proxy can take long, do not hold the lock
+        if kind == "device" :
+            proxy = tango.DeviceProxy(name)
+        else :
+            proxy = tango.AttributeProxy(name)
+
+        with self._lock:
+            proxy = self._proxies.setdefault(key, proxy)
+            self._proxies.move_to_end(key)
+            while len(self._proxies) > self.capacity :
+                self._proxies.popitem(last=False)
+
+        return proxy
+
+    def _call(self, kind, name, func):
+        """
+        Call func(proxy), on a connection failure create the proxy again and repeat once.
+        """
+
+        try:
+            return func(self._get(kind, name))
+        except (tango.ConnectionFailed, tango.CommunicationFailed):
+            self._drop(kind, name)
+            return func(self._get(kind, name))
+
+    def _drop(self, kind, name):
+        with self._lock:
+            self._proxies.pop((kind, name.strip().lower()), None)
+
+    def device(self, name):
+        """
+        Get a DeviceProxy.
+
+        Parameters
+        ----------
+        name: str
+            device name, for example tango://tangobox:10000/ECG/ecg/1
+
+        Returns
+        -------
+        tango.DeviceProxy
+            proxy to the device
+        """
+
+        return self._get("device", name)
+
+    def attribute(self, name):
+        """
+        Get an AttributeProxy.
+
+        Parameters
+        ----------
+        name: str
+            attribute name, for example ECG/ecg/1/Lead
+
+        Returns
+        -------
+        tango.AttributeProxy
+            proxy to the attribute
+        """
+
+        return self._get("attribute", name)
+
+    def call_device(self, name, func):
+        """
+        Call func with the DeviceProxy of a device. If the connection has failed,
+        the proxy is created again and func is called once more.
+
+        Parameters
+        ----------
+        name: str
+            device name
+        func: function
+            function of one argument, the proxy
+
+        Returns
+        -------
+        object
+            the result of func
+        """
+
+        return self._call("device", name, func)
+
+    def call_attribute(self, name, func):
+        """
+        Call func with the AttributeProxy of an attribute. If the connection has failed,
+        the proxy is created again and func is called once more.
+
+        Parameters
+        ----------
+        name: str
+            attribute name
+        func: function
+            function of one argument, the proxy
+
+        Returns
+        -------
+        object
+            the result of func
+        """
+
+        return self._call("attribute", name, func)
+
+    def invalidate(self, name = None):
+        """
+        Drop proxies.
+
+        Parameters
+        ----------
+        name: str
+            device or attribute name, None - drop all proxies
+        """
+
+        if name == None :
+            with self._lock:
+                self._proxies.clear()
+        else :
+            self._drop("device", name)
+            self._drop("attribute", name)
@@ -30,5 +30,6 @@ setup(
     zip_safe=False,
     include_package_data=True,
     python_requires='>=3.6',
-    install_request=["mysql-connector>=2.2.9", "pytango>=9.3.2"]
+    install_requires=["mysql-connector>=2.2.9", "pytango>=9.3.2", "numpy>=1.17"],
+    extras_require={"parquet": ["pyarrow"], "hdf5": ["h5py"]}
 )
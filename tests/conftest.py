@@ -0,0 +1,66 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Fixtures of the tests: HS is the SQLite stand-in with the synthetic schema of the benchmarks,
+the tests that need it are skipped where it is not available.
+"""
+
+import datetime
+
+import pytest
+
+from hdbpp import HDBPP
+
+# Closed history: every chunk of the disk cache is older than its live tail
+START = datetime.datetime(2026, 1, 1)
+ROWS = 3000
+ARRAY_SIZE = 16
+
+def connect(path, **kwargs):
+    """
+    HDBPP connected to a SQLite file with the HDB++ tables.
+    """
+
+    schema = pytest.importorskip("benchmarks.schema")
+
+    h = HDBPP(dbtype="sqlite", database=str(path), **kwargs)
+    assert h.connect_to_hdbpp()
+    schema.create_schema(h.cnx)
+    return h
+
+@pytest.fixture
+def hdb(tmp_path):
+    """
+    HDBPP with 4 scalar attributes (devdouble_ro, devdouble_rw, devlong_ro, devboolean_ro)
+    and one spectrum, ROWS samples a minute apart from START, about 1% of them NULL.
+    """
+
+    h = connect(tmp_path / "hdbpp.db")
+    from benchmarks.schema import populate
+    h.attrs = {kind: name for name, kind in populate(h.cnx, 4, ROWS, n_arrays=1, array_size=ARRAY_SIZE, start=START, period=60)}
+    yield h
+    h.close()
+
+def null_count(h, attr, column = "value_r"):
+    """
+    Number of NULL values of an attribute in HS.
+    """
+
+    att_conf_id, table = h._archive_table(h.attr_set_server(attr))
+    return h.cnx.execute("SELECT COUNT(*) FROM {0} WHERE att_conf_id = ? AND {1} IS NULL".format(table, column), [att_conf_id]).fetchone()[0]
+
+@pytest.fixture
+def archiver(hdb):
+    """
+    In-memory AS of the benchmarks with the attributes of hdb added, set as the AS of hdb.
+    """
+
+    fake_tango = pytest.importorskip("benchmarks.fake_tango")
+    import tango
+    from hdbpp.hdbpp import _device_data
+
+    archiver = fake_tango.FakeArchiver(0)
+    archiver.command_inout("AttributeAdd", _device_data(tango.CmdArgType.DevVarStringArray, list(hdb.attrs.values())))
+    hdb.archive_server = archiver
+    return archiver
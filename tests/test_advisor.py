@@ -0,0 +1,44 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+from hdbpp.advisor import SchemaAdvisor
+
+def test_missing_indexes_are_found_and_created(hdb):
+    table = "att_scalar_devdouble_ro"
+    hdb.cnx.execute("DROP INDEX {0}_att_conf_id_data_time".format(table))
+
+    report = hdb.check_schema([table])[table]
+    assert report["missing"] == [["att_conf_id", "data_time"]]
+    assert report["created"] == []
+
+    report = hdb.check_schema([table], create_indexes=True)[table]
+    assert report["created"] == report["create"] != []
+    assert hdb.check_schema([table])[table]["missing"] == []
+
+def test_insert_time_index_is_wanted_only_by_follow(hdb):
+    table = "att_scalar_devdouble_ro"
+    hdb.cnx.execute("DROP INDEX {0}_att_conf_id_insert_time".format(table))
+
+    # The reads are served by the (att_conf_id, data_time) index
+    report = hdb.check_schema([table])[table]
+    assert report["missing"] == []
+    assert not any("insert_time" in p for p in report["problems"])
+
+    report = hdb.check_schema([table], follow=True)[table]
+    assert report["missing"] == [["att_conf_id", "insert_time"]]
+    assert "follow" in report["plans"]
+
+    hdb.check_schema([table], create_indexes=True, follow=True)
+    assert hdb.check_schema([table], follow=True)[table]["missing"] == []
+
+def test_myisam_index_is_not_built_online():
+    class _Hdbpp():
+        dbtype = "mysql"
+
+    advisor = SchemaAdvisor(_Hdbpp())
+    for engine, online in (("MyISAM", False), ("InnoDB", True)):
+        advisor._query = lambda sql, params = (), engine = engine: (["engine"], [(engine, )])
+        report = {"warnings": []}
+        sql = advisor._create_sql("att_scalar_devdouble_ro", ["att_conf_id", "insert_time"], report)
+        assert ("LOCK=NONE" in sql) == online
+        assert (len(report["warnings"]) == 0) == online
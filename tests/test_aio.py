@@ -0,0 +1,105 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import threading
+
+from hdbpp import aio
+from hdbpp.aio import AsyncHDBPP
+from hdbpp.diskcache import ArchiveCache
+from conftest import ROWS
+
+class _AsyncArchiver():
+    """
+    Green mode proxy of an in-memory AS.
+    """
+
+    def __init__(self, archiver):
+        self.archiver = archiver
+
+    async def command_inout(self, cmd, data = None):
+        return self.archiver.command_inout(cmd, data)
+
+def test_reads_run_concurrently(hdb):
+    attrs = sorted(hdb.attrs.values())
+
+    async def main():
+        a = AsyncHDBPP(dbtype="sqlite", database=hdb.database)
+        assert await a.connect_to_hdbpp()
+        try:
+            results = await asyncio.gather(*(a.get_archive(x) for x in attrs))
+            chunks = [rows async for rows in a.iter_archive(attrs[0], chunk_size=1000)]
+            conf = await a.get_att_conf(attrs[0])
+        finally:
+            await a.close()
+        return results, chunks, conf
+
+    results, chunks, conf = asyncio.run(main())
+    assert results == [hdb.get_archive(x) for x in attrs]
+    assert [len(c) for c in chunks] == [1000] * (ROWS // 1000)
+    assert conf == hdb.get_att_conf(attrs[0])
+
+def test_archiver_commands(hdb, archiver):
+    attr = hdb.attrs["scalar_devdouble_ro"]
+
+    async def main():
+        a = AsyncHDBPP(dbtype="sqlite", database=hdb.database)
+        a.archive_server = _AsyncArchiver(archiver)
+        try:
+            paused = await a.archiving_pause(attr)
+            status = await a.archiving_status(attr)
+            stopped = await a.archiving_stop(attr)
+            archiving = await a.attr_is_archiving(attr)
+            unknown = await a.archiving_stop("tango://tangobox:10000/no/such/attr/x")
+        finally:
+            await a.close()
+        return paused, status, stopped, archiving, unknown
+
+    paused, status, stopped, archiving, unknown = asyncio.run(main())
+    assert paused and stopped
+    assert status["Archiving"] == "Paused"
+    assert archiving == False
+    assert unknown == False
+
+def test_set_ttl_drops_cached_chunks(hdb, archiver, tmp_path):
+    attr = hdb.attrs["scalar_devdouble_ro"]
+
+    async def main():
+        a = AsyncHDBPP(dbtype="sqlite", database=hdb.database, archive_cache=ArchiveCache(str(tmp_path / "cache")))
+        assert await a.connect_to_hdbpp()
+        a.archive_server = _AsyncArchiver(archiver)
+        try:
+            await a.get_archive_array(attr)
+            cached = len(a.hdbpp.archive_cache._files())
+            done = await a.archiving_set_ttl(attr, 1)
+        finally:
+            await a.close()
+        return cached, done, a.hdbpp.archive_cache._files()
+
+    cached, done, files = asyncio.run(main())
+    assert cached > 0
+    assert done
+    assert files == []
+
+def test_archiver_proxy_is_not_created_on_the_loop(monkeypatch):
+    threads = []
+
+    class _Asyncio():
+        @staticmethod
+        async def DeviceProxy(name):
+            return name
+
+    monkeypatch.setattr(aio, "tango_asyncio", _Asyncio())
+
+    async def main():
+        a = AsyncHDBPP(dbtype="sqlite", database=":memory:")
+        a.hdbpp.proxies.device = lambda name: threads.append(threading.current_thread()) or name
+        try:
+            return await a.connect_to_archive_server(), a
+        finally:
+            await a.close()
+
+    done, a = asyncio.run(main())
+    assert done
+    assert a.hdbpp.archive_server == a.hdbpp.archive_server_name
+    assert threads != [] and threading.main_thread() not in threads
@@ -0,0 +1,107 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import tango
+
+from hdbpp.hdbpp import _device_data
+
+DEVICE = "tango://tangobox:10000/bench/new/0"
+
+def test_archiving_add_bulk(hdb, archiver):
+    from benchmarks.fake_tango import FakeDevice
+
+    kinds = {"s": "array_devdouble_ro", "x": "scalar_devlong_rw", "b": "scalar_devboolean_ro"}
+    device = FakeDevice(kinds, 0)
+    attrs = [DEVICE + "/" + n for n in kinds]
+
+    report = hdb.archiving_add_bulk(device, attrs)
+    assert sorted(report["ok"]) == sorted(attrs)
+    assert report["errors"] == {}
+
+    for a, data_type in zip(attrs, kinds.values()):
+        att_conf = hdb.get_att_conf(a)
+        assert hdb.get_data_type(att_conf[2])[0] == data_type
+    assert archiver.calls == 2
+
+def test_archiving_add_bulk_reports_unknown_attributes(hdb, archiver):
+    from benchmarks.fake_tango import FakeDevice
+
+    device = FakeDevice({"x": "scalar_devlong_rw"}, 0)
+
+    report = hdb.archiving_add_bulk(device, [DEVICE + "/x", DEVICE + "/missing"])
+    assert report["ok"] == [DEVICE + "/x"]
+    assert list(report["errors"]) == [DEVICE + "/missing"]
+    assert hdb.get_att_conf(DEVICE + "/missing") == None
+
+def test_archiving_many(hdb, archiver):
+    attrs = sorted(hdb.attrs.values())
+    unknown = "tango://tangobox:10000/no/such/attr/x"
+
+    periods = []
+    hdb.attr_set_period = lambda attr, *args: periods.append(attr)
+
+    report = hdb.archiving_start_many(attrs + [unknown], window=2)
+    assert sorted(report["ok"]) == attrs
+    assert list(report["errors"]) == [unknown]
+    assert len(periods) == len(attrs) + 1
+
+    report = hdb.archiving_pause_many(attrs[:2])
+    assert sorted(report["ok"]) == attrs[:2]
+
+    report = hdb.archiving_status_many(attrs, window=3)
+    assert report["errors"] == {}
+    assert [report["results"][a]["Archiving"] for a in attrs] == ["Paused", "Paused"] + ["Started"] * (len(attrs) - 2)
+
+    report = hdb.archiving_stop_many(attrs)
+    assert all(hdb.archiving_status(a)["Archiving"] == "Stopped" for a in attrs)
+
+    report = hdb.archiving_remove_many(attrs[:1] + [unknown])
+    assert report["ok"] == attrs[:1]
+    assert list(report["errors"]) == [unknown]
+    assert hdb.archiving_status(attrs[0]) == {"Archiving": False}
+
+def test_archiving_many_keeps_going_after_any_error(hdb, archiver):
+    attrs = sorted(hdb.attrs.values())
+
+    def set_period(attr, *args):
+        if attr.endswith("attr0") :
+            raise RuntimeError("no polling on this device")
+    hdb.attr_set_period = set_period
+
+    report = hdb.archiving_start_many(attrs)
+    failed = [a for a in attrs if a.endswith("attr0")]
+    assert list(report["errors"]) == failed
+    assert "no polling" in report["errors"][failed[0]]
+    assert sorted(report["ok"]) == [a for a in attrs if a not in failed]
+
+    # A reply that can not be parsed is the error of its attribute
+    report = hdb._archiver_command_many("AttributeStatus", tango.CmdArgType.DevString, attrs, parse=lambda ret: 1 / 0)
+    assert sorted(report["errors"]) == attrs
+    assert report["ok"] == []
+
+def test_archiver_snapshot(hdb, archiver):
+    attrs = sorted(hdb.attrs.values())
+    archiver.command_inout("AttributeStart", _device_data(tango.CmdArgType.DevString, attrs[0]))
+    archiver.command_inout("AttributePause", _device_data(tango.CmdArgType.DevString, attrs[1]))
+
+    calls = archiver.calls
+    snapshot = hdb.archiver_snapshot()
+    assert archiver.calls == calls + 1
+
+    assert sorted(snapshot) == [a.lower() for a in attrs]
+    assert [snapshot[a.lower()]["Archiving"] for a in attrs] == ["Started", "Paused"] + ["Stopped"] * (len(attrs) - 2)
+    assert [hdb.attr_is_archiving(a, snapshot) for a in attrs[:2]] == [True, False]
+    assert hdb.attr_is_archiving("tango://tangobox:10000/no/such/attr/x", snapshot) == False
+
+def test_archiver_snapshot_of_an_older_archiver(hdb, archiver):
+    # Reading a list the device does not have fails the whole call
+    read_attributes = archiver.read_attributes
+    def read_known(names):
+        if not set(names) <= set(archiver.get_attribute_list()) :
+            raise tango.DevFailed(tango.DevError())
+        return read_attributes(names)
+    archiver.read_attributes = read_known
+
+    snapshot = hdb.archiver_snapshot()
+    assert len(snapshot) == len(hdb.attrs)
+    assert all(s["Archiving"] == "Stopped" for s in snapshot.values())
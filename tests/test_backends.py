@@ -0,0 +1,23 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import subprocess
+
+import pytest
+
+from hdbpp import HDBPP
+from hdbpp.backends import get_backend, available
+
+def test_import_does_not_load_drivers():
+    code = "import sys, hdbpp; print(' '.join(m for m in ('tango', 'mysql', 'psycopg2', 'sqlite3') if m in sys.modules))"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=root).stdout
+    assert out.strip() == ""
+
+def test_unknown_backend():
+    assert "sqlite" in available()
+    with pytest.raises(ValueError):
+        get_backend("oracle")
+    assert HDBPP(dbtype="oracle").connect_to_hdbpp() == False
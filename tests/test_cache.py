@@ -0,0 +1,71 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+from hdbpp.cache import MetadataCache
+from conftest import connect
+
+def test_lru_eviction():
+    cache = MetadataCache(None, 2)
+    cache.set(("a", ), 1)
+    cache.set(("b", ), 2)
+    assert cache.get(("a", )) == 1
+
+    # ("b", ) is the least recently used one
+    cache.set(("c", ), 3)
+    assert cache.get(("b", )) == None
+    assert cache.get(("a", )) == 1
+    assert cache.stats() == {"hits": 2, "misses": 1, "size": 2}
+
+def test_expiry_and_disabled_cache():
+    cache = MetadataCache(0, 10)
+    cache.set(("a", ), 1)
+    assert cache.get(("a", )) == None
+    assert len(cache) == 0
+
+    cache = MetadataCache(None, 0)
+    cache.set(("a", ), 1)
+    assert cache.get(("a", )) == None
+
+    # None is not a cached value
+    cache = MetadataCache(None, 10)
+    cache.set(("a", ), None)
+    assert len(cache) == 0
+
+def test_lookups_are_cached(hdb):
+    a = hdb.attrs["scalar_devdouble_ro"]
+
+    att_conf = hdb.get_att_conf(a)
+    data_type = hdb.get_data_type(att_conf[2])
+    misses = hdb.cache_stats()["misses"]
+
+    assert hdb.get_att_conf(a) == att_conf
+    assert hdb.get_data_type(att_conf[2]) == data_type
+    assert hdb.cache_stats()["misses"] == misses
+
+    hdb.cache_invalidate(a)
+    assert hdb.get_att_conf(a) == att_conf
+    assert hdb.cache_stats()["misses"] == misses + 1
+
+def test_cache_preload(hdb):
+    assert hdb.cache_preload() == len(hdb.attrs)
+
+    misses = hdb.cache_stats()["misses"]
+    for a in hdb.attrs.values():
+        hdb.get_data_type(hdb.get_att_conf(a)[2])
+    assert hdb.cache_stats()["misses"] == misses
+
+def test_cache_preload_keeps_all_rows(tmp_path):
+    h = connect(tmp_path / "hdbpp.db", cache_size=100)
+    from benchmarks.schema import populate
+    attrs = populate(h.cnx, 500, 1)
+
+    assert h.cache_preload() == 500
+    misses = h.cache_stats()["misses"]
+    for a, kind in attrs:
+        assert h.get_att_conf(a) != None
+    assert h.cache_stats()["misses"] == misses
+    h.close()
+
+    h = connect(tmp_path / "hdbpp.db", cache_size=0)
+    assert h.cache_preload() == 0
+    h.close()
@@ -0,0 +1,88 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import struct
+
+import numpy
+import pytest
+
+from hdbpp.hdbpp import _decode_copy_binary
+from hdbpp.backends import sqlite
+
+FIELDS = [("data_time", ">i8"), ("value_r", ">f8"), ("quality", ">i2")]
+
+def _copy_binary(rows, extension = b""):
+    """
+    COPY ... TO STDOUT WITH (FORMAT binary) of (int8, float8, int2) rows.
+    """
+
+    out = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, len(extension)) + extension
+    for t, v, q in rows:
+        out += struct.pack(">h", 3) + struct.pack(">iq", 8, t) + struct.pack(">id", 8, v) + struct.pack(">ih", 2, q)
+    return out + struct.pack(">h", -1)
+
+def test_decode_copy_binary():
+    rows = [(1767225600000000, 1.5, 0), (1767225660000000, float("nan"), 1), (-1, -2.25, -1)]
+
+    for extension in (b"", b"\x00\x01\x02\x03"):
+        data = _decode_copy_binary(_copy_binary(rows, extension), FIELDS)
+        assert len(data) == 3
+        assert data["data_time"].astype("int64").tolist() == [r[0] for r in rows]
+        numpy.testing.assert_array_equal(data["value_r"], [r[1] for r in rows])
+        assert data["quality"].tolist() == [0, 1, -1]
+        assert data["count"].tolist() == [3, 3, 3]
+
+    assert len(_decode_copy_binary(_copy_binary([]), FIELDS)) == 0
+
+def test_decode_copy_binary_rejects_other_input():
+    with pytest.raises(ValueError):
+        _decode_copy_binary(b"t,1.5,0\n" * 4, FIELDS)
+
+    # A NULL field has no data: the tuples are not of a fixed width
+    buf = _copy_binary([(1, 1.0, 0)])
+    null = buf[:19] + struct.pack(">hiqi", 3, 8, 2, -1) + struct.pack(">ih", 2, 0) + buf[19:]
+    with pytest.raises(ValueError):
+        _decode_copy_binary(null, FIELDS)
+
+def test_copy_falls_back_without_postgresql(hdb, tmp_path):
+    a = hdb.attrs["scalar_devdouble_rw"]
+
+    data = hdb.get_archive_copy(a, epoch=True)
+    expected = hdb.get_archive_array(a, epoch=True)
+    for name in expected:
+        numpy.testing.assert_array_equal(data[name], expected[name])
+
+    assert hdb.copy_archive(a, str(tmp_path / "archive.csv")) == None
+
+class _CopyBackend(sqlite.Backend):
+    """
+    SQLite with a COPY that returns prepared output, for the decoding of get_archive_copy.
+    """
+
+    has_copy = True
+
+    def __init__(self, output):
+        self.output = output
+
+    def mogrify(self, cnx, sql, params):
+        return sql
+
+    def copy_to(self, cnx, select, options, f):
+        f.write(self.output)
+
+def test_copy_keeps_the_type_of_integers(hdb):
+    a = hdb.attrs["scalar_devlong_ro"]
+
+    # data_time, value_r, value_r IS NULL, quality
+    rows = [(1767225600000000, 7, 0, 0), (1767225660000000, 0, 1, 1), (1767225720000000, -3, 0, 0)]
+    out = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+    for t, v, null, q in rows:
+        out += struct.pack(">h", 4) + struct.pack(">iq", 8, t) + struct.pack(">iq", 8, v) + struct.pack(">iB", 1, null) + struct.pack(">ih", 2, q)
+    hdb.backend = _CopyBackend(out + struct.pack(">h", -1))
+
+    data = hdb.get_archive_copy(a, epoch=True)
+    assert data["data_time"].tolist() == [r[0] for r in rows]
+    assert data["value_r"].dtype == numpy.int32
+    assert data["value_r"].mask.tolist() == [False, True, False]
+    assert data["value_r"].compressed().tolist() == [7, -3]
+    assert data["quality"].tolist() == [0, 1, 0]
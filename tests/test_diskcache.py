@@ -0,0 +1,157 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+
+import numpy
+
+from hdbpp.diskcache import ArchiveCache
+from benchmarks.schema import populate
+from conftest import ROWS, START, connect
+
+def _chunk(n):
+    return {"data_time": numpy.arange(n, dtype="int64"), "value_r": numpy.linspace(0, 1, n)}
+
+def test_store_and_load(tmp_path):
+    cache = ArchiveCache(str(tmp_path))
+    cache.store("hs", 7, 0, _chunk(10))
+
+    chunk = cache.load("hs", 7, 0)
+    numpy.testing.assert_array_equal(chunk["data_time"], numpy.arange(10))
+    numpy.testing.assert_array_equal(chunk["value_r"], numpy.linspace(0, 1, 10))
+    assert cache.load("hs", 7, 1) == None
+    assert cache.load("hs", 8, 0) == None
+    assert cache.load("other", 7, 0) == None
+
+    # Strings are not cached
+    cache.store("hs", 7, 1, {"value_r": numpy.array(["a"], dtype="object")})
+    assert cache.load("hs", 7, 1) == None
+
+def test_least_recently_used_chunks_are_evicted(tmp_path):
+    cache = ArchiveCache(str(tmp_path))
+    cache.store("hs", 1, 0, _chunk(1000))
+    cache.max_bytes = cache._size * 2
+
+    # The order of use is the modification time of the files, a clock tick apart
+    for action in (lambda: cache.store("hs", 1, 1, _chunk(1000)), lambda: cache.load("hs", 1, 0), lambda: cache.store("hs", 1, 2, _chunk(1000))):
+        time.sleep(0.05)
+        action()
+
+    assert cache.load("hs", 1, 1) == None
+    assert cache.load("hs", 1, 0) != None and cache.load("hs", 1, 2) != None
+
+def test_cached_reads_match_hs(hdb, tmp_path):
+    a = hdb.attrs["scalar_devdouble_rw"]
+    direct = hdb.get_archive_array(a, epoch=True)
+
+    hdb.archive_cache = ArchiveCache(str(tmp_path / "cache"), chunk_hours=6)
+    cached = hdb.get_archive_array(a, epoch=True)
+    assert len(hdb.archive_cache._files()) > 0
+
+    # The second read comes from the cache: the values changed in HS are not seen
+    att_conf_id, table = hdb._archive_table(a)
+    hdb.cnx.execute("UPDATE {0} SET value_w = -1 WHERE att_conf_id = ?".format(table), [att_conf_id])
+    again = hdb.get_archive_array(a, epoch=True)
+
+    for data in (cached, again):
+        order = numpy.argsort(data["data_time"], kind="stable")
+        assert len(data["data_time"]) == ROWS
+        numpy.testing.assert_array_equal(data["data_time"][order], numpy.sort(direct["data_time"]))
+        numpy.testing.assert_array_equal(numpy.sort(data["value_w"]), numpy.sort(direct["value_w"]))
+
+def test_ttl_drops_expired_chunks(hdb, archiver, tmp_path):
+    a = hdb.attrs["scalar_devdouble_ro"]
+
+    hdb.archive_cache = ArchiveCache(str(tmp_path / "cache"))
+    hdb.get_archive_array(a)
+    assert len(hdb.archive_cache._files()) > 0
+
+    # The history is from January, HS deletes it with a TTL of one day
+    assert hdb.archiving_set_ttl(a, 1)
+    assert hdb.archive_cache._files() == []
+    assert len(hdb.get_archive_array(a)["data_time"]) == ROWS
+
+def test_chunk_length_is_part_of_the_key(hdb, tmp_path):
+    a = hdb.attrs["scalar_devdouble_ro"]
+    path = str(tmp_path / "cache")
+
+    hdb.archive_cache = ArchiveCache(path, chunk_hours=1)
+    assert len(hdb.get_archive_array(a)["data_time"]) == ROWS
+
+    # The same directory with another chunk length does not serve the 1-hour files
+    hdb.archive_cache = ArchiveCache(path, chunk_hours=24)
+    assert len(hdb.get_archive_array(a)["data_time"]) == ROWS
+
+def test_databases_do_not_share_chunks(hdb, tmp_path):
+    a = hdb.attrs["scalar_devdouble_ro"]
+    path = str(tmp_path / "cache")
+
+    hdb.archive_cache = ArchiveCache(path)
+    assert len(hdb.get_archive_array(a)["data_time"]) == ROWS
+
+    # Another database where the attribute has the same att_conf_id
+    other = connect(tmp_path / "other.db", archive_cache=ArchiveCache(path))
+    populate(other.cnx, 1, 10, start=START, period=60)
+    assert other.get_att_conf(a)[0] == hdb.get_att_conf(a)[0]
+    assert len(other.get_archive_array(a)["data_time"]) == 10
+    other.close()
+
+def test_ttl_is_kept_per_source(hdb, tmp_path):
+    a = hdb.attrs["scalar_devdouble_ro"]
+    path = str(tmp_path / "cache")
+
+    hdb.archive_cache = ArchiveCache(path)
+    hdb.get_archive_array(a)
+    source = hdb._cache_source()
+    att_conf_id = hdb.get_att_conf(a)[0]
+    assert len(hdb.archive_cache._files()) > 0
+
+    hdb.archive_cache.set_ttl(source, att_conf_id, 1)
+    assert hdb.archive_cache._files() == []
+    with open(os.path.join(path, "ttl.json")) as f:
+        assert json.load(f) == {"{0}/{1}".format(source, att_conf_id): 1}
+
+def test_cached_integers_keep_their_type_and_nulls(hdb, tmp_path):
+    a = hdb.attrs["scalar_devlong_ro"]
+    direct = hdb.get_archive_array(a, epoch=True)
+
+    hdb.archive_cache = ArchiveCache(str(tmp_path / "cache"), chunk_hours=6)
+    for i in range(2):
+        cached = hdb.get_archive_array(a, epoch=True)
+        assert cached["value_r"].dtype == direct["value_r"].dtype == numpy.int32
+        assert cached["value_r"].mask.sum() == direct["value_r"].mask.sum() > 0
+        assert sorted(cached["value_r"].compressed().tolist()) == sorted(direct["value_r"].compressed().tolist())
+
+def test_get_archive_is_served_from_the_cache(hdb, tmp_path):
+    hdb.archive_cache = ArchiveCache(str(tmp_path / "cache"), chunk_hours=6)
+
+    for kind in ("scalar_devdouble_rw", "scalar_devlong_ro", "scalar_devboolean_ro"):
+        a = hdb.attrs[kind]
+        cache, hdb.archive_cache = hdb.archive_cache, None
+        direct = hdb.get_archive(a)
+        hdb.archive_cache = cache
+
+        cached = hdb.get_archive(a)
+
+        # The second read comes from the cache: the values changed in HS are not seen
+        att_conf_id, table = hdb._archive_table(a)
+        hdb.cnx.execute("UPDATE {0} SET value_r = NULL WHERE att_conf_id = ?".format(table), [att_conf_id])
+        again = hdb.get_archive(a)
+
+        assert len(direct) == ROWS
+        assert sorted(cached, key=repr) == sorted(direct, key=repr)
+        assert sorted(again, key=repr) == sorted(direct, key=repr)
+
+    assert any(path.endswith(".rows.npy") for path, mtime in hdb.archive_cache._files())
+
+def test_ttl_drops_expired_rows(hdb, archiver, tmp_path):
+    a = hdb.attrs["scalar_devdouble_ro"]
+
+    hdb.archive_cache = ArchiveCache(str(tmp_path / "cache"))
+    hdb.get_archive(a)
+    assert len(hdb.archive_cache._files()) > 0
+
+    assert hdb.archiving_set_ttl(a, 1)
+    assert hdb.archive_cache._files() == []
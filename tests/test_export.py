@@ -0,0 +1,91 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import csv
+
+import numpy
+import pytest
+
+from conftest import ROWS, null_count
+
+def test_csv(hdb, tmp_path):
+    attrs = [hdb.attrs["scalar_devdouble_ro"], hdb.attrs["scalar_devdouble_rw"]]
+    path = tmp_path / "archive.csv"
+
+    reports = []
+    report = hdb.export_archive(attrs, path=str(path), format="csv", chunk_size=500, progress=lambda r: reports.append((r["rows"], r["bytes"])))
+    assert report["rows"] == 2 * ROWS
+    assert report["errors"] == {}
+    assert [rows for rows, size in reports] == list(range(500, 2 * ROWS + 1, 500))
+    # The size grows with every chunk
+    sizes = [size for rows, size in reports]
+    assert 0 < sizes[0] and all(x < y for x, y in zip(sizes, sizes[1:]))
+    assert report["bytes"] == sizes[-1] == path.stat().st_size
+
+    with open(path) as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["attr", "data_time", "value_r", "value_w", "quality"]
+    assert len(rows) == 2 * ROWS + 1
+    assert [r[0] for r in rows[1:]] == [attrs[0]] * ROWS + [attrs[1]] * ROWS
+    assert all(r[3] == "" for r in rows[1:ROWS + 1])
+
+def test_hdf5(hdb, tmp_path):
+    h5py = pytest.importorskip("h5py")
+    a = hdb.attrs["scalar_devdouble_rw"]
+    path = tmp_path / "archive.h5"
+
+    report = hdb.export_archive([a], path=str(path), format="hdf5", chunk_size=700)
+    assert report["rows"] == ROWS
+
+    data = hdb.get_archive_array(a, epoch=True)
+    with h5py.File(path, "r") as f:
+        group = f["bench/dev/0/attr1"]
+        numpy.testing.assert_array_equal(group["data_time"][:], data["data_time"])
+        numpy.testing.assert_array_equal(group["value_w"][:], data["value_w"])
+        assert group["quality"].dtype == numpy.int8
+
+def test_hdf5_keeps_null_of_integer_attributes(hdb, tmp_path):
+    h5py = pytest.importorskip("h5py")
+    a = hdb.attrs["scalar_devlong_ro"]
+    path = tmp_path / "archive.h5"
+
+    # Small chunks: the first one has no NULL, later ones have
+    report = hdb.export_archive([a], path=str(path), format="hdf5", chunk_size=20)
+    assert report["rows"] == ROWS
+
+    with h5py.File(path, "r") as f:
+        group = f["bench/dev/0/attr2"]
+        values = group["value_r"][:]
+        assert values.dtype == numpy.float64
+        assert numpy.isnan(values).sum() == null_count(hdb, a)
+        assert values[~numpy.isnan(values)].min() >= -1000
+        assert group["quality"].dtype == numpy.int8
+        assert group["data_time"].dtype == numpy.int64
+
+def test_parquet(hdb, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    a = hdb.attrs["scalar_devboolean_ro"]
+    path = tmp_path / "archive.parquet"
+
+    report = hdb.export_archive([a], path=str(path), format="parquet", chunk_size=700)
+    assert report["rows"] == ROWS
+
+    table = pq.read_table(path)
+    assert table.num_rows == ROWS
+    assert table.column("value_r").null_count == null_count(hdb, a)
+
+def test_failed_attributes_are_errors(hdb, tmp_path):
+    attrs = [hdb.attrs["scalar_devdouble_ro"], "tango://tangobox:10000/no/such/attr/x", hdb.attrs["scalar_devlong_ro"], hdb.attrs["scalar_devboolean_ro"]]
+    path = tmp_path / "archive.csv"
+
+    iter_archive_array = hdb.iter_archive_array
+    def broken(attr, *args, **kwargs):
+        if attr == attrs[2] :
+            raise RuntimeError("connection lost")
+        return iter_archive_array(attr, *args, **kwargs)
+    hdb.iter_archive_array = broken
+
+    report = hdb.export_archive(attrs, path=str(path), format="csv")
+    assert sorted(report["errors"]) == sorted(attrs[1:3])
+    assert report["errors"][attrs[2]] == "connection lost"
+    assert report["rows"] == 2 * ROWS
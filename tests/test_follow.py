@@ -0,0 +1,100 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import sqlite3
+import datetime
+
+from hdbpp.backends import sqlite
+from conftest import ROWS
+
+def _insert(hdb, attr, values):
+    """
+    Archive new samples of an attribute from another connection, as AS does.
+    """
+
+    att_conf_id, table = hdb._archive_table(hdb.attr_set_server(attr))
+    cnx = sqlite3.connect(hdb.database)
+    now = datetime.datetime.now()
+    for k, v in enumerate(values):
+        t = (now + datetime.timedelta(milliseconds=k)).isoformat(" ")
+        cnx.execute("INSERT INTO {0}(att_conf_id, data_time, recv_time, insert_time, value_r, quality) VALUES(?, ?, ?, ?, ?, 0)".format(table),
+            [att_conf_id, t, t, t, v])
+    cnx.commit()
+    cnx.close()
+
+def test_history_since(hdb):
+    a = hdb.attrs["scalar_devdouble_rw"]
+
+    f = hdb.follow([a], since=datetime.datetime(2025, 1, 1), interval=0.1)
+    samples = []
+    while True :
+        s = f.get(timeout=2)
+        if s == None :
+            break
+        samples.append(s)
+    f.close()
+
+    assert len(samples) == ROWS
+    assert all(x.data_time < y.data_time for x, y in zip(samples, samples[1:]))
+    assert {s.attr for s in samples} == {a}
+
+def test_history_since_is_paged(hdb):
+    a = hdb.attrs["scalar_devdouble_rw"]
+
+    # The queue is much smaller than the history, the poller waits for the consumer
+    f = hdb.follow([a], since=datetime.datetime(2025, 1, 1), maxsize=50, chunk_size=100, interval=0.1)
+    assert f._cnx != None and f._cnx is not hdb.cnx
+
+    samples = []
+    while True :
+        s = f.get(timeout=2)
+        if s == None :
+            break
+        samples.append(s)
+        assert f._queue.qsize() <= 50
+    f.close()
+
+    assert len(samples) == ROWS
+    assert all(x.data_time < y.data_time for x, y in zip(samples, samples[1:]))
+    assert f._cnx == None
+
+def test_new_rows_are_delivered(hdb):
+    a = hdb.attrs["scalar_devdouble_ro"]
+
+    with hdb.follow([a], interval=0.1) as f:
+        _insert(hdb, a, [0.0, 1.0, 2.0, 3.0, 4.0])
+        samples = [f.get(timeout=5) for k in range(5)]
+
+    assert [s.value_r for s in samples] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert f.get(timeout=0.3) == None
+
+class _SnapshotConnection(sqlite3.Connection):
+    """
+    Connection that is always in a transaction, like MySQL without autocommit:
+    in WAL mode it reads the snapshot taken by its first read until the transaction ends.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.execute("BEGIN")
+
+    def rollback(self):
+        super().rollback()
+        self.execute("BEGIN")
+
+class _SnapshotBackend(sqlite.Backend):
+    def connect(self, host, user, password, database):
+        return sqlite3.connect(database, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False, factory=_SnapshotConnection)
+
+def test_rows_inserted_after_the_start_are_seen(hdb):
+    a = hdb.attrs["scalar_devdouble_ro"]
+    hdb.cnx.execute("PRAGMA journal_mode=WAL")
+    hdb.backend = _SnapshotBackend()
+
+    with hdb.follow([a], interval=0.1) as f:
+        # The first polls have read HS, the follower holds a snapshot without these rows
+        assert f.get(timeout=0.5) == None
+        _insert(hdb, a, [5.0, 6.0])
+        samples = [f.get(timeout=5) for k in range(2)]
+
+    assert [s.value_r for s in samples if s != None] == [5.0, 6.0]
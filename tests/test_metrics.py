@@ -0,0 +1,46 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+from hdbpp.metrics import Instrumentation, statement_label
+from conftest import ROWS
+
+def test_statement_label():
+    assert statement_label("SELECT * FROM att_conf WHERE att_name = %s") == "select att_conf"
+    assert statement_label("  insert into att_scalar_devdouble_ro(att_conf_id) VALUES(%s)") == "insert att_scalar_devdouble_ro"
+    assert statement_label("") == "sql"
+
+def test_record_and_prometheus():
+    slow = []
+    events = []
+    m = Instrumentation(slow_threshold=0.5, slow_log=slow.append, hooks=[events.append], buckets=(0.1, 1))
+    m.record("sql", "hdbpp_att_conf", 0.05, 1, 100)
+    m.record("sql", "hdbpp_att_conf", 0.7, 0, 0, error="lost connection")
+    m.record("tango", "AttributeStart", 2.0, attr="a/b/c/d")
+
+    assert m.stats()[("sql", "hdbpp_att_conf")] == {"count": 2, "errors": 1, "rows": 1, "bytes": 100, "seconds": 0.75}
+    assert [e.name for e in slow] == ["hdbpp_att_conf", "AttributeStart"]
+    assert len(events) == 3
+
+    text = m.prometheus()
+    assert 'hdbpp_calls_total{kind="sql",name="hdbpp_att_conf"} 2' in text
+    assert 'hdbpp_errors_total{kind="sql",name="hdbpp_att_conf"} 1' in text
+    assert 'hdbpp_duration_seconds_bucket{kind="sql",name="hdbpp_att_conf",le="0.1"} 1' in text
+    assert 'hdbpp_duration_seconds_bucket{kind="sql",name="hdbpp_att_conf",le="1"} 2' in text
+    assert 'hdbpp_duration_seconds_bucket{kind="tango",name="AttributeStart",le="1"} 0' in text
+    assert 'hdbpp_duration_seconds_bucket{kind="tango",name="AttributeStart",le="+Inf"} 1' in text
+
+    m.reset()
+    assert m.stats() == {}
+
+def test_queries_are_measured(hdb, archiver):
+    a = hdb.attrs["scalar_devdouble_ro"]
+    hdb.metrics = Instrumentation()
+
+    hdb.get_att_conf(a)
+    list(hdb.iter_archive(a, chunk_size=1000))
+    hdb.archiving_stop(a)
+
+    stats = hdb.metrics.stats()
+    assert stats[("sql", "hdbpp_att_conf")]["rows"] == 1
+    assert stats[("sql", "select att_scalar_devdouble_ro")]["rows"] == ROWS
+    assert stats[("tango", "AttributeStop")]["count"] == 1
@@ -0,0 +1,94 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import datetime
+
+import pytest
+
+from hdbpp.backends import base
+from hdbpp.partitions import PartitionManager
+
+class _Hdbpp():
+    def __init__(self, dbtype):
+        self.dbtype = dbtype
+        self.backend = base.Backend()
+
+def _manager(dbtype, answers, **kwargs):
+    """
+    PartitionManager answering its catalog queries from a dict of SQL fragment: rows.
+    """
+
+    pm = PartitionManager(_Hdbpp(dbtype), **kwargs)
+    def query(sql, params = ()):
+        for k, v in answers.items():
+            if k in sql :
+                return v
+        return []
+    pm._query = query
+    return pm
+
+def test_unsupported_backend():
+    with pytest.raises(ValueError):
+        PartitionManager(_Hdbpp("sqlite"))
+
+def test_mysql_table_is_partitioned():
+    pm = _manager("mysql", {"PARTITIONS": [(None, None, None, None, 10, 1000)], "COLUMNS": [("datetime", )]}, ahead=2)
+    report = pm.plan("att_scalar_devdouble", datetime.datetime(2026, 10, 16))
+
+    assert report["errors"] == []
+    assert report["partitioned"] == False
+    assert report["create"] == ["p_history", "p20261001", "p20261101", "p20261201", "p_future"]
+    assert report["statements"] == ["ALTER TABLE att_scalar_devdouble PARTITION BY RANGE (TO_DAYS(insert_time)) ("
+        "PARTITION p_history VALUES LESS THAN (TO_DAYS('2026-10-01 00:00:00')), "
+        "PARTITION p20261001 VALUES LESS THAN (TO_DAYS('2026-11-01 00:00:00')), "
+        "PARTITION p20261101 VALUES LESS THAN (TO_DAYS('2026-12-01 00:00:00')), "
+        "PARTITION p20261201 VALUES LESS THAN (TO_DAYS('2027-01-01 00:00:00')), "
+        "PARTITION p_future VALUES LESS THAN MAXVALUE)"]
+
+def test_mysql_foreign_keys_are_reported():
+    pm = _manager("mysql", {"PARTITIONS": [(None, None, None, None, 10, 1000)], "COLUMNS": [("datetime", )],
+        "REFERENTIAL_CONSTRAINTS": [("att_scalar_devdouble_ibfk_1", )]})
+    report = pm.plan("att_scalar_devdouble", datetime.datetime(2026, 10, 16))
+
+    assert report["statements"] == []
+    assert "foreign keys" in report["errors"][0]
+
+def test_mysql_maintenance_splits_the_future_partition():
+    rows = [
+        ("p_history", "RANGE", "to_days(`insert_time`)", datetime.date(2026, 9, 1), 100, 1000),
+        ("p20260901", "RANGE", "to_days(`insert_time`)", datetime.date(2026, 10, 1), 100, 1000),
+        ("p20261001", "RANGE", "to_days(`insert_time`)", datetime.date(2026, 11, 1), 100, 1000),
+        ("p_future", "RANGE", "to_days(`insert_time`)", None, 0, 0),
+    ]
+    pm = _manager("mysql", {"PARTITIONS": rows, "COLUMNS": [("datetime", )]}, ahead=1, retention=40)
+    report = pm.plan("att_scalar_devdouble", datetime.datetime(2026, 10, 16))
+
+    assert report["errors"] == []
+    assert report["create"] == ["p20261101"]
+    assert report["drop"] == ["p_history"]
+    assert report["statements"] == [
+        "ALTER TABLE att_scalar_devdouble REORGANIZE PARTITION p_future INTO ("
+        "PARTITION p20261101 VALUES LESS THAN (TO_DAYS('2026-12-01 00:00:00')), PARTITION p_future VALUES LESS THAN MAXVALUE)",
+        "ALTER TABLE att_scalar_devdouble DROP PARTITION p_history",
+    ]
+
+def test_postgresql_missing_partitions_are_created():
+    bounds = [
+        ("att_scalar_devdouble_p20261001", "FOR VALUES FROM ('2026-10-01 00:00:00') TO ('2026-11-01 00:00:00')", 100, 1000),
+    ]
+    pm = _manager("postgresql", {"relkind FROM": [("p", )], "pg_inherits": bounds}, ahead=1)
+    report = pm.plan("att_scalar_devdouble", datetime.datetime(2026, 10, 16))
+
+    assert report["errors"] == []
+    assert report["create"] == ["att_scalar_devdouble_p20261101"]
+    assert report["statements"] == ["CREATE TABLE att_scalar_devdouble_p20261101 PARTITION OF att_scalar_devdouble "
+        "FOR VALUES FROM ('2026-11-01 00:00:00') TO ('2026-12-01 00:00:00')"]
+
+def test_postgresql_conversion_keeps_the_current_period():
+    pm = _manager("postgresql", {"relkind FROM": [("r", )], "reltuples": [(0, 0)],
+        "MAX(": [(datetime.datetime(2026, 10, 15, 12), )]}, period="month", ahead=2)
+    report = pm.plan("att_scalar_devdouble", datetime.datetime(2026, 10, 16))
+
+    assert report["errors"] == []
+    assert "ATTACH PARTITION att_scalar_devdouble_history FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00')" in report["statements"][2]
+    assert report["create"] == ["att_scalar_devdouble_history", "att_scalar_devdouble_p20261101", "att_scalar_devdouble_p20261201"]
@@ -0,0 +1,76 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+from hdbpp.backends import base, register, get_backend
+from hdbpp.pool import ConnectionPool
+
+class _Connection():
+    pass
+
+class _Backend(base.Backend):
+    """
+    Pool of plain objects, a closed connection is replaced by a new one.
+    """
+
+    name = "fake"
+    pooled = True
+
+    def create_pool(self, host, user, password, database, size):
+        return [_Connection() for i in range(size)]
+
+    def pool_getconn(self, pool, health_check, discard):
+        return pool.pop()
+
+    def pool_putconn(self, pool, cnx, close):
+        pool.append(_Connection() if close else cnx)
+
+    def pool_closeall(self, pool):
+        del pool[:]
+
+def test_pool_forgets_closed_sessions():
+    register("fake", _Backend())
+    discarded = []
+    pool = ConnectionPool("fake", "host", "user", "password", "db", 2, 1, on_discard=discarded.append)
+
+    cnx = pool.getconn()
+    pool.putconn(cnx)
+    assert discarded == []
+
+    cnx = pool.getconn()
+    pool.putconn(cnx, close=True)
+    assert discarded == [id(cnx)]
+
+    pool.getconn()
+    pool.closeall()
+    assert len(discarded) == 2
+
+class _MysqlConnection():
+    """
+    mysql.connector connection recording the calls of the pool.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def consume_results(self):
+        self.calls.append("consume_results")
+
+    def rollback(self):
+        self.calls.append("rollback")
+
+    def disconnect(self):
+        self.calls.append("disconnect")
+
+    def close(self):
+        self.calls.append("close")
+
+def test_mysql_connection_is_returned_without_a_transaction():
+    backend = get_backend("mysql")
+
+    cnx = _MysqlConnection()
+    backend.pool_putconn(None, cnx, False)
+    assert cnx.calls == ["consume_results", "rollback", "close"]
+
+    cnx = _MysqlConnection()
+    backend.pool_putconn(None, cnx, True)
+    assert cnx.calls == ["disconnect", "close"]
@@ -0,0 +1,65 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import tango
+import pytest
+
+from hdbpp.proxies import ProxyRegistry
+
+class _Proxy():
+    """
+    Proxy without a Tango system, the first calls of a broken one fail with ConnectionFailed.
+    """
+
+    created = []
+    broken = 0
+
+    def __init__(self, name):
+        self.name = name
+        _Proxy.created.append(name)
+
+    def state(self):
+        if _Proxy.broken > 0 :
+            _Proxy.broken -= 1
+            raise tango.ConnectionFailed(tango.DevError())
+        return self.name
+
+@pytest.fixture
+def registry(monkeypatch):
+    _Proxy.created = []
+    _Proxy.broken = 0
+    monkeypatch.setattr(tango, "DeviceProxy", _Proxy)
+    monkeypatch.setattr(tango, "AttributeProxy", _Proxy)
+    return ProxyRegistry(2)
+
+def test_proxies_are_reused(registry):
+    dp = registry.device("ECG/ecg/1")
+    assert registry.device(" ecg/ECG/1 ") is dp
+    assert registry.attribute("ECG/ecg/1") is not dp
+    assert _Proxy.created == ["ECG/ecg/1", "ECG/ecg/1"]
+
+def test_least_recently_used_proxy_is_evicted(registry):
+    a = registry.device("a/b/1")
+    registry.device("a/b/2")
+    registry.device("a/b/1")
+    registry.device("a/b/3")
+
+    assert len(registry) == 2
+    assert registry.device("a/b/1") is a
+    registry.device("a/b/2")
+    assert _Proxy.created == ["a/b/1", "a/b/2", "a/b/3", "a/b/2"]
+
+def test_broken_proxy_is_created_again(registry):
+    dp = registry.device("a/b/1")
+
+    _Proxy.broken = 1
+    assert registry.call_device("a/b/1", lambda p: p.state()) == "a/b/1"
+    assert registry.device("a/b/1") is not dp
+
+    # Only one retry
+    _Proxy.broken = 2
+    with pytest.raises(tango.ConnectionFailed):
+        registry.call_device("a/b/1", lambda p: p.state())
+
+    registry.invalidate()
+    assert len(registry) == 0
@@ -0,0 +1,223 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import queue
+import sqlite3
+import datetime
+import threading
+import contextlib
+
+import numpy
+
+from hdbpp.hdbpp import _column_array, _pivot_elements
+from conftest import ROWS, START, ARRAY_SIZE, null_count
+
+def test_get_archive(hdb):
+    a = hdb.attrs["scalar_devdouble_ro"]
+
+    assert len(hdb.get_archive(a)) == ROWS
+    assert len(hdb.get_archive(a, START, START + datetime.timedelta(minutes=9, seconds=59))) == 10
+    assert hdb.get_archive("tango://tangobox:10000/no/such/attr/x") == None
+
+def test_iter_archive(hdb):
+    a = hdb.attrs["scalar_devdouble_rw"]
+
+    chunks = list(hdb.iter_archive(a, chunk_size=700))
+    assert [len(c) for c in chunks] == [700, 700, 700, 700, 200]
+    assert sum(chunks, []) == hdb.get_archive(a)
+
+def test_get_archive_many(hdb):
+    attrs = [hdb.attrs["scalar_devdouble_ro"], hdb.attrs["scalar_devlong_ro"], "tango://tangobox:10000/no/such/attr/x"]
+
+    result = hdb.get_archive_many(attrs, START, START + datetime.timedelta(hours=1))
+    assert sorted(result) == sorted(attrs)
+    assert result[attrs[2]] == None
+    for a in attrs[:2]:
+        assert sorted(result[a]) == sorted(hdb.get_archive(a, START, START + datetime.timedelta(hours=1)))
+
+def test_get_archive_array(hdb):
+    a = hdb.attrs["scalar_devdouble_rw"]
+
+    data = hdb.get_archive_array(a, epoch=True)
+    assert set(data) == {"data_time", "value_r", "value_w", "quality"}
+    assert len(data["data_time"]) == ROWS
+    assert data["data_time"].dtype == numpy.int64
+    assert numpy.isnan(data["value_r"]).sum() == null_count(hdb, a)
+
+    rows = hdb.get_archive(a)
+    assert [r[4] for r in rows if r[4] != None] == data["value_r"][~numpy.isnan(data["value_r"])].tolist()
+
+    data = hdb.get_archive_array(a)
+    assert data["data_time"].dtype.kind == "M"
+    assert data["data_time"].min() == numpy.datetime64(START, "us")
+
+def test_array_types_do_not_depend_on_the_chunk(hdb):
+    for kind, dtype in (("scalar_devlong_ro", "int32"), ("scalar_devboolean_ro", "bool")):
+        a = hdb.attrs[kind]
+        assert null_count(hdb, a) > 0
+
+        # Small chunks: the first one has no NULL, later ones have
+        chunks = list(hdb.iter_archive_array(a, chunk_size=20))
+        assert {str(c["value_r"].dtype) for c in chunks} == {dtype}
+        assert all(isinstance(c["value_r"], numpy.ma.MaskedArray) for c in chunks)
+        assert {str(c["quality"].dtype) for c in chunks} == {"int8"}
+        assert sum(c["value_r"].mask.sum() for c in chunks) == null_count(hdb, a)
+
+        data = hdb.get_archive_array(a)
+        assert data["value_r"].dtype == dtype
+        assert data["value_r"].mask.sum() == null_count(hdb, a)
+        rows = hdb.get_archive(a)
+        assert sorted(r[4] for r in rows if r[4] != None) == sorted(data["value_r"].compressed().tolist())
+
+def test_get_archive_aggregated(hdb):
+    a = hdb.attrs["scalar_devlong_ro"]
+
+    rows = hdb.get_archive_aggregated(a, bucket=3600, funcs=["min", "max", "count"])
+    assert len(rows) == ROWS // 60
+    assert rows[0][0] == START
+    assert sum(r[3] for r in rows) == ROWS - null_count(hdb, a)
+    assert all(r[1] <= r[2] for r in rows)
+
+    assert hdb.get_archive_aggregated(a, bucket=0) == None
+    assert hdb.get_archive_aggregated(a, funcs=["median"]) == None
+
+def test_get_archive_aggregated_first_and_last(hdb):
+    for kind in ("scalar_devdouble_ro", "scalar_devlong_ro", "scalar_devboolean_ro"):
+        a = hdb.attrs[kind]
+
+        # The values in data_time order per bucket of an hour
+        buckets = {}
+        for r in sorted(hdb.get_archive(a), key=lambda r: r[1]):
+            buckets.setdefault(r[1].replace(minute=0, second=0, microsecond=0), []).append(r[4])
+
+        rows = hdb.get_archive_aggregated(a, bucket=3600, funcs=["first", "count", "last"])
+        assert [r[0] for r in rows] == sorted(buckets)
+        for r in rows:
+            values = buckets[r[0]]
+            # The values keep their type and precision
+            assert (r[1], r[3]) == (values[0], values[-1])
+            assert type(r[1]) == type(values[0])
+            assert r[2] == len([v for v in values if v != None])
+
+    # The default functions work on every database
+    rows = hdb.get_archive_aggregated(hdb.attrs["scalar_devdouble_ro"])
+    assert len(rows) == ROWS and len(rows[0]) == 6
+
+class _Pool():
+    """
+    size SQLite connections to the file of HS, counts the connections in use
+    and the threads asking for them.
+    """
+
+    def __init__(self, database, size):
+        self.size = size
+        self.used = 0
+        self.peak = 0
+        self.threads = set()
+        self._free = queue.Queue()
+        self._lock = threading.Lock()
+        for i in range(size):
+            self._free.put(sqlite3.connect(database, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False))
+
+    @contextlib.contextmanager
+    def connection(self):
+        cnx = self._free.get(timeout=5)
+        with self._lock:
+            self.threads.add(threading.current_thread())
+            self.used += 1
+            self.peak = max(self.peak, self.used)
+        try:
+            yield cnx
+        finally:
+            with self._lock:
+                self.used -= 1
+            self._free.put(cnx)
+
+    def closeall(self):
+        while not self._free.empty() :
+            self._free.get().close()
+
+def test_get_archive_parallel(hdb, capsys):
+    a = hdb.attrs["scalar_devdouble_ro"]
+    end = START + datetime.timedelta(hours=5)
+    rows = hdb.get_archive(a)
+
+    # Without a pool the history is read by get_archive
+    assert hdb.get_archive_parallel(a) == rows
+    assert "read serially" in capsys.readouterr().out
+
+    hdb.pool = _Pool(hdb.database, 3)
+    hdb.pool_size = 3
+    assert hdb.get_archive_parallel(a) == rows
+    assert hdb.get_archive_parallel(a, START, end, slice_size=datetime.timedelta(minutes=7)) == hdb.get_archive(a, START, end)
+    assert 1 < hdb.pool.peak <= 3
+
+    # No more threads than connections
+    hdb.pool = _Pool(hdb.database, 2)
+    assert hdb.get_archive_parallel(a, workers=10) == rows
+    assert len(hdb.pool.threads - {threading.current_thread()}) <= 2
+
+def test_get_aligned(hdb):
+    attrs = [hdb.attrs["scalar_devdouble_ro"], hdb.attrs["scalar_devlong_ro"]]
+    end = START + datetime.timedelta(days=2, minutes=5)
+
+    data = hdb.get_aligned(attrs, START, end, grid=600)
+    assert data["values"].shape == (len(data["time"]), 2)
+    assert data["quality"].dtype == numpy.int8
+    assert len(data["time"]) == 2 * 24 * 6 + 1
+
+    # Samples are a minute apart: every grid point has the sample taken at that time
+    full = hdb.get_archive_array(attrs[0])
+    at = {t: v for t, v in zip(full["data_time"], full["value_r"])}
+    numpy.testing.assert_array_equal(data["values"][:, 0], [at[t] for t in data["time"]])
+
+    data = hdb.get_aligned(attrs, START, end, grid=90, method="linear")
+    assert numpy.isfinite(data["values"]).mean() > 0.9
+
+def test_get_archive_matrix(hdb):
+    a = hdb.attrs["array_devdouble_ro"]
+
+    data = hdb.get_archive_matrix(a)
+    assert data["value_r"].shape == (ROWS, ARRAY_SIZE)
+    assert (data["dim_x"] == ARRAY_SIZE).all()
+    assert (numpy.diff(data["data_time"].view("int64")) > 0).all()
+
+    # The elements of the first sample in idx order
+    att_conf_id, table = hdb._archive_table(a)
+    first = hdb.cnx.execute("SELECT value_r FROM {0} WHERE att_conf_id = ? AND data_time = (SELECT MIN(data_time) FROM {0}) ORDER BY idx".format(table), [att_conf_id]).fetchall()
+    numpy.testing.assert_array_equal(data["value_r"][0], [numpy.nan if v[0] == None else v[0] for v in first])
+
+    assert hdb.get_archive_matrix(hdb.attrs["scalar_devdouble_ro"]) == None
+
+def test_get_archive_decimated(hdb):
+    a = hdb.attrs["scalar_devdouble_ro"]
+    end = START + datetime.timedelta(minutes=ROWS)
+    full = hdb.get_archive_array(a, epoch=True)
+
+    for method in ("lttb", "minmax"):
+        data = hdb.get_archive_decimated(a, START, end, n_out=100, method=method, epoch=True, chunk_size=250)
+        assert 50 < len(data["data_time"]) <= 100
+        assert (numpy.diff(data["data_time"]) >= 0).all()
+        assert numpy.nanmax(data["value_r"]) == numpy.nanmax(full["value_r"])
+        assert numpy.nanmin(data["value_r"]) == numpy.nanmin(full["value_r"])
+        # Only samples of the history
+        assert numpy.isin(data["data_time"], full["data_time"]).all()
+
+def test_get_archive_decimated_to_now(hdb):
+    a = hdb.attrs["scalar_devdouble_ro"]
+    full = hdb.get_archive_array(a, epoch=True)
+
+    # No date_to: the buckets span the history only, not up to now
+    data = hdb.get_archive_decimated(a, n_out=100, method="minmax", epoch=True, chunk_size=250)
+    assert 50 < len(data["data_time"]) <= 100
+    assert numpy.nanmax(data["value_r"]) == numpy.nanmax(full["value_r"])
+    assert numpy.nanmin(data["value_r"]) == numpy.nanmin(full["value_r"])
+
+def test_integer_matrix_is_masked():
+    values = _column_array([1, None, 3, 4, 5], "int16")
+    out = _pivot_elements(2, numpy.array([0, 0, 0, 1, 1]), numpy.array([0, 1, 2, 0, 1]), numpy.array([3, 2]), numpy.array([0, 0]), values, "int16")
+
+    assert out.dtype == numpy.int16
+    # NULL and the padding of the shorter sample are masked
+    assert out.mask.tolist() == [[False, True, False], [False, False, True]]
+    assert out.filled(0).tolist() == [[1, 0, 3], [4, 5, 0]]
@@ -0,0 +1,89 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import itertools
+
+from hdbpp import HDBPP
+from hdbpp.backends import get_backend
+
+_sessions = itertools.count(1)
+
+class _Cursor():
+    """
+    Cursor of _Connection, records the executed statements.
+    """
+
+    def __init__(self, cnx, prepared):
+        self.cnx = cnx
+        self.prepared = prepared
+
+    def execute(self, sql, params = ()):
+        self.cnx.log.append((sql, list(params), self.prepared))
+
+    def fetchall(self):
+        return []
+
+class _Connection():
+    """
+    Driver connection without a server, connection_id is the id of its server session.
+    """
+
+    def __init__(self):
+        self.log = []
+        self.cursors = 0
+        self.connection_id = next(_sessions)
+
+    def get_backend_pid(self):
+        return self.connection_id
+
+    def cursor(self, prepared = False):
+        self.cursors += 1
+        return _Cursor(self, prepared)
+
+def _hdbpp(dbtype):
+    h = HDBPP(dbtype=dbtype)
+    h.backend = get_backend(dbtype)
+    return h
+
+SQL = "SELECT * FROM att_conf WHERE att_name = %s LIMIT 1"
+
+def test_postgresql_prepares_once_per_connection():
+    h = _hdbpp("postgresql")
+    cnx, other = _Connection(), _Connection()
+
+    for a in ("a/b/c/d", "e/f/g/h"):
+        h._execute(cnx, SQL, [a], "hdbpp_att_conf")
+    h._execute(other, SQL, ["a/b/c/d"], "hdbpp_att_conf")
+
+    prepare = ("PREPARE hdbpp_att_conf AS SELECT * FROM att_conf WHERE att_name = $1 LIMIT 1", [], False)
+    assert cnx.log == [
+        prepare,
+        ("EXECUTE hdbpp_att_conf (%s)", ["a/b/c/d"], False),
+        ("EXECUTE hdbpp_att_conf (%s)", ["e/f/g/h"], False),
+    ]
+    assert other.log == [prepare, ("EXECUTE hdbpp_att_conf (%s)", ["a/b/c/d"], False)]
+
+def test_mysql_reuses_the_prepared_cursor():
+    h = _hdbpp("mysql")
+    cnx = _Connection()
+
+    for a in ("a/b/c/d", "e/f/g/h"):
+        h._execute(cnx, SQL, [a], "hdbpp_att_conf")
+    assert cnx.cursors == 1
+    assert cnx.log == [(SQL, ["a/b/c/d"], True), (SQL, ["e/f/g/h"], True)]
+
+    # Not named: a plain cursor every time
+    h._execute(cnx, SQL, ["a/b/c/d"])
+    assert cnx.cursors == 2
+    assert cnx.log[-1] == (SQL, ["a/b/c/d"], False)
+
+def test_a_new_session_prepares_again():
+    h = _hdbpp("postgresql")
+    cnx = _Connection()
+
+    h._execute(cnx, SQL, ["a/b/c/d"], "hdbpp_att_conf")
+    # Reconnected: the statements of the old session are gone
+    cnx.connection_id = next(_sessions)
+    h._execute(cnx, SQL, ["a/b/c/d"], "hdbpp_att_conf")
+
+    assert [sql.split()[0] for sql, params, prepared in cnx.log] == ["PREPARE", "EXECUTE", "PREPARE", "EXECUTE"]